@@ -1,70 +1,28 @@
+import os
 import sys
-from math import ceil
-from collections import defaultdict
-from utils import Instruction, opcode_table
-
-
-class Line:
-    """
-    Break SIC instructions into label, opcode, operands.
-
-    Parameters
-    ----------
-    line: str
-    SIC instruction
-    """
-
-    def __init__(self, line):
-        super().__init__()
-        if len(line) != 0:
-            self.label, self.operation_name, self.operand = self.parse_line(
-                line)
-            self.line_location = ''
-        else:
-            self.label, self.operation_name, self.operand = '', '', ''
-            self.line_location = ''
-
-    def parse_line(self, line: str):
-        """
-        Break SIC instruction into label, opcode, operands.
-
-        Parameters
-        ----------
-        Line: str
-        SIC instruction
-
-        Returns
-        ----------
-        label: str
-        label of the SIC instruction
-
-        operation_name: str
-        opcodel of the SIC instruction
-
-        operand: str
-        operand of the SIC instruction
-        """
-        line = line.split()
-        for indx, segment in enumerate(line):
-            if segment.split()[0].startswith('.'):
-                line = line[:indx]
-
-        # remove spaces in between operands
-        if len(line) > 1 and line[1].endswith(','):  # if there is no label
-            # remove and return the compaund values
-            line.append(line.pop(1) + line.pop(1))
-        elif len(line) > 2 and line[2].endswith(','):  # if there is a label
-            # remove and return the compaund values to the line
-            line.append(line.pop(2) + line.pop(2))
-
-        if len(line) == 3:
-            return line[0], line[1], line[2]  # label, operation_name, operand
-        elif len(line) == 2:
-            return None, line[0], line[1]  # No label, operation_name, operand
-        elif len(line) == 1:
-            return None, line[0], None  # No label, operation name, no operand
-        else:
-            raise SyntaxError(f'Fixed format only {line}')
+import argparse
+from contextlib import nullcontext, ExitStack
+from itertools import islice
+from array import array
+from utils import operations, operation_table, operation_id, encode_instruction, encode_word, NO_OBJECT
+from expressions import parse_expression, expression_symbols, evaluate, resolution_order, LOCATION
+from xref import CrossReferenceBuilder
+from symbols import SymbolTable
+from writers import BackgroundWriter
+from tokenizer import tokenize, BLANK, COMMENT, STATEMENT
+from intermediate import Line, Intermediate, LITERAL
+from macros import MacroProcessor
+
+__version__ = '1.3.0'
+
+# Default maximum number of object code bytes in a text record
+MAX_RECORD_LENGTH = 30
+# Number of lines gathered into a single write of the output files
+WRITE_BATCH_LINES = 4096
+# Number of intermediate lines below which pass2 is not worth sharing between processes
+PARALLEL_THRESHOLD = 200000
+# Number of symbols in a D or R record
+SYMBOLS_PER_RECORD = 5
 
 
 class Assembler:
@@ -80,19 +38,46 @@ class Assembler:
     def __init__(self, input_file):
         super().__init__()
 
-        # The content of the source file, i.e. lines
-        self.content = (line.rstrip('\n') for line in input_file.readlines())
+        # Expands the macro definitions and invocations of the source
+        self.macro_processor = MacroProcessor()
+        # The content of the source file, i.e. lines. Read lazily so that
+        # large sources never have to be held in memory at once.
+        self.content = self.macro_processor.expand(line.rstrip('\n') for line in input_file)
         # Symbol Table
-        self.symbol_table = defaultdict(str)
+        self.symbol_table = SymbolTable()
+        # Symbols defined by EQU with an absolute value, the others are addresses in the program
+        self.absolute_symbols = self.symbol_table.absolute_symbols
+        # EQU symbols waiting for the symbols their expression refers to:
+        # the parsed expression, the location and the line number of each one
+        self.pending_equates = {}
+        # Label of the line pass1 is sizing, for EQU
+        self.line_label = None
         # Location Counter
         self.locctr = 0
+        # Literals waiting for the next LTORG or the end of the program
+        self.literals_list = []
+        # Lines of the literals pooled by the last LTORG
+        self.pooled_lines = []
+        # Set once pass1 reaches the END directive
+        self.ended = False
         self.prog_name = ''
+        # Symbols exported by EXTDEF, and imported by EXTREF as the keys of a dict in declaration order
+        self.external_definitions = []
+        self.external_references = {}
         self.start_address = 0
         self.prog_length = 0
-        self.intermediate = []
-        self.objects_list = []
-        self.object_addresses = []
+        self.intermediate = Intermediate()
+        self.object_addresses = array('q')
+        self.object_sizes = array('l')
+        # Memory image of the assembled program, indexed from the starting address
+        self.memory = bytearray()
         self.text_records = []
+        # Counters of what the assembler did, see stats.RunStats
+        self.lines_read = 0
+        self.comments_skipped = 0
+        self.ltorg_literals = []
+        self.end_literals = 0
+        self.text_record_count = 0
 
     def is_comment(self, line):
         """
@@ -110,7 +95,7 @@ class Assembler:
         bool : 
             Is the given line is a comment
         """
-        return line.split()[0].startswith('.')
+        return tokenize(line)[0] == COMMENT
 
     def is_empty(self, line):
         """
@@ -128,39 +113,233 @@ class Assembler:
         bool : 
             Is the given line is an empty line
         """
-        return len(line.split()) == 0
+        return tokenize(line)[0] == BLANK
 
-    def hexify_objects_code(self):
+    def pass_one(self):
         """
-        Convert objects code to 6 charachters hexadecimal fixed format.
+        Operate pass1 on the source code.
 
         Parameters
         ----------
         None
 
         Returns
-        -------
-        list : 
-            A hexified format of the objects code.
+        ----------
+        None
         """
-        self.objects_list = ['\t' if obj == '' else "{:08x}".format(int(obj, 2))[2:].upper(
-        ) if len(obj) == 24 else obj.replace("3D", '') for obj in self.objects_list]
+        self.intermediate.extend(self.iter_pass_one())
 
-    def pass_one(self):
+    def iter_pass_one(self):
         """
-        Operate pass1 on the source code.
+        Operate pass1 on the source code, yielding each intermediate line as soon as its location is known.
 
         Parameters
         ----------
         None
 
+        Returns
+        ----------
+        generator : 
+            The lines of the intermediate file in order.
+        """
+        yield from self.pass_one_first_line(next(self.content))
+        line_number = -1
+        for line_number, line in enumerate(self.content):
+            yield from self.pass_one_line(line_number, line)
+            # Program finished, Stop Reading.
+            if self.ended:
+                break
+        self.lines_read = line_number + 2
+        yield from self.pass_one_end()
+
+    def define_symbol(self, label, value=None, absolute=False):
+        """
+        Add a label or a literal to the symbol table at the current location.
+
+        Parameters
+        ----------
+        label : str
+            The label or the literal.
+
+        value : int
+            The value of a symbol defined by EQU instead of the current location.
+
+        absolute : bool
+            Whether the value is a constant rather than an address in the program.
+
         Returns
         ----------
         None
         """
-        literals_list = []
-        # Find the starting address and the name of the program.
-        first_line = Line(next(self.content))
+        self.symbol_table[label] = int(self.locctr) if value is None else value
+        if absolute:
+            self.absolute_symbols.add(label)
+        else:
+            self.absolute_symbols.discard(label)
+
+    def define_equate(self, label, operand, line_number):
+        """
+        Define the symbol of an EQU line, e.g. `MAXLEN EQU BUFEND-BUFFER`.
+
+        The symbol is defined at once when the symbols of its expression are, otherwise
+        it waits for `resolve_equates` at the end of pass1.
+
+        Parameters
+        ----------
+        label : str
+            The label of the EQU line.
+
+        operand : str
+            The expression, see `expressions.parse_expression`.
+
+        line_number : int
+            The number of the line, used in error messages.
+
+        Returns
+        ----------
+        None
+        """
+        if label is None or operand is None:
+            raise SyntaxError(f'EQU needs a label and an expression on line {line_number}')
+        terms = parse_expression(operand)
+        try:
+            evaluated = evaluate(
+                terms, self.symbol_table, int(self.locctr), self.absolute_symbols, self.external_references)
+        except KeyError:
+            self.pending_equates[label] = (terms, int(self.locctr), line_number)
+            return
+        self.define_evaluated_equate(label, evaluated, line_number)
+
+    def define_evaluated_equate(self, label, evaluated, line_number):
+        """
+        Define the symbol of an EQU line from the evaluation of its expression.
+
+        Parameters
+        ----------
+        label : str
+            The label of the EQU line.
+
+        evaluated : tuple
+            The value, relative count and external symbols returned by `expressions.evaluate`.
+
+        line_number : int
+            The number of the line, used in error messages.
+
+        Returns
+        ----------
+        None
+        """
+        value, relative, externals = evaluated
+        if externals:
+            raise SyntaxError(f'EQU of {label} refers to the external symbol {externals[0][1]} on line {line_number}')
+        if relative not in (0, 1):
+            raise SyntaxError(
+                f'EQU of {label} is neither absolute nor an address in the program on line {line_number}')
+        self.define_symbol(label, value, relative == 0)
+
+    def resolve_equates(self):
+        """
+        Define the EQU symbols that referred to symbols defined after them.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        pending = self.pending_equates
+        if not pending:
+            return
+        for label in resolution_order(pending, self.symbol_table, self.external_references):
+            terms, location, line_number = pending[label]
+            evaluated = evaluate(terms, self.symbol_table, location, self.absolute_symbols, self.external_references)
+            self.define_evaluated_equate(label, evaluated, line_number)
+
+    def operand_value(self, operand, line_location):
+        """
+        Evaluate an operand that is an expression rather than a single symbol.
+
+        Parameters
+        ----------
+        operand : str
+            The operand without its index.
+
+        line_location : int
+            Address of the line, the value of `*`.
+
+        Returns
+        ----------
+        int :
+            The value, external symbols counting as 0, None if a symbol is undefined.
+
+        Raises
+        ----------
+        SyntaxError :
+            When the value is neither absolute nor an address in the program, like the
+            sum of two addresses.
+        """
+        try:
+            value, relative, _ = evaluate(parse_expression(operand), self.symbol_table, line_location,
+                                          self.absolute_symbols, self.external_references)
+        except KeyError:
+            return None
+        if relative not in (0, 1):
+            raise SyntaxError(
+                f'Expression {operand} is neither absolute nor an address in the program '
+                f'at {self.symbol_table.describe(line_location)}')
+        return value
+
+    @staticmethod
+    def referenced_symbols(line_object):
+        """
+        Find the symbols the operand of an instruction, a WORD or an EQU refers to.
+
+        Parameters
+        ----------
+        line_object : Line
+            A line of the intermediate file.
+
+        Returns
+        ----------
+        tuple :
+            The symbols, with LOCATION when the operand uses `*`. Empty for other
+            directives, literals and RSUB.
+        """
+        if line_object.label == '*' or line_object.operand is None:
+            return ()
+        operation = operation_table.get(line_object.operation_name)
+        if operation is None:
+            return ()
+        operand = line_object.operand
+        if operation.instruction is not None:
+            operand = operand.split(',')[0]
+            if operand.startswith('='):
+                return (operand,)
+        elif operation.name not in ('WORD', 'EQU') or operand.lstrip('+-').isdigit():
+            return ()
+        terms = parse_expression(operand)
+        symbols = expression_symbols(terms)
+        if any(term == LOCATION for _, term in terms):
+            symbols.append(LOCATION)
+        return tuple(symbols)
+
+    def pass_one_first_line(self, line):
+        """
+        Operate pass1 on the first line of the source code, finding the starting address and the name of the program.
+
+        Parameters
+        ----------
+        line : str
+            The first line of the source code.
+
+        Returns
+        ----------
+        generator : 
+            The first line of the intermediate file.
+        """
+        first_line = Line(line)
         label, operation_name, operand = first_line.label, first_line.operation_name, first_line.operand
 
         if operation_name is not None:
@@ -171,177 +350,357 @@ class Assembler:
         # To jump on the first line
         first_line.line_location = self.start_address
 
-        self.intermediate.append(first_line)
+        yield first_line
 
-        for line_number, line in enumerate(self.content):
-            if not self.is_empty(line) and not self.is_comment(line):
-                line_object = Line(line)
-                label, operation_name, operand = line_object.label, line_object.operation_name, line_object.operand
-                line_object.line_location = self.locctr
-
-                self.intermediate.append(line_object)
-
-                if label is not None:
-                    if label not in self.symbol_table:
-                        self.symbol_table[label] = hex(int(self.locctr))
-                    else:
-                        raise ProcessLookupError(
-                            f'No duplicate labels are allowed on line {line_number}')
-
-                if operation_name in opcode_table:
-                    self.locctr += opcode_table[operation_name].format
-                    if operand is not None and operand.startswith('='):
-                        operand = operand.replace("=", '')
-                        if operand.startswith('X'):
-                            # X means that we have literals whith half byte for each charachter
-                            literal_size = ceil((len(operand)-3)/2)
-                        elif operand.startswith('C'):
-                            literal_size = len(operand) - 3
-                            # C means that we have letters which need one byte each to be stored
-                        else:
-                            raise SyntaxError(
-                                f'Byte operand should only start with either X or C not {operand[0]} on line {line_number}')
-                        literals_list.append(('=' + operand, literal_size))
-
-                elif operation_name == 'LTORG':
-                    # remove duplicates from literal list
-                    literals_list = list(dict.fromkeys(literals_list))
-                    for literal_value, literal_size in literals_list:
-                        # Add the Literal to the symbol table
-                        self.symbol_table[literal_value] = hex(
-                            int(self.locctr))
-                        # literal_line = Line(f'* {literal_value}  .NOOPERAND')
-                        literal_line = Line('')
-                        literal_line.label = '*'
-                        literal_line.operation_name = literal_value
-                        literal_line.line_location = self.locctr
-                        self.locctr += literal_size
-                        # Add the literal to the intermediate file
-                        self.intermediate.append(literal_line)
-                    literals_list = []
-
-                elif operation_name == 'BYTE':
-                    if operand.startswith('X'):
-                        operand = operand.replace("X", '')
-                        operand = operand.replace("'", '')
-                        operand = int(operand, base=16)
-                        # hex representation has 0x extra charechters so we subtract 2 and then
-                        # divide by 2 because hex numbers needs half byte to be stored
-                        self.locctr += ceil((len(hex(operand)) - 2) / 2)
-                    elif operand.startswith('C'):
-                        operand = operand.replace("C", '')
-                        operand = operand.replace("'", '')
-                        # C means that we have letters which need one byte each to be stored
-                        self.locctr += len(operand)
-                    else:
-                        raise SyntaxError(
-                            f'Byte operand should only start with either X or C not {operand[0]} on line {line_number}')
-                elif operation_name == 'RESB':
-                    self.locctr += int(operand)
-                elif operation_name == 'WORD':
-                    self.locctr += 3
-                elif operation_name == 'RESW':
-                    self.locctr += 3 * int(operand)
-                # Program finished, Stop Reading.
-                elif operation_name == 'END':
-                    break
-                elif operation_name == 'EQU':
-                    pass
-                else:
-                    raise SyntaxError(
-                        f'Undefined operation at {hex(int(self.locctr))} on line {line_number}')
-
-        if len(literals_list) > 0:
-            # Remove duplicates
-            literals_list = list(dict.fromkeys(literals_list))
-            for literal_value, literal_size in literals_list:
-                # Add the Literal to the symbol table
-                if literal_value in self.symbol_table:
-                    continue
-                self.symbol_table[literal_value] = hex(
-                    int(self.locctr))
-                literal_line = Line('')
-                literal_line.label = '*'
-                literal_line.operation_name = literal_value
-                literal_line.line_location = self.locctr
-                self.locctr += literal_size
-                # Add the literal to the intermediate file
-                self.intermediate.append(literal_line)
-            literals_list = None  # Remove the list since we con't need it any more
+    def pass_one_line(self, line_number, line):
+        """
+        Operate pass1 on a line of the source code after the first one.
+
+        Parameters
+        ----------
+        line_number : int
+            The number of the line after the first one, used in error messages.
+
+        line : str
+            The line of the source code.
+
+        Returns
+        ----------
+        generator : 
+            The lines this line adds to the intermediate file, the literals pooled by LTORG follow it.
+        """
+        kind, label, operation_name, operand, _ = tokenize(line)
+        if kind != STATEMENT:
+            if kind == COMMENT:
+                self.comments_skipped += 1
+            return
+        line_object = Line.from_fields(label, operation_name, operand)
+        line_object.line_location = self.locctr
+
+        yield line_object
+
+        if label is not None:
+            if label in self.symbol_table or label in self.pending_equates:
+                raise ProcessLookupError(
+                    f'No duplicate labels are allowed on line {line_number}')
+            # EQU defines its label itself, with the value of its expression
+            if operation_name != 'EQU':
+                self.define_symbol(label)
+        self.line_label = label
+
+        operation = operation_table.get(operation_name)
+        if operation is None:
+            raise SyntaxError(
+                f'Undefined operation at {hex(int(self.locctr))} on line {line_number}')
+        # Sized before being added, LTORG moves the location counter past its literals itself
+        size = operation.size(self, operation, operand, line_number)
+        self.locctr += size
+        if self.pooled_lines:
+            # The literals pooled by LTORG follow it
+            yield from self.pooled_lines
+            self.pooled_lines = []
+
+    def pool_literals(self):
+        """
+        Place the literals waiting since the previous pool at the current location, for LTORG.
+
+        The lines of the literals are kept in `pooled_lines` until pass1 adds them to the intermediate file.
 
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        # remove duplicates from literal list
+        literals_list = list(dict.fromkeys(self.literals_list))
+        self.literals_list = []
+        self.ltorg_literals.append(len(literals_list))
+        for literal_value, literal_size in literals_list:
+            # Add the Literal to the symbol table
+            self.define_symbol(literal_value)
+            literal_line = Line('')
+            literal_line.label = '*'
+            literal_line.operation_name = literal_value
+            literal_line.line_location = self.locctr
+            self.locctr += literal_size
+            self.pooled_lines.append(literal_line)
+
+    def pass_one_end(self):
+        """
+        Finish pass1, pooling the remaining literals after the program and computing its length.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        generator : 
+            The lines of the remaining literals.
+        """
+        # Remove duplicates
+        literals_list = list(dict.fromkeys(self.literals_list))
+        self.literals_list = []
+        for literal_value, literal_size in literals_list:
+            # Add the Literal to the symbol table
+            if literal_value in self.symbol_table:
+                continue
+            self.define_symbol(literal_value)
+            self.end_literals += 1
+            literal_line = Line('')
+            literal_line.label = '*'
+            literal_line.operation_name = literal_value
+            literal_line.line_location = self.locctr
+            self.locctr += literal_size
+            # Add the literal to the intermediate file
+            yield literal_line
+
+        self.resolve_equates()
         self.prog_length = int(hex(self.locctr - self.start_address), 0)
 
-    def generate_objects_list(self):
+    def encode_object(self, line_object, buffer, offset):
+        """
+        Encodes the object code of a single line of the intermediate file into a buffer.
+
+        Parameters
+        ----------
+        line_object : Line
+            A line of the intermediate file.
+
+        buffer : bytearray
+            The buffer the object code is written to, usually the memory image.
+
+        offset : int
+            Position in the buffer where the object code starts.
+
+        Returns
+        ----------
+        int :
+            The number of bytes written, 0 for LTORG and END and NO_OBJECT for lines without object code.
+        """
+        if line_object.label == '*':  # Literal
+            return self.encode(LITERAL, line_object.operation_name, line_object.line_location, buffer, offset)
+        return self.encode(operation_id(line_object.operation_name), line_object.operand, line_object.line_location, buffer, offset)
+
+    def encode(self, operation, operand, line_location, buffer, offset):
+        """
+        Encodes the object code of an operation into a buffer with the encoding handler of the operation.
+
+        Parameters
+        ----------
+        operation : int
+            Id of the operation, see `utils.operation_id`.
+
+        operand : str
+            The operand, the literal itself for literals.
+
+        line_location : int
+            Address of the line, used in error messages.
+
+        buffer : bytearray
+            The buffer the object code is written to, usually the memory image.
+
+        offset : int
+            Position in the buffer where the object code starts.
+
+        Returns
+        ----------
+        int :
+            The number of bytes written, 0 for LTORG and END and NO_OBJECT for lines without object code.
+        """
+        operation = operations[operation]
+        return operation.encode(self, operation, operand, line_location, buffer, offset)
+
+    @staticmethod
+    def write_word(word, buffer, offset):
+        """
+        Writes a 3 bytes word into a buffer, most significant byte first.
+
+        Parameters
+        ----------
+        word : int
+            The 24 bits word.
+
+        buffer : bytearray
+            The buffer the word is written to.
+
+        offset : int
+            Position in the buffer where the word starts.
+
+        Returns
+        ----------
+        int :
+            The number of bytes written.
+        """
+        buffer[offset] = word >> 16
+        buffer[offset + 1] = (word >> 8) & 0xFF
+        buffer[offset + 2] = word & 0xFF
+        return 3
+
+    @staticmethod
+    def write_bytes(data, buffer, offset):
+        """
+        Writes a byte string constant into a buffer.
+
+        Parameters
+        ----------
+        data : bytes
+            The constant value.
+
+        buffer : bytearray
+            The buffer the constant is written to.
+
+        offset : int
+            Position in the buffer where the constant starts.
+
+        Returns
+        ----------
+        int :
+            The number of bytes written, NO_OBJECT for empty constants.
+        """
+        if len(data) == 0:
+            return NO_OBJECT
+        buffer[offset:offset + len(data)] = data
+        return len(data)
+
+    @staticmethod
+    def render_object_code(buffer, offset, size):
+        """
+        Renders encoded object code in the hexadecimal format of the listing file.
+
+        Parameters
+        ----------
+        buffer : bytearray
+            The buffer holding the object code.
+
+        offset : int
+            Position in the buffer where the object code starts.
+
+        size : int
+            The value returned by `encode_object`.
+
+        Returns
+        ----------
+        str :
+            The uppercase hexadecimal object code, '!' for LTORG and END and a tab for lines without object code.
+        """
+        if size == NO_OBJECT:
+            return '\t'
+        elif size == 0:
+            return '!'
+        return buffer[offset:offset + size].hex().upper()
+
+    def generate_objects_list(self, workers=1, cross_reference=None):
         """
         Generates the object code for each instruction inside the generated intermediate file.
 
         Parameters
         ----------
+        workers : int
+            Number of processes encoding shards of the intermediate file in parallel, None
+            for the number of CPUs. Programs shorter than PARALLEL_THRESHOLD lines are
+            always encoded in this process.
+
+        cross_reference : xref.CrossReferenceBuilder
+            When given, every line is added to this cross-reference index as it is encoded.
+            The lines are then encoded in this process, as in streaming mode.
+
+        Returns
+        ----------
         None
+        """
+        if cross_reference is not None:
+            self.cross_reference_objects(cross_reference)
+            return
+        if workers != 1 and len(self.intermediate) >= PARALLEL_THRESHOLD:
+            from parallel import generate_objects_list
+            return generate_objects_list(self, workers)
+        self.memory = bytearray(self.prog_length)
+        strings = self.intermediate.strings
+        memory, start_address = self.memory, self.start_address
+        for location, operation, operand in zip(self.intermediate.locations, self.intermediate.operations, self.intermediate.operands):
+            operation = operations[operation]
+            self.object_sizes.append(operation.encode(self, operation, strings[operand] if operand >= 0 else None,
+                                                      location, memory, location - start_address))
+        self.object_addresses = array('q', self.intermediate.locations)
+
+    def cross_reference_objects(self, cross_reference):
+        """
+        Generates the object code of every line like `generate_objects_list`, adding each
+        line to a cross-reference index once it is encoded.
+
+        Parameters
+        ----------
+        cross_reference : xref.CrossReferenceBuilder
+            The index being built.
 
         Returns
         ----------
         None
         """
-        for line_object in self.intermediate:
-            object_code = ''
-            line_location, label, operation_name, operand = line_object.line_location, line_object.label, line_object.operation_name, line_object.operand
-
-            if label == '*':  # Literal
-                if operation_name[1] == 'X':
-                    operation_name = operation_name.replace(
-                        "X", '').replace("'", '').replace('=', '')
-                    object_code = ''.join(
-                        [hex(int(ch))[2:].upper() for ch in operation_name])
-                elif operation_name[1] == 'C':
-                    operation_name = operation_name.replace(
-                        "C", '').replace("'", '')
-                    object_code = ''.join(
-                        [hex(ord(ch))[2:].upper() for ch in operation_name])
-            else:
-                if operation_name in opcode_table:
-                    object_code += "{0:08b}".format(
-                        int(opcode_table[operation_name].opcode, 16))
-                    if operation_name == 'RSUB':
-                        object_code += '0' * 16
-
-                    elif ',' in operand:
-                        object_code += '1'
-                        base_operand, _ = operand.split(',')
-                        object_code += "{0:015b}".format(
-                            int(self.symbol_table[base_operand], 16))
-                    else:
-                        if operand in self.symbol_table:
-                            object_code += '0'
-                            object_code += "{0:015b}".format(
-                                int(self.symbol_table[operand], 16))
-                        else:
-                            raise SyntaxError(
-                                f'Operand not fount at {line_location}')
-                else:
-                    if operation_name == 'RESW' or operation_name == 'RESB':
-                        pass
-                    elif operation_name == 'LTORG' or operation_name == 'END':
-                        object_code = '!'
-                    else:
-                        if operation_name == 'WORD':
-                            object_code += "{0:024b}".format(int(operand))
-                        elif operation_name == 'BYTE':
-                            if operand.startswith('X'):
-                                object_code = operand.replace(
-                                    "X", '').replace("'", '')
-                            elif operand.startswith('C'):
-                                operand = operand.replace(
-                                    "C", '').replace("'", '')
-                                object_code = ''.join(
-                                    [hex(ord(ch))[2:].upper() for ch in operand])
-            self.objects_list.append(object_code)
-            self.object_addresses.append(line_location)
-        self.hexify_objects_code()
-
-    def generate_text_records(self):
-        """
-        Generates the text records from the listing file.
+        self.memory = bytearray(self.prog_length)
+        intermediate = self.intermediate
+        strings = intermediate.strings
+        memory, start_address = self.memory, self.start_address
+        # Operations and operands repeat, their text and symbols are found once per pair
+        found = {}
+        for position, (location, label, operation_id, operand) in enumerate(zip(
+                intermediate.locations, intermediate.labels, intermediate.operations, intermediate.operands)):
+            operation = operations[operation_id]
+            offset = location - start_address
+            size = operation.encode(self, operation, strings[operand] if operand >= 0 else None,
+                                    location, memory, offset)
+            self.object_sizes.append(size)
+            pair = found.get((operation_id, operand))
+            if pair is None:
+                line_object = intermediate[position]
+                pair = found[operation_id, operand] = (
+                    '\t' + line_object.operation_name + '\t' + (line_object.operand or ''),
+                    [symbol for symbol in self.referenced_symbols(line_object) if symbol != LOCATION])
+            text, symbols = pair
+            label = strings[label] if label >= 0 else None
+            cross_reference.add_line(location, strings[operand] if operation_id == LITERAL else label,
+                                     (label or '') + text, symbols,
+                                     memory[offset:offset + size] if size > 0 else b'')
+        self.object_addresses = array('q', intermediate.locations)
+
+    def cross_reference_line(self, cross_reference, line_object, buffer, offset, size):
+        """
+        Add an encoded line of the intermediate file to a cross-reference index.
+
+        Parameters
+        ----------
+        cross_reference : xref.CrossReferenceBuilder
+            The index being built.
+
+        line_object : Line
+            A line of the intermediate file.
+
+        buffer : bytearray
+            The buffer holding the object code of the line.
+
+        offset : int
+            Position in the buffer where the object code starts.
+
+        size : int
+            The value returned by `encode_object`.
+
+        Returns
+        ----------
+        None
+        """
+        label, operation_name, operand = line_object.label, line_object.operation_name, line_object.operand
+        cross_reference.add_line(line_object.line_location, operation_name if label == '*' else label,
+                                 '\t'.join([label or '', operation_name, operand or '']),
+                                 [symbol for symbol in self.referenced_symbols(line_object) if symbol != LOCATION],
+                                 buffer[offset:offset + size] if size > 0 else b'')
+
+    def header_record(self):
+        """
+        Generates the header record of the object file.
 
         Parameters
         ----------
@@ -349,52 +708,546 @@ class Assembler:
 
         Returns
         ----------
+        str :
+            The header record.
+        """
+        return f'H{self.prog_name}    {self.start_address:06X}{self.prog_length:06X}'
+
+    @property
+    def is_module(self):
+        """
+        Whether the program exports or imports symbols, the object file of a module
+        has D, R and M records for the linker.
+        """
+        return bool(self.external_definitions or self.external_references)
+
+    def definition_records(self):
+        """
+        Generates the define and refer records of a module.
+
+        Parameters
+        ----------
         None
+
+        Returns
+        ----------
+        list :
+            The D records of the exported symbols then the R records of the imported ones,
+            empty for programs that are not modules.
+        """
+        if self.is_module and not self.prog_name:
+            raise SyntaxError('A module needs a name, the label of its START line')
+        records = []
+        for first in range(0, len(self.external_definitions), SYMBOLS_PER_RECORD):
+            fields = []
+            for symbol in self.external_definitions[first:first + SYMBOLS_PER_RECORD]:
+                address = self.symbol_table.get(symbol)
+                if address is None:
+                    raise SyntaxError(f'External definition {symbol} is not defined')
+                fields.append(f'{symbol:<6}{address:06X}')
+            records.append('D' + ''.join(fields))
+        references = list(self.external_references)
+        for first in range(0, len(references), SYMBOLS_PER_RECORD):
+            records.append(
+                'R' + ''.join(f'{symbol:<6}' for symbol in references[first:first + SYMBOLS_PER_RECORD]))
+        return records
+
+    def line_modification_records(self, line_object):
+        """
+        Generates the modification records relocating the address or word of a line of a module.
+
+        Parameters
+        ----------
+        line_object : Line
+            A line of the intermediate file.
+
+        Returns
+        ----------
+        list :
+            The M records adding the address of each external symbol of the operand and
+            the load address of the module when the operand is an address in it, of the
+            4 half bytes holding the index bit and the address of an instruction or of
+            the 6 half bytes of a WORD. Empty for lines without an address.
+        """
+        if line_object.label == '*' or line_object.operand is None:
+            return []
+        operation = operation_table.get(line_object.operation_name)
+        if operation is None:
+            return []
+        if operation.encode is encode_instruction:
+            operand = line_object.operand.split(',')[0]
+            location, half_bytes = line_object.line_location + 1, '04'
+            if operand in self.symbol_table:
+                return [] if operand in self.absolute_symbols else [f'M{location:06X}04+{self.prog_name}']
+            if operand in self.external_references:
+                return [f'M{location:06X}04+{operand}']
+        elif operation.encode is encode_word:
+            operand = line_object.operand
+            if operand.lstrip('+-').isdigit():
+                return []
+            location, half_bytes = line_object.line_location, '06'
+        else:
+            return []
+        _, relative, externals = evaluate(parse_expression(operand), self.symbol_table, line_object.line_location,
+                                          self.absolute_symbols, self.external_references)
+        if relative not in (0, 1):
+            raise SyntaxError(
+                f'Expression {operand} is not relocatable at {self.symbol_table.describe(line_object.line_location)}')
+        if relative:
+            externals.append(('+', self.prog_name))
+        return [f'M{location:06X}{half_bytes}{sign}{symbol}' for sign, symbol in externals]
+
+    def modification_records(self):
         """
-        self.text_records.append(
-            f'H{self.prog_name}    {"{0:06x}".format(int(hex(self.start_address), 16)).upper()}{"{0:06x}".format(int(hex(self.prog_length), 16)).upper()}')
-        j = 0
-        while j < len(self.objects_list):
-            if self.objects_list[j] == '\t':
-                j += 1
+        Generates the modification records of a module.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        list :
+            The M records in address order, empty for programs that are not modules.
+        """
+        if not self.is_module:
+            return []
+        records = []
+        for line_object in self.intermediate:
+            records.extend(self.line_modification_records(line_object))
+        return records
+
+    def end_record(self):
+        """
+        Generates the end record of the object file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        str :
+            The end record.
+        """
+        return f'E{self.start_address:06X}'
+
+    @staticmethod
+    def iter_record_bounds(spans, max_record_length=MAX_RECORD_LENGTH):
+        """
+        Splits the encoded object code into text records in a single pass.
+
+        A record ends at lines without object code (RESW, RESB, ...), at gaps between
+        addresses and when adding the next object code would make it longer than
+        `max_record_length`. Object codes longer than a whole record are split.
+
+        Parameters
+        ----------
+        spans : iterable
+            Pairs of (address, size) as returned by `encode_object`, in the intermediate file order.
+
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        Returns
+        ----------
+        generator :
+            Pairs of (starting address, length) of the text records in order.
+        """
+        start = end = None
+        for address, size in spans:
+            if size == NO_OBJECT:
+                if start is not None:
+                    yield start, end - start
+                    start = None
+                continue
+            if size == 0:  # LTORG, END
                 continue
+            if start is not None and (address != end or end - start + size > max_record_length):
+                yield start, end - start
+                start = None
+            if start is None:
+                start = end = address
+            end += size
+            while end - start > max_record_length:
+                yield start, max_record_length
+                start += max_record_length
+        if start is not None:
+            yield start, end - start
+
+    @staticmethod
+    def text_record(start, data):
+        """
+        Formats a text record.
+
+        Parameters
+        ----------
+        start : int
+            Starting address of the record.
+
+        data : bytes-like
+            The object code of the record.
+
+        Returns
+        ----------
+        str :
+            The text record.
+        """
+        return f'T{start:06X}{len(data):02X}{data.hex().upper()}'
 
-            record = ''
-            start_address = self.object_addresses[j]
-            length = 0
-            while j < len(self.objects_list) and self.objects_list[j] != '\t' and len(record + self.objects_list[j]) <= 60:
-                if self.objects_list[j] == '!':
-                    j += 1
-                    continue
-                record += self.objects_list[j]
-                j += 1
-            length = ceil(len(record) / 2)
-            length = "{0:02x}".format(length).upper()
-
-            record = 'T' + \
-                "{0:06x}".format(int(hex(start_address), 16)
-                                 ).upper() + length + record
-            self.text_records.append(record)
-        self.text_records.append(
-            f'E{"{0:06x}".format(int(hex(self.start_address), 16)).upper()}')
-
-    def pass2(self):
+    def generate_text_records(self, max_record_length=MAX_RECORD_LENGTH):
+        """
+        Generates the text records from the memory image.
+
+        Parameters
+        ----------
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        Returns
+        ----------
+        None
+        """
+        check_record_length(max_record_length)
+        memory = memoryview(self.memory)
+        self.text_records.append(self.header_record())
+        self.text_records.extend(self.definition_records())
+        for start, length in self.iter_record_bounds(zip(self.object_addresses, self.object_sizes), max_record_length):
+            offset = start - self.start_address
+            self.text_records.append(self.text_record(
+                start, memory[offset:offset + length]))
+            self.text_record_count += 1
+        self.text_records.extend(self.modification_records())
+        self.text_records.append(self.end_record())
+
+    def pass2(self, max_record_length=MAX_RECORD_LENGTH, workers=1):
         """
         Operate pass2 on the intermediate file.
 
         Parameters
         ----------
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        workers : int
+            Number of processes generating the object code, see `generate_objects_list`.
+
+        Returns
+        ----------
         None
+        """
+        self.generate_objects_list(workers)
+        self.generate_text_records(max_record_length)
+
+    def write_outputs(self, intermediate_file, listing_file, object_file):
+        """
+        Writes the intermediate, listing and object files after both passes.
+
+        Parameters
+        ----------
+        intermediate_file : file
+            The intermediate file opened for writing.
+
+        listing_file : file
+            The listing file opened for writing.
+
+        object_file : file
+            The object file opened for writing.
 
         Returns
         ----------
         None
         """
-        self.generate_objects_list()
-        self.generate_text_records()
+        write_lines(intermediate_file, map(format_line, self.intermediate))
+        # The object code column is rendered from the memory image as the lines are written
+        memory, start_address, render = self.memory, self.start_address, self.render_object_code
+        write_lines(listing_file, (format_line(line_object) + '\t' + render(memory, address - start_address, size).replace("!", '')
+                                   for line_object, address, size in zip(self.intermediate, self.object_addresses, self.object_sizes)))
+        write_lines(object_file, self.text_records)
+
+    def stream_pass_one(self, intermediate_file):
+        """
+        Operate pass1 on the source code writing the intermediate file line by line.
 
+        Parameters
+        ----------
+        intermediate_file : file
+            Opened file that the intermediate lines are spooled to.
+
+        Returns
+        ----------
+        None
+        """
+        write_lines(intermediate_file, map(format_line, self.iter_pass_one()))
+
+    def stream_pass2(self, intermediate_file, listing_file, object_file, max_record_length=MAX_RECORD_LENGTH, cross_reference=None):
+        """
+        Operate pass2 on a spooled intermediate file writing the listing and object files incrementally.
+
+        Parameters
+        ----------
+        intermediate_file : file
+            Opened file written by `stream_pass_one`, readable.
+
+        listing_file : file
+            Opened file the listing lines are written to.
+
+        object_file : file
+            Opened file the text records are written to.
+
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        cross_reference : xref.CrossReferenceBuilder
+            When given, every line is added to this cross-reference index as it is encoded.
+
+        Returns
+        ----------
+        None
+        """
+        check_record_length(max_record_length)
+        # Object code bytes that are not written to a text record yet. Text records
+        # cover every object code byte in order, so each record is a prefix of it.
+        pending = bytearray()
+        modification_records = []
+        is_module = self.is_module
+
+        def encoded_lines():
+            separator = ''
+            # Object code of one line at a time, grown by write_bytes for long constants
+            scratch = bytearray(3)
+            for line_object in read_intermediate(intermediate_file):
+                size = self.encode_object(line_object, scratch, 0)
+                listing_file.write(separator + format_line(line_object) + '\t' +
+                                   self.render_object_code(scratch, 0, size).replace("!", ''))
+                separator = '\n'
+                if size > 0:
+                    pending.extend(scratch[:size])
+                if is_module:
+                    modification_records.extend(self.line_modification_records(line_object))
+                if cross_reference is not None:
+                    self.cross_reference_line(cross_reference, line_object, scratch, 0, size)
+                yield line_object.line_location, size
+
+        intermediate_file.seek(0)
+        object_file.write('\n'.join([self.header_record()] + self.definition_records()))
+        for start, length in self.iter_record_bounds(encoded_lines(), max_record_length):
+            object_file.write('\n' + self.text_record(start, pending[:length]))
+            del pending[:length]
+            self.text_record_count += 1
+        for record in modification_records:
+            object_file.write('\n' + record)
+        object_file.write('\n' + self.end_record())
+
+
+def check_record_length(max_record_length):
+    """
+    Check that text records of the given length fit in the two hex digits length field.
+
+    Parameters
+    ----------
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+
+    Returns
+    ----------
+    None
+    """
+    if not 0 < max_record_length <= 0xFF:
+        raise ValueError(
+            f'Text record length should be between 1 and 255 bytes not {max_record_length}')
+
+
+def write_lines(output_file, lines, batch_lines=WRITE_BATCH_LINES):
+    """
+    Write lines separated by new lines, without a trailing one, a batch at a time.
+
+    Parameters
+    ----------
+    output_file : file
+        The file opened for writing.
+
+    lines : iterable
+        The lines without line breaks, consumed lazily.
+
+    batch_lines : int
+        Number of lines joined into a single write.
+
+    Returns
+    ----------
+    None
+    """
+    lines = iter(lines)
+    separator = ''
+    while True:
+        batch = list(islice(lines, batch_lines))
+        if not batch:
+            return
+        output_file.write(separator + '\n'.join(batch))
+        separator = '\n'
+
+
+def format_line(line_object):
+    """
+    Format a line as it is written to the intermediate file <Address   Instruction>.
+
+    Parameters
+    ----------
+    line_object : Line
+        A line of the intermediate file.
+
+    Returns
+    ----------
+    str :
+        The tab separated intermediate line.
+    """
+    return '\t'.join([hex(line_object.line_location).upper().replace('X', 'x'), line_object.label if line_object.label is not None else '',
+                      line_object.operation_name, line_object.operand if line_object.operand is not None else ''])
+
+
+def read_intermediate(intermediate_file):
+    """
+    Read back the lines of an intermediate file written by `format_line`.
+
+    Parameters
+    ----------
+    intermediate_file : file
+        Opened intermediate file.
+
+    Returns
+    ----------
+    generator :
+        The Line objects of the intermediate file in order.
+    """
+    for record in intermediate_file:
+        line_location, label, operation_name, operand = record.rstrip(
+            '\n').split('\t')
+        line_object = Line('')
+        line_object.label = label if label != '' else None
+        line_object.operation_name = operation_name
+        line_object.operand = operand if operand != '' else None
+        line_object.line_location = int(line_location, 16)
+        yield line_object
+
+
+def assemble_files(source_path, intermediate_output_path, listing_output_path, object_file_path, streaming=False, max_record_length=MAX_RECORD_LENGTH, cache=None, stats=None, workers=1, background_writes=False, xref_path=None):
+    """
+        Assembels the source script and writes the generated files without any console output.
+
+        Parameters
+        ----------
+        source_path : str
+            Path to the source SIC script.
+
+        intermediate_output_path : str
+            Path to the intermediate script that will be filled with the generated intermediate instructions <Address   Instruction>.
+        listing_output_path : str
+            Path to the listing script that will be filled with intermediate instructions and their object code <Address    Instruction Object code>.
+
+        object_file_path : str
+            Path to the object file where the text records will be stored.
+
+        streaming : bool
+            Read the source line by line and spool pass1 output to the intermediate file, which pass2
+            reads back to write the listing and object files incrementally. Memory stays bounded by
+            the symbol table instead of the size of the program.
+
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        cache : cache.AssemblyCache
+            When given, an unchanged source is restored from the cache instead of being assembled again.
+
+        stats : stats.RunStats
+            When given, filled with the time of each phase and the counters of the run.
 
-def assembel(source_path, intermediate_output_path, listing_output_path, object_file_path):
+        workers : int
+            Number of processes generating the object code of large programs, see
+            `Assembler.generate_objects_list`. Not used in streaming mode.
+
+        background_writes : bool
+            Write the files on background threads, so producing their content and writing it overlap.
+
+        xref_path : str
+            When given, path of the cross-reference index written alongside the listing,
+            see xref.py. It is cached with the other files.
+
+        Returns
+        ----------
+
+        assembler : Assembler
+            The assembler after operating both passes.
+        """
+    if stats is not None:
+        assembler = _assemble_files(source_path, intermediate_output_path, listing_output_path,
+                                    object_file_path, streaming, max_record_length, cache, stats.phase, workers, background_writes, xref_path)
+        stats.collect(assembler)
+        stats.count('bytes_written', sum(os.path.getsize(path) for path in (
+            intermediate_output_path, listing_output_path, object_file_path, xref_path) if path is not None))
+        return assembler
+    return _assemble_files(source_path, intermediate_output_path, listing_output_path,
+                           object_file_path, streaming, max_record_length, cache, _untimed_phase, workers, background_writes, xref_path)
+
+
+def _untimed_phase(name):
+    return nullcontext()
+
+
+def _assemble_files(source_path, intermediate_output_path, listing_output_path, object_file_path, streaming, max_record_length, cache, phase, workers, background_writes, xref_path):
+    if cache is not None:
+        with phase('cache_lookup'):
+            with open(source_path, 'rb') as source_file:
+                key = cache.key(source_file, max_record_length, xref_path is not None)
+            entry = cache.get(key, [path for path in (intermediate_output_path, listing_output_path, object_file_path, xref_path)
+                                    if path is not None])
+            if entry is not None:
+                return cache.restore(entry)
+        assembler = _assemble_files(source_path, intermediate_output_path, listing_output_path,
+                                    object_file_path, streaming, max_record_length, None, phase, workers, background_writes, xref_path)
+        with phase('cache_store'):
+            cache.put(key, cache.make_entry(assembler, intermediate_output_path,
+                      listing_output_path, object_file_path, xref_path))
+        return assembler
+
+    with open(source_path, 'r') as source_file, open(intermediate_output_path, 'w+') as intermediate_file, open(listing_output_path, 'w') as listing_file, open(object_file_path, 'w') as object_file, ExitStack() as writers:
+        assembler = Assembler(source_file)
+        intermediate_writer = intermediate_file
+        if background_writes:
+            intermediate_writer, listing_file, object_file = [writers.enter_context(BackgroundWriter(output_file))
+                                                              for output_file in (intermediate_file, listing_file, object_file)]
+        if streaming:
+            # The files are written while the passes run, their writes are part of each pass.
+            with phase('pass_one'):
+                assembler.stream_pass_one(intermediate_writer)
+                # pass2 reads the intermediate file back
+                intermediate_writer.flush()
+            cross_reference = None if xref_path is None else CrossReferenceBuilder()
+            with phase('pass_two'):
+                assembler.stream_pass2(
+                    intermediate_file, listing_file, object_file, max_record_length, cross_reference)
+                writers.close()
+            if cross_reference is not None:
+                with phase('write_xref'), open(xref_path, 'wb') as xref_file:
+                    cross_reference.write(xref_file, assembler.symbol_table, assembler.absolute_symbols)
+            return assembler
+
+        cross_reference = None if xref_path is None else CrossReferenceBuilder()
+        with phase('pass_one'):
+            assembler.pass_one()
+        with phase('generate_objects_list'):
+            assembler.generate_objects_list(workers, cross_reference)
+        with phase('generate_text_records'):
+            assembler.generate_text_records(max_record_length)
+        with phase('write_outputs'):
+            assembler.write_outputs(intermediate_writer, listing_file, object_file)
+            writers.close()
+        if cross_reference is not None:
+            with phase('write_xref'), open(xref_path, 'wb') as xref_file:
+                cross_reference.write(xref_file, assembler.symbol_table, assembler.absolute_symbols)
+        return assembler
+
+
+def assembel(source_path, intermediate_output_path, listing_output_path, object_file_path, streaming=False, max_record_length=MAX_RECORD_LENGTH, cache=None, stats=None, workers=1, background_writes=False, quiet=False, xref_path=None):
     """
         Assembels the source script.
 
@@ -411,6 +1264,33 @@ def assembel(source_path, intermediate_output_path, listing_output_path, object_
         object_file_path : str
             Path to the object file where the text records will be stored.
 
+        streaming : bool
+            Read the source line by line and spool pass1 output to the intermediate file, which pass2
+            reads back to write the listing and object files incrementally. Memory stays bounded by
+            the symbol table instead of the size of the program.
+
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        cache : cache.AssemblyCache
+            When given, an unchanged source is restored from the cache instead of being assembled again.
+
+        stats : stats.RunStats
+            When given, filled with the time of each phase and the counters of the run.
+
+        workers : int
+            Number of processes generating the object code of large programs, see
+            `Assembler.generate_objects_list`. Not used in streaming mode.
+
+        background_writes : bool
+            Write the files on background threads, so producing their content and writing it overlap.
+
+        quiet : bool
+            Do not print the symbol table.
+
+        xref_path : str
+            When given, path of the cross-reference index written alongside the listing.
+
         Returns
         ----------
 
@@ -426,34 +1306,99 @@ def assembel(source_path, intermediate_output_path, listing_output_path, object_
     if source_path == '' or intermediate_output_path == '':
         source_path = input('Enter the input source path: ')
         intermediate_output_path = input('Enter the output path: ')
-    with open(source_path, 'r') as source_file, open(intermediate_output_path, 'w') as intermediate_file, open(listing_output_path, 'w') as listing_file, open(object_file_path, 'w') as object_file:
-        assembler = Assembler(source_file)
-        assembler.pass_one()
-        assembler.pass2()
-        print('\n\nProgram Name: ' + assembler.prog_name, 'Starting Address: ' +
-              hex(assembler.start_address), 'Program Length: ' + str(assembler.prog_length) + ' bytes\n\n', sep='\n')
-
-        print('label \t address')
-        for label, label_address in assembler.symbol_table.items():
-            print(label + ' \t ' + label_address.upper().replace('X', 'x'))
-        intermediate_file_content = '\n'.join(['\t'.join([hex(line_object.line_location).upper().replace('X', 'x'), line_object.label if line_object.label is not None else '',
-                                                          line_object.operation_name, line_object.operand if line_object.operand is not None else '']) for line_object in assembler.intermediate])
+    assembler = assemble_files(source_path, intermediate_output_path, listing_output_path,
+                               object_file_path, streaming, max_record_length, cache, stats, workers, background_writes, xref_path)
+    print_summary(assembler, quiet)
+    return assembler.prog_name, assembler.prog_length,  assembler.symbol_table
 
-        listing_file_content = '\n'.join(['\t'.join([hex(line_object.line_location).upper().replace('X', 'x'), line_object.label if line_object.label is not None else '',
-                                                     line_object.operation_name, line_object.operand if line_object.operand is not None else '']) + '\t' + object_code.replace("!", '') for line_object, object_code in zip(assembler.intermediate, assembler.objects_list)])
 
-        objects_file_content = '\n'.join(assembler.text_records)
-
-        intermediate_file.write(intermediate_file_content)
-        listing_file.write(listing_file_content)
-
-        object_file.write(objects_file_content)
+def print_summary(assembler, quiet=False):
+    """
+    Print the name, starting address and length of an assembled program, then its symbol table unless `quiet`.
+    """
+    print('\n\nProgram Name: ' + assembler.prog_name, 'Starting Address: ' +
+          hex(assembler.start_address), 'Program Length: ' + str(assembler.prog_length) + ' bytes\n\n', sep='\n')
 
-        return assembler.prog_name, assembler.prog_length,  assembler.symbol_table
+    if not quiet:
+        print('label \t address')
+        # One write for the whole table, printing line by line is slow when stdout is a pipe.
+        sys.stdout.write(''.join([f'{label} \t {hex(label_address).upper().replace("X", "x")}\n'
+                                  for label, label_address in assembler.symbol_table.items()]))
 
 
 if __name__ == "__main__":
-    if len(sys.argv) == 5:
-        _, input_script_path, intermediate_path, listing_path, object_path = sys.argv
-        assembel(input_script_path, intermediate_path,
-                 listing_path, object_path)
+    parser = argparse.ArgumentParser(
+        description='Assembles a SIC source script.')
+    parser.add_argument('input_script_path')
+    parser.add_argument('intermediate_path')
+    parser.add_argument('listing_path')
+    parser.add_argument('object_path')
+    parser.add_argument('--stream', action='store_true',
+                        help='assemble in bounded memory by streaming the intermediate file between the passes')
+    parser.add_argument('--record-length', type=int, default=MAX_RECORD_LENGTH,
+                        help='maximum number of object code bytes in a text record (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help=f'number of processes generating the object code of programs over {PARALLEL_THRESHOLD} lines, 0 for the number of CPUs (default: %(default)s)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='reuse the results of unchanged sources from the cache directory DIR')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                        help='size limit of the cache directory (default: %(default)s MB)')
+    parser.add_argument('--watch', action='store_true',
+                        help='reassemble incrementally every time the source changes, until interrupted')
+    parser.add_argument('--interval', type=float, default=0.05, metavar='SECONDS',
+                        help='time between two checks of the source in watch mode (default: %(default)s)')
+    parser.add_argument('--image', metavar='PATH',
+                        help='also write the program as a binary image to PATH, see image.py')
+    parser.add_argument('--background-writes', action='store_true',
+                        help='write the generated files on background threads')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not print the symbol table')
+    parser.add_argument('--xref', metavar='PATH',
+                        help='also write a cross-reference index of the symbols and addresses to PATH, see xref.py')
+    parser.add_argument('--symbols', metavar='PATH',
+                        help='also save the symbol table to PATH, see symbols.py')
+    parser.add_argument('--stats', metavar='PATH',
+                        help='write the time of each phase and the counters of the run as JSON to PATH, - for stdout')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='profile the phases with cProfile and write the pstats file to PATH')
+    args = parser.parse_args()
+    if args.watch:
+        from incremental import watch
+        try:
+            watch(args.input_script_path, args.intermediate_path, args.listing_path,
+                  args.object_path, args.record_length, args.interval)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    cache = None
+    if args.cache:
+        from cache import AssemblyCache
+        cache = AssemblyCache(args.cache, args.cache_size * 1024 * 1024)
+    stats = None
+    if args.stats or args.profile:
+        from stats import RunStats
+        stats = RunStats(profile=args.profile is not None)
+    assembler = assemble_files(args.input_script_path, args.intermediate_path,
+                               args.listing_path, args.object_path, streaming=args.stream, max_record_length=args.record_length, cache=cache, stats=stats, workers=args.workers or None,
+                               background_writes=args.background_writes, xref_path=args.xref)
+    print_summary(assembler, args.quiet)
+    if args.symbols:
+        with open(args.symbols, 'wb') as symbols_file:
+            assembler.symbol_table.save(symbols_file)
+    if args.image:
+        from image import object_to_image, write_assembler_image
+        try:
+            if args.stream or len(assembler.memory) != assembler.prog_length:
+                # Streaming runs and cache hits keep no memory image, the object file holds it
+                object_to_image(args.object_path, args.image)
+            else:
+                write_assembler_image(assembler, args.image)
+        except ValueError as error:
+            sys.exit(f'Error: {error}')
+    if args.profile:
+        stats.dump_profile(args.profile)
+    if args.stats == '-':
+        stats.dump(sys.stdout)
+    elif args.stats:
+        with open(args.stats, 'w') as stats_file:
+            stats.dump(stats_file)
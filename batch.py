@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from assembler import assemble_files, MAX_RECORD_LENGTH
+from cache import AssemblyCache
+
+# Names of the files generated in the output directory of each source
+INTERMEDIATE_NAME = 'intermediate.mdt'
+LISTING_NAME = 'listing.lst'
+OBJECT_NAME = 'object_file.obj'
+
+# Summary of the assembly of a single source file
+AssemblyResult = namedtuple('AssemblyResult', [
+                            'source_path', 'output_dir', 'prog_name', 'prog_length', 'symbol_count', 'error'])
+
+
+def assemble_one(source_path, output_dir, streaming=False, max_record_length=MAX_RECORD_LENGTH, cache=None):
+    """
+    Assembles a single source file into its own output directory.
+
+    Parameters
+    ----------
+    source_path : str
+        Path to the source SIC script.
+
+    output_dir : str
+        Directory the intermediate, listing and object files are written to.
+
+    streaming : bool
+        Assemble in bounded memory, see `assembler.assemble_files`.
+
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+
+    cache : cache.AssemblyCache
+        When given, an unchanged source is restored from the cache.
+
+    Returns
+    ----------
+    AssemblyResult :
+        The summary of the assembly, with the error message if it failed.
+    """
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        assembler = assemble_files(source_path, os.path.join(output_dir, INTERMEDIATE_NAME), os.path.join(output_dir, LISTING_NAME),
+                                   os.path.join(output_dir, OBJECT_NAME), streaming, max_record_length, cache)
+    except Exception as error:
+        return AssemblyResult(source_path, output_dir, None, None, None, f'{type(error).__name__}: {error}')
+    return AssemblyResult(source_path, output_dir, assembler.prog_name, assembler.prog_length, len(assembler.symbol_table), None)
+
+
+def _assemble_task(task):
+    return assemble_one(*task)
+
+
+def output_dirs(paths, out_dir):
+    """
+    Give every source file its own output directory named after it.
+
+    Parameters
+    ----------
+    paths : list
+        Paths to the source SIC scripts.
+
+    out_dir : str
+        Directory holding the output directories.
+
+    Returns
+    ----------
+    list :
+        The output directory of each source, sources with the same name get a numbered suffix.
+    """
+    # Every name given so far, suffixed ones included, and the last suffix tried for each base name
+    taken = set()
+    suffixes = {}
+    dirs = []
+    for path in paths:
+        base = name = os.path.splitext(os.path.basename(path))[0]
+        while name in taken:
+            suffixes[base] = suffixes.get(base, 1) + 1
+            name = f'{base}-{suffixes[base]}'
+        taken.add(name)
+        dirs.append(os.path.join(out_dir, name))
+    return dirs
+
+
+def assemble_many(paths, out_dir, workers=None, streaming=False, max_record_length=MAX_RECORD_LENGTH, cache=None):
+    """
+    Assembles many source files across a pool of processes.
+
+    A failing source does not stop the batch, its error is reported in its summary.
+
+    Parameters
+    ----------
+    paths : list
+        Paths to the source SIC scripts.
+
+    out_dir : str
+        Directory holding one output directory per source.
+
+    workers : int
+        Number of worker processes, defaults to the number of CPUs. With 1 the
+        sources are assembled in the calling process.
+
+    streaming : bool
+        Assemble each source in bounded memory, see `assembler.assemble_files`.
+
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+
+    cache : cache.AssemblyCache
+        When given, unchanged sources are restored from the cache, which is shared by the workers.
+
+    Returns
+    ----------
+    list :
+        The AssemblyResult of each source in the order of `paths`.
+    """
+    paths = list(paths)
+    tasks = [(path, output_dir, streaming, max_record_length, cache)
+             for path, output_dir in zip(paths, output_dirs(paths, out_dir))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        return [_assemble_task(task) for task in tasks]
+    # Send the small tasks in chunks to keep the inter process traffic low.
+    chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_assemble_task, tasks, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Assembles many SIC source scripts in parallel.')
+    parser.add_argument('out_dir')
+    parser.add_argument('sources', nargs='+')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--stream', action='store_true',
+                        help='assemble each source in bounded memory')
+    parser.add_argument('--record-length', type=int, default=MAX_RECORD_LENGTH,
+                        help='maximum number of object code bytes in a text record (default: %(default)s)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='reuse the results of unchanged sources from the cache directory DIR')
+    parser.add_argument('--json', metavar='PATH',
+                        help='write the per file summary as JSON to PATH, - for stdout')
+    args = parser.parse_args()
+
+    results = assemble_many(args.sources, args.out_dir, args.workers,
+                            args.stream, args.record_length, AssemblyCache(args.cache) if args.cache else None)
+    failed = [result for result in results if result.error is not None]
+    if args.json == '-':
+        json.dump([result._asdict() for result in results], sys.stdout, indent=1)
+    else:
+        if args.json:
+            with open(args.json, 'w') as json_file:
+                json.dump([result._asdict()
+                          for result in results], json_file, indent=1)
+        for result in results:
+            if result.error is None:
+                print(f'{result.source_path} \t {result.prog_name} \t {result.prog_length} bytes \t {result.symbol_count} symbols')
+            else:
+                print(f'{result.source_path} \t {result.error}')
+        print(f'\n{len(results) - len(failed)} assembled, {len(failed)} failed')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,157 @@
+"""
+Compares the integer object code encoder with the binary string pipeline it replaced.
+
+Usage: python -m benchmarks.encoder [instructions] [repeat]
+"""
+import io
+import sys
+import time
+from array import array
+from assembler import Assembler
+
+
+def synthetic_source(instructions):
+    """
+    Generate a SIC program with a data area followed by `instructions` instructions.
+
+    Parameters
+    ----------
+    instructions : int
+        Number of instructions in the program.
+
+    Returns
+    ----------
+    str :
+        The source of the program.
+    """
+    operations = ['LDA', 'STA', 'ADD', 'COMP', 'JEQ', 'LDCH', 'STCH', 'TIX']
+    lines = ['BENCH    START  0']
+    lines += [f'D{i}     WORD   {i}' for i in range(64)]
+    lines.append("MSG      BYTE   C'HELLO'")
+    lines.append('BUF      RESB   256')
+    for i in range(instructions):
+        operation_name = operations[i % len(operations)]
+        operand = 'BUF,X' if operation_name in (
+            'LDCH', 'STCH') else f'D{i % 64}'
+        lines.append(f'         {operation_name}    {operand}')
+    lines.append('         END    BENCH')
+    return '\n'.join(lines)
+
+
+# Operation codes of the SIC instructions as the binary string pipeline kept them, in hexadecimal strings
+LEGACY_OPCODE_TABLE = {'ADD': '18', 'AND': '40', 'COMP': '28', 'DIV': '24', 'J': '3C', 'JEQ': '30',
+                       'JGT': '34', 'JLT': '38', 'JSUB': '48', 'LDA': '00', 'LDCH': '50', 'LDL': '08',
+                       'LDX': '04', 'OR': '44', 'RD': 'D8', 'RSUB': '4C', 'STA': '0C',
+                       'STCH': '54', 'STL': '14', 'STSW': 'E8', 'STX': '10', 'SUB': '1C', 'TD': 'E0',
+                       'TIX': '2C', 'WD': 'DC'}
+
+
+def legacy_symbol_table(assembler):
+    """
+    The symbol table of an assembler with the addresses as hexadecimal strings, as the
+    binary string pipeline kept them.
+    """
+    return {label: hex(address) for label, address in assembler.symbol_table.items()}
+
+
+def legacy_objects_list(intermediate, symbol_table):
+    """
+    The object code generation of the binary string pipeline, kept for comparison.
+
+    It only relies on its own operation code table and the symbol table it is given,
+    so changes to the current encoder do not change what it measures.
+
+    Parameters
+    ----------
+    intermediate : iterable
+        The lines of pass1, with `operation_name` and `operand` attributes.
+
+    symbol_table : dict
+        Hexadecimal string address of each symbol, see `legacy_symbol_table`.
+
+    Returns
+    ----------
+    list :
+        The hexified object codes.
+    """
+    objects_list = []
+    for line_object in intermediate:
+        object_code = ''
+        operation_name, operand = line_object.operation_name, line_object.operand
+        if operation_name in LEGACY_OPCODE_TABLE:
+            object_code += "{0:08b}".format(
+                int(LEGACY_OPCODE_TABLE[operation_name], 16))
+            if operation_name == 'RSUB':
+                object_code += '0' * 16
+            elif ',' in operand:
+                object_code += '1'
+                base_operand, _ = operand.split(',')
+                object_code += "{0:015b}".format(
+                    int(symbol_table[base_operand], 16))
+            else:
+                object_code += '0'
+                object_code += "{0:015b}".format(
+                    int(symbol_table[operand], 16))
+        elif operation_name == 'LTORG' or operation_name == 'END':
+            object_code = '!'
+        elif operation_name == 'WORD':
+            object_code += "{0:024b}".format(int(operand))
+        elif operation_name == 'BYTE':
+            if operand.startswith('X'):
+                object_code = operand.replace("X", '').replace("'", '')
+            elif operand.startswith('C'):
+                object_code = ''.join([hex(ord(ch))[2:].upper()
+                                      for ch in operand.replace("C", '').replace("'", '')])
+        objects_list.append(object_code)
+    return ['\t' if obj == '' else "{:08x}".format(int(obj, 2))[2:].upper(
+    ) if len(obj) == 24 else obj.replace("3D", '') for obj in objects_list]
+
+
+def best_of(repeat, function):
+    """
+    Time a function.
+
+    Parameters
+    ----------
+    repeat : int
+        Number of runs.
+
+    function : callable
+        The function to time.
+
+    Returns
+    ----------
+    float :
+        The fastest run in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(instructions=100000, repeat=5):
+    assembler = Assembler(io.StringIO(synthetic_source(instructions)))
+    assembler.pass_one()
+
+    def integer_encoder():
+        assembler.object_sizes = array('l')
+        assembler.generate_objects_list()
+
+    symbol_table = legacy_symbol_table(assembler)
+    legacy = best_of(repeat, lambda: legacy_objects_list(assembler.intermediate, symbol_table))
+    current = best_of(repeat, integer_encoder)
+    assert legacy_objects_list(assembler.intermediate, symbol_table) == [
+        assembler.render_object_code(assembler.memory, address - assembler.start_address, size)
+        for address, size in zip(assembler.object_addresses, assembler.object_sizes)]
+    lines = len(assembler.intermediate)
+    print(f'{lines} lines')
+    print(f'binary strings : {legacy:.3f} s  {lines / legacy:,.0f} lines/s')
+    print(f'integer encoder: {current:.3f} s  {lines / current:,.0f} lines/s')
+    print(f'speedup        : {legacy / current:.2f}x')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,40 @@
+"""
+Measures how the time to resolve chains of forward EQU references grows with their length.
+
+Usage: python -m benchmarks.expressions [symbols] [repeat]
+"""
+import sys
+from assembler import Assembler
+from benchmarks.encoder import best_of
+
+
+def chained_source(count):
+    """
+    A program where each EQU refers to the next one, defined after it, down to a label at the end.
+    """
+    lines = ['CHAIN    START  0',
+             '         LDA    E0']
+    lines += [f'E{index}    EQU    E{index + 1}+1' for index in range(count - 1)]
+    lines.append(f'E{count - 1}    EQU    BASE-{count}')
+    lines.append('BASE     RESW   1')
+    lines.append('         END    CHAIN')
+    return lines
+
+
+def pass_one(lines):
+    assembler = Assembler(lines)
+    assembler.pass_one()
+    return assembler
+
+
+def main(symbols=80000, repeat=3):
+    for count in (symbols // 8, symbols // 4, symbols // 2, symbols):
+        lines = chained_source(count)
+        assembler = pass_one(lines)
+        assert assembler.symbol_table['E0'] == assembler.symbol_table['BASE'] - 1
+        seconds = best_of(repeat, lambda: pass_one(lines))
+        print(f'{count:>7} chained EQU: {seconds * 1000:8.1f} ms  {seconds / count * 1e6:6.2f} us per symbol')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,179 @@
+"""
+Seeded generator of valid SIC programs of any size.
+
+Usage: python -m benchmarks.generator output_path lines [--seed N] [--label-density P] ...
+"""
+import random
+import argparse
+
+# Highest address an instruction operand can hold
+MAX_ADDRESS = 0x7FFF
+# Number of WORD constants in the data area, referenced by the instructions
+DATA_WORDS = 128
+# Size of the buffer in the data area, referenced by the indexed instructions
+BUFFER_SIZE = 1024
+# Code labels kept as jump targets
+MAX_TARGETS = 1024
+
+MEMORY_OPERATIONS = ['LDA', 'LDX', 'LDL', 'STA', 'STX', 'STL', 'ADD', 'SUB', 'DIV', 'COMP', 'AND', 'OR', 'TIX']
+INDEXED_OPERATIONS = ['LDCH', 'STCH', 'LDA', 'STA', 'ADD', 'COMP']
+JUMP_OPERATIONS = ['J', 'JEQ', 'JGT', 'JLT', 'JSUB']
+CHARACTERS = 'ABDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def literal_operand(rng):
+    """
+    Pick a literal, drawn from a small set so that the pools hold duplicates.
+
+    Returns
+    ----------
+    tuple :
+        The literal and its size in bytes.
+    """
+    value = rng.randrange(64)
+    if value % 2:
+        return f"=X'{value:02X}{value * 3 % 256:02X}'", 2
+    text = ''.join(CHARACTERS[(value + i) % len(CHARACTERS)] for i in range(3))
+    return f"=C'{text}'", 3
+
+
+def generate_program(lines, seed=0, label_density=0.2, literal_frequency=0.05, ltorg_every=256,
+                     indexed_ratio=0.1, reserve_ratio=0.02):
+    """
+    Generate the lines of a valid SIC program.
+
+    The program starts with a data area that every instruction operand points to, so
+    operands stay addressable in 15 bits however long the program is. Jumps only go to
+    code labels below that limit and literals are only used while their pool is
+    addressable, past it the instructions use the data area instead.
+
+    Parameters
+    ----------
+    lines : int
+        Approximate number of lines of the program.
+
+    seed : int
+        Seed of the random generator, the same seed gives the same program.
+
+    label_density : float
+        Probability that an instruction has a label.
+
+    literal_frequency : float
+        Probability that an instruction has a literal operand.
+
+    ltorg_every : int
+        Number of statements between two LTORG directives.
+
+    indexed_ratio : float
+        Probability that an instruction uses indexed addressing.
+
+    reserve_ratio : float
+        Probability that a statement is a RESB or RESW gap.
+
+    Returns
+    ----------
+    generator :
+        The lines of the program, without line breaks.
+    """
+    if ltorg_every < 1:
+        raise ValueError(f'LTORG interval should be positive not {ltorg_every}')
+    rng = random.Random(seed)
+    yield 'BENCH    START  0'
+    locctr = 0
+    for i in range(DATA_WORDS):
+        yield f'D{i:<7} WORD   {rng.randrange(-1000, 4096)}'
+        locctr += 3
+    yield "MSG      BYTE   C'HELLO'"
+    yield "HEX      BYTE   X'F1E2D3'"
+    yield f'BUF      RESB   {BUFFER_SIZE}'
+    locctr += 5 + 3 + BUFFER_SIZE
+
+    targets = []
+    statements = max(0, lines - DATA_WORDS - 5)
+    label_count = 0
+    while statements > 0:
+        # Generate a segment up to the next LTORG, its literals are replaced by data
+        # references if the pool would land past the addressable range.
+        segment = []
+        literals = {}
+        for _ in range(min(ltorg_every, statements)):
+            label = ''
+            if rng.random() < label_density:
+                label = f'L{label_count}'
+                label_count += 1
+                if locctr <= MAX_ADDRESS and len(targets) < MAX_TARGETS:
+                    targets.append(label)
+            draw = rng.random()
+            if draw < reserve_ratio:
+                if rng.random() < 0.5:
+                    count = rng.randint(1, 256)
+                    segment.append((f'{label:<8} RESB   {count}', None))
+                    locctr += count
+                else:
+                    count = rng.randint(1, 64)
+                    segment.append((f'{label:<8} RESW   {count}', None))
+                    locctr += 3 * count
+                continue
+            draw = rng.random()
+            fallback = None
+            if draw < literal_frequency:
+                operand, size = literal_operand(rng)
+                literals[operand] = size
+                operation_name = 'LDA'
+                fallback = f'{label:<8} LDA    D{rng.randrange(DATA_WORDS)}'
+            elif draw < literal_frequency + indexed_ratio:
+                operation_name = rng.choice(INDEXED_OPERATIONS)
+                operand = 'BUF,X'
+            elif targets and draw < literal_frequency + indexed_ratio + 0.15:
+                operation_name = rng.choice(JUMP_OPERATIONS)
+                operand = rng.choice(targets)
+            elif draw > 0.995 and not label:
+                operation_name, operand = 'RSUB', ''
+            else:
+                operation_name = rng.choice(MEMORY_OPERATIONS)
+                operand = f'D{rng.randrange(DATA_WORDS)}'
+            segment.append((f'{label:<8} {operation_name:<6} {operand}'.rstrip(), fallback))
+            locctr += 3
+        statements -= len(segment)
+
+        pooled = locctr + sum(literals.values()) - 1 <= MAX_ADDRESS
+        for line, fallback in segment:
+            yield line if pooled or fallback is None else fallback
+        if pooled and literals:
+            yield '         LTORG'
+            locctr += sum(literals.values())
+    yield '         END    BENCH'
+
+
+def write_program(path, lines, **options):
+    """
+    Write a generated program to a file, see `generate_program` for the options.
+
+    Returns
+    ----------
+    int :
+        The number of written lines.
+    """
+    count = 0
+    with open(path, 'w') as source_file:
+        for line in generate_program(lines, **options):
+            source_file.write(line + '\n')
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Generates a valid SIC program for benchmarking.')
+    parser.add_argument('output_path')
+    parser.add_argument('lines', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label-density', type=float, default=0.2)
+    parser.add_argument('--literal-frequency', type=float, default=0.05)
+    parser.add_argument('--ltorg-every', type=int, default=256)
+    parser.add_argument('--indexed-ratio', type=float, default=0.1)
+    parser.add_argument('--reserve-ratio', type=float, default=0.02)
+    args = parser.parse_args()
+    write_program(args.output_path, args.lines, seed=args.seed, label_density=args.label_density,
+                  literal_frequency=args.literal_frequency, ltorg_every=args.ltorg_every,
+                  indexed_ratio=args.indexed_ratio, reserve_ratio=args.reserve_ratio)
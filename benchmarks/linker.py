@@ -0,0 +1,37 @@
+"""
+Measures how the time to link grows with the number of modules.
+
+Usage: python -m benchmarks.linker [modules] [repeat]
+"""
+import io
+import sys
+from linker import ObjectModule, link
+from benchmarks.encoder import best_of
+
+
+def module_object(index, count):
+    """
+    The object file of a small module exporting one symbol and importing the one of the next module.
+    """
+    return (f'HM{index:<5}    000000000009\n'
+            f'DS{index:<5}000003\n'
+            f'RS{(index + 1) % count:<5}\n'
+            f'T00000009000003000000{index % 256:02X}0000\n'
+            f'M00000104+M{index}\n'
+            f'M00000404+S{(index + 1) % count}\n'
+            f'E000000')
+
+
+def main(modules=2000, repeat=3):
+    for count in (modules // 8, modules // 4, modules // 2, modules):
+        texts = [module_object(index, count) for index in range(count)]
+
+        def read_and_link():
+            return link([ObjectModule(io.StringIO(text)) for text in texts], 0)
+
+        seconds = best_of(repeat, read_and_link)
+        print(f'{count:>6} modules: {seconds * 1000:8.1f} ms  {seconds / count * 1e6:6.1f} us per module')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
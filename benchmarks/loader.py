@@ -0,0 +1,50 @@
+"""
+Compares loading a program from its binary image with parsing its text records.
+
+Usage: python -m benchmarks.loader [lines] [repeat]
+"""
+import os
+import sys
+import tempfile
+from assembler import assemble_files
+from image import ProgramImage, read_object_file, object_to_image
+from benchmarks.encoder import best_of
+from benchmarks.generator import write_program
+
+
+def main(lines=200000, repeat=5):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, name) for name in (
+            'bench.asm', 'bench.mdt', 'bench.lst', 'bench.obj', 'bench.img')]
+        source_path, intermediate_path, listing_path, object_path, image_path = paths
+        write_program(source_path, lines, reserve_ratio=0.05)
+        assemble_files(source_path, intermediate_path, listing_path, object_path)
+        object_to_image(object_path, image_path)
+
+        def parse_records():
+            with open(object_path, 'r') as object_file:
+                return read_object_file(object_file)
+
+        def map_image():
+            with ProgramImage(image_path) as image:
+                return len(image)
+
+        def map_segments():
+            with ProgramImage(image_path) as image:
+                return len(image.segments)
+
+        with ProgramImage(image_path) as image:
+            segments = [(address, bytes(data)) for address, data in image.segments]
+        assert [(address, bytes(data)) for address, data in parse_records()[4]] == segments
+        parsing = best_of(repeat, parse_records)
+        mapping = best_of(repeat, map_image)
+        viewing = best_of(repeat, map_segments)
+        print(f'{sum(len(data) for _, data in segments):,} bytes of object code in {len(segments)} segments')
+        print(f'object file: {os.path.getsize(object_path):>12,} bytes  {parsing * 1000:8.3f} ms')
+        print(f'image      : {os.path.getsize(image_path):>12,} bytes  {mapping * 1000:8.3f} ms  '
+              f'{viewing * 1000:.3f} ms with a view of every segment')
+        print(f'speedup    : {parsing / mapping:.0f}x  {parsing / viewing:.0f}x with the views')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,69 @@
+"""
+Compares memoized macro expansion with expanding every invocation, and measures the
+cost of the macro stage on a source without macros.
+
+Usage: python -m benchmarks.macros [invocations] [repeat]
+"""
+import sys
+import macros
+from macros import MacroProcessor
+from benchmarks.encoder import best_of
+from benchmarks.generator import generate_program
+
+DEFINITIONS = """COPY     START  1000
+WRBUFF   MACRO  &OUTDEV,&BUFADR,&RECLTH
+         LDX    ZERO
+$LOOP    TD     =X'&OUTDEV'
+         JEQ    $LOOP
+         LDCH   &BUFADR,X
+         WD     =X'&OUTDEV'
+         TIX    &RECLTH
+         JLT    $LOOP
+         MEND
+SAVE     MACRO  &FROM,&TO
+         LDA    &FROM
+         STA    &TO
+         LDX    &FROM
+         STX    &TO
+         MEND""".split('\n')
+
+
+def invocations(count):
+    """
+    Source lines invoking the macros with a few distinct argument lists.
+    """
+    for index in range(count):
+        if index % 2:
+            yield f'         WRBUFF 0{index % 4},BUFFER,LENGTH'
+        else:
+            yield f'         SAVE   D{index % 8},D{index % 8 + 1}'
+
+
+def expand(lines, cached_expansions):
+    maximum = macros.MAX_CACHED_EXPANSIONS
+    macros.MAX_CACHED_EXPANSIONS = cached_expansions
+    try:
+        processor = MacroProcessor()
+        return sum(1 for _ in processor.expand(lines)), processor
+    finally:
+        macros.MAX_CACHED_EXPANSIONS = maximum
+
+
+def main(count=50000, repeat=3):
+    lines = DEFINITIONS + list(invocations(count))
+    generated, processor = expand(lines, macros.MAX_CACHED_EXPANSIONS)
+    assert expand(lines, 0)[0] == generated
+    memoized = best_of(repeat, lambda: expand(lines, macros.MAX_CACHED_EXPANSIONS))
+    uncached = best_of(repeat, lambda: expand(lines, 0))
+    print(f'{processor.expansions:,} expansions, {processor.hit_rate:.1%} cache hits, {generated:,} lines generated')
+    print(f'expanding every invocation: {uncached:.3f} s')
+    print(f'memoized expansions       : {memoized:.3f} s  {uncached / memoized:.2f}x')
+
+    program = list(generate_program(count * 4))
+    plain = best_of(repeat, lambda: sum(1 for _ in program))
+    passthrough = best_of(repeat, lambda: sum(1 for _ in MacroProcessor().expand(program)))
+    print(f'{len(program):,} lines without macros: {plain:.3f} s read, {passthrough:.3f} s through the macro stage')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,54 @@
+"""
+Compares starting a new assembler process per source with sending the sources to a resident server.
+
+Usage: python -m benchmarks.server [sources] [lines]
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+import client
+from server import AssemblerServer
+from benchmarks.generator import write_program
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(sources=20, lines=200):
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'bench.asm')
+        write_program(source_path, lines)
+        outputs = [os.path.join(directory, name) for name in ('bench.mdt', 'bench.lst', 'bench.obj')]
+        socket_path = os.path.join(directory, 'assembler.sock')
+
+        start = time.perf_counter()
+        for _ in range(sources):
+            subprocess.run([sys.executable, os.path.join(PACKAGE_DIR, 'assembler.py'), source_path, *outputs, '-q'],
+                           check=True, stdout=subprocess.DEVNULL)
+        processes = time.perf_counter() - start
+
+        with AssemblerServer(socket_path, workers=1) as server:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            start = time.perf_counter()
+            for _ in range(sources):
+                subprocess.run([sys.executable, os.path.join(PACKAGE_DIR, 'client.py'), socket_path, 'assemble',
+                                source_path, *outputs, '-q'], check=True, stdout=subprocess.DEVNULL)
+            client_processes = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(sources):
+                assert client.assemble(socket_path, source_path, *outputs)['ok']
+            requests = time.perf_counter() - start
+            server.shutdown()
+            thread.join()
+
+        print(f'{sources} sources of {lines} lines')
+        print(f'assembler.py per source: {processes / sources * 1000:8.1f} ms')
+        print(f'client.py per source   : {client_processes / sources * 1000:8.1f} ms  {processes / client_processes:.1f}x')
+        print(f'client.assemble        : {requests / sources * 1000:8.1f} ms  {processes / requests:.1f}x')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
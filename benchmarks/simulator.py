@@ -0,0 +1,69 @@
+"""
+Compares running a program from the predecoded instruction cache with decoding every instruction.
+
+Usage: python -m benchmarks.simulator [rounds] [repeat]
+"""
+import io
+import sys
+from assembler import Assembler
+from simulator import Machine, HALT_ADDRESS
+from benchmarks.encoder import best_of
+
+# Adds 1 to SUM 1000 times per round, ROUNDS is patched in before assembling
+PROGRAM = """BENCH    START  1000
+FIRST    LDA    ROUNDS
+         STA    LEFT
+OUTER    LDX    ZERO
+INNER    LDA    SUM
+         ADD    ONE
+         STA    SUM
+         TIX    COUNT
+         JLT    INNER
+         LDA    LEFT
+         SUB    ONE
+         STA    LEFT
+         COMP   ZERO
+         JGT    OUTER
+HALT     J      HALT
+ZERO     WORD   0
+ONE      WORD   1
+COUNT    WORD   1000
+ROUNDS   WORD   {rounds}
+LEFT     RESW   1
+SUM      WORD   0
+         END    FIRST
+"""
+
+
+def load(rounds):
+    assembler = Assembler(io.StringIO(PROGRAM.format(rounds=rounds)))
+    assembler.pass_one()
+    assembler.pass2()
+    machine = Machine()
+    machine.load_assembler(assembler)
+    return machine
+
+
+def decode_every_instruction(machine):
+    decode = machine.decode
+    pc = machine.pc
+    executed = 0
+    while pc != HALT_ADDRESS:
+        pc = decode(pc)()
+        executed += 1
+    return executed
+
+
+def main(rounds=200, repeat=3):
+    instructions = load(rounds).run()
+    assert decode_every_instruction(load(rounds)) == instructions
+    cached = best_of(repeat, lambda: load(rounds).run())
+    decoding = best_of(repeat, lambda: decode_every_instruction(load(rounds)))
+    print(f'{instructions:,} instructions')
+    print(f'decoding every instruction: {decoding:.3f} s  {instructions / decoding:,.0f} instructions/s')
+    print(f'predecoded cache          : {cached:.3f} s  {instructions / cached:,.0f} instructions/s')
+    print(f'speedup                   : {decoding / cached:.2f}x')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,182 @@
+"""
+Times the phases of the assembler on generated programs and compares them with a baseline.
+
+Usage: python -m benchmarks.suite [--lines N ...] [--baseline PATH] [--save PATH]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from assembler import Assembler
+from benchmarks.generator import write_program
+
+# Timings shorter than this are too noisy to be compared with the baseline
+MIN_SECONDS = 0.005
+PHASES = ['pass_one', 'generate_objects_list', 'generate_text_records', 'write_outputs']
+# Baseline shipped with the repository
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Shapes of the generated programs, see `benchmarks.generator.generate_program`
+WORKLOADS = {
+    'default': {},
+    'dense-labels': {'label_density': 0.9},
+    'literals': {'literal_frequency': 0.3, 'ltorg_every': 32},
+    'indexed': {'indexed_ratio': 0.6},
+    'gaps': {'reserve_ratio': 0.2},
+}
+
+
+def run_phases(source_path, output_dir, trace=False):
+    """
+    Assemble a source once, measuring each phase.
+
+    Parameters
+    ----------
+    source_path : str
+        Path to the source SIC script.
+
+    output_dir : str
+        Directory the generated files are written to.
+
+    trace : bool
+        Measure the peak memory allocated by each phase instead of its time, tracing
+        the allocations slows the assembler down so both are not measured at once.
+
+    Returns
+    ----------
+    dict :
+        The time in seconds or the peak memory in bytes of each phase.
+    """
+    results = {}
+    with open(source_path, 'r') as source_file, open(os.path.join(output_dir, 'bench.mdt'), 'w') as intermediate_file, open(os.path.join(output_dir, 'bench.lst'), 'w') as listing_file, open(os.path.join(output_dir, 'bench.obj'), 'w') as object_file:
+        assembler = Assembler(source_file)
+        phases = [assembler.pass_one, assembler.generate_objects_list, assembler.generate_text_records,
+                  lambda: assembler.write_outputs(intermediate_file, listing_file, object_file)]
+        if trace:
+            tracemalloc.start()
+        for phase, function in zip(PHASES, phases):
+            if trace:
+                tracemalloc.reset_peak()
+                function()
+                results[phase] = tracemalloc.get_traced_memory()[1]
+            else:
+                start = time.perf_counter()
+                function()
+                results[phase] = time.perf_counter() - start
+        if trace:
+            results['total'] = max(results.values())
+            tracemalloc.stop()
+        else:
+            results['total'] = sum(results.values())
+    return results
+
+
+def run_workload(lines, seed=0, repeat=3, **options):
+    """
+    Generate a program and measure the assembly of it.
+
+    Parameters
+    ----------
+    lines : int
+        Number of lines of the generated program.
+
+    seed : int
+        Seed of the generator.
+
+    repeat : int
+        Number of timed runs, the fastest time of each phase is kept.
+
+    Returns
+    ----------
+    dict :
+        The line count, the time of each phase and the peak memory of each phase.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        source_path = os.path.join(output_dir, 'bench.asm')
+        written = write_program(source_path, lines, seed=seed, **options)
+        timings = [run_phases(source_path, output_dir) for _ in range(repeat)]
+        memory = run_phases(source_path, output_dir, trace=True)
+    return {'lines': written,
+            'seconds': {phase: min(timing[phase] for timing in timings) for phase in timings[0]},
+            'peak_bytes': memory}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find the measures that got worse than the baseline.
+
+    Parameters
+    ----------
+    results : dict
+        The measures of this run, keyed by workload name.
+
+    baseline : dict
+        The stored measures, keyed by workload name.
+
+    tolerance : float
+        Allowed relative increase, 0.25 accepts measures up to 25% over the baseline.
+
+    Returns
+    ----------
+    list :
+        Tuples of (workload, measure, phase, baseline value, current value) for each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for measure in ('seconds', 'peak_bytes'):
+            for phase, value in result[measure].items():
+                reference = baseline[name][measure].get(phase)
+                if measure == 'seconds' and max(reference or 0, value) < MIN_SECONDS:
+                    continue
+                if reference and value > reference * (1 + tolerance):
+                    regressions.append(
+                        (name, measure, phase, reference, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Times the phases of the assembler on generated programs.')
+    parser.add_argument('--lines', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='line counts of the generated programs (default: %(default)s)')
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS),
+                        help='shapes of the generated programs (default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='baseline JSON to compare with (default: %(default)s)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative increase over the baseline (default: %(default)s)')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the measures as a new baseline JSON to PATH')
+    args = parser.parse_args()
+
+    results = {}
+    for lines in args.lines:
+        for workload in args.workloads:
+            name = f'{workload}-{lines}'
+            result = run_workload(lines, args.seed, args.repeat, **WORKLOADS[workload])
+            results[name] = result
+            seconds = result['seconds']
+            print(f'{name:<22} ' + '  '.join(f'{phase} {seconds[phase]:.4f}s' for phase in PHASES) +
+                  f'  peak {result["peak_bytes"]["total"] / 2 ** 20:.1f} MB  {result["lines"] / seconds["total"]:,.0f} lines/s')
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for name, measure, phase, reference, value in regressions:
+            print(f'REGRESSION {name} {phase} {measure}: {reference:.4g} -> {value:.4g} (+{value / reference - 1:.0%})')
+        print(f'{len(regressions)} regressions against {args.baseline}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
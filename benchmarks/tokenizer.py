@@ -0,0 +1,86 @@
+"""
+Compares the single pass tokenizer with the split based line parsing it replaced.
+
+Usage: python -m benchmarks.tokenizer [lines] [repeat]
+"""
+import sys
+from tokenizer import tokenize, STATEMENT
+from benchmarks.encoder import synthetic_source, best_of
+
+
+def commented_source(lines):
+    """
+    Generate a SIC program of about `lines` lines mixing statements, comments and blank lines.
+
+    Parameters
+    ----------
+    lines : int
+        Number of lines in the program.
+
+    Returns
+    ----------
+    list :
+        The lines of the program.
+    """
+    source = synthetic_source(lines).split('\n')
+    for i in range(1, len(source), 8):
+        source[i] += '    . trailing comment'
+    for i in range(4, len(source), 16):
+        source[i] = '. a full line comment'
+    for i in range(12, len(source), 32):
+        source[i] = '   '
+    return source
+
+
+def legacy_parse(line):
+    """
+    The line parsing of the split based pipeline, kept for comparison.
+
+    Parameters
+    ----------
+    line : str
+        A line of the source code.
+
+    Returns
+    ----------
+    tuple :
+        (label, operation_name, operand) or None for blank and comment lines.
+    """
+    if len(line.split()) == 0 or line.split()[0].startswith('.'):
+        return None
+    line = line.split()
+    for indx, segment in enumerate(line):
+        if segment.split()[0].startswith('.'):
+            line = line[:indx]
+    if len(line) > 1 and line[1].endswith(','):
+        line.append(line.pop(1) + line.pop(1))
+    elif len(line) > 2 and line[2].endswith(','):
+        line.append(line.pop(2) + line.pop(2))
+    if len(line) == 3:
+        return line[0], line[1], line[2]
+    elif len(line) == 2:
+        return None, line[0], line[1]
+    elif len(line) == 1:
+        return None, line[0], None
+    raise SyntaxError(f'Fixed format only {line}')
+
+
+def tokenized_parse(line):
+    kind, label, operation_name, operand, _ = tokenize(line)
+    return (label, operation_name, operand) if kind == STATEMENT else None
+
+
+def main(lines=200000, repeat=5):
+    source = commented_source(lines)
+    assert [legacy_parse(line) for line in source] == [
+        tokenized_parse(line) for line in source]
+    legacy = best_of(repeat, lambda: [legacy_parse(line) for line in source])
+    current = best_of(repeat, lambda: [tokenized_parse(line) for line in source])
+    print(f'{len(source)} lines')
+    print(f'split parsing: {legacy:.3f} s  {len(source) / legacy:,.0f} lines/s')
+    print(f'tokenizer    : {current:.3f} s  {len(source) / current:,.0f} lines/s')
+    print(f'speedup      : {legacy / current:.2f}x')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,69 @@
+"""
+Compares looking symbols and addresses up in a cross-reference index with scanning the listing.
+
+Usage: python -m benchmarks.xref [lines] [queries] [repeat]
+"""
+import os
+import sys
+import random
+import tempfile
+from assembler import assemble_files
+from xref import CrossReferenceIndex
+from benchmarks.encoder import best_of
+from benchmarks.generator import write_program
+
+
+def scan_listing(listing_path, symbols, addresses):
+    """
+    Answer the queries by reading the whole listing, as grep would.
+    """
+    found = 0
+    with open(listing_path, 'r') as listing_file:
+        for record in listing_file:
+            location, label, _, operand = record.split('\t')[:4]
+            if label in symbols or operand.split(',')[0] in symbols or int(location, 16) in addresses:
+                found += 1
+    return found
+
+
+def query_index(index, symbols, addresses):
+    found = 0
+    for symbol in symbols:
+        found += len(index.symbol(symbol)[4]) + 1
+    for address in addresses:
+        found += len(index.lines_in_range(address, address + 1))
+    return found
+
+
+def main(lines=200000, queries=100, repeat=3):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, name) for name in (
+            'bench.asm', 'bench.mdt', 'bench.lst', 'bench.obj', 'bench.xref')]
+        source_path, intermediate_path, listing_path, object_path, xref_path = paths
+        write_program(source_path, lines)
+        plain = best_of(1, lambda: assemble_files(source_path, intermediate_path, listing_path, object_path))
+        indexed = best_of(1, lambda: assemble_files(source_path, intermediate_path, listing_path, object_path,
+                                                    xref_path=xref_path))
+        assembler = assemble_files(source_path, intermediate_path, listing_path, object_path)
+        rng = random.Random(0)
+        labels = [label for label in assembler.symbol_table if not label.startswith('=')]
+        symbols = set(rng.sample(labels, min(queries, len(labels))))
+        addresses = {rng.randrange(assembler.start_address, assembler.start_address + assembler.prog_length)
+                     for _ in range(queries)}
+        print(f'{lines:,} lines, listing {os.path.getsize(listing_path) / 1e6:.1f} MB, '
+              f'index {os.path.getsize(xref_path) / 1e6:.1f} MB')
+        print(f'assembling: {plain:.3f} s, with the index {indexed:.3f} s')
+
+        def open_and_query():
+            with CrossReferenceIndex(xref_path) as index:
+                return query_index(index, symbols, addresses)
+
+        scanned = best_of(repeat, lambda: scan_listing(listing_path, symbols, addresses))
+        looked_up = best_of(repeat, open_and_query)
+        print(f'looking {len(symbols)} symbols and {len(addresses)} addresses up')
+        print(f'scanning the listing: {scanned * 1000:.1f} ms')
+        print(f'index lookups       : {looked_up * 1000:.1f} ms  {scanned / looked_up:.0f}x')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,437 @@
+import os
+import sys
+import json
+import zlib
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager, ExitStack
+from utils import table_signature
+from symbols import SymbolTable
+from assembler import Assembler, __version__
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, entries are still replaced atomically.
+    fcntl = None
+
+# Default size limit of the cache directory in bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = '.entry'
+LOCK_NAME = '.lock'
+COUNTERS_NAME = 'counters.json'
+# Layout of the entry files, part of the keys so entries of another layout are never read
+ENTRY_VERSION = 2
+# Size of the chunks the output files are copied in
+CHUNK_SIZE = 64 * 1024
+# Counters of the assembler kept in the entries, restored on a hit for stats.RunStats
+ASSEMBLER_COUNTERS = ('lines_read', 'comments_skipped', 'ltorg_literals', 'end_literals', 'text_record_count')
+MACRO_COUNTERS = ('definitions', 'expansions', 'cache_hits', 'lines_generated')
+
+
+def _decompressed_chunks(entry_file):
+    """
+    The decompressed content of an entry file, in chunks of at most CHUNK_SIZE bytes.
+    """
+    decompressor = zlib.decompressobj()
+    for chunk in iter(lambda: entry_file.read(CHUNK_SIZE), b''):
+        while chunk:
+            yield decompressor.decompress(chunk, CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+    yield decompressor.flush()
+    if not decompressor.eof:
+        raise ValueError('Cache entry is truncated')
+
+
+def _read_entry(entry_file, output_files):
+    """
+    Read an entry file in chunks, copying the output files it holds.
+
+    Parameters
+    ----------
+    entry_file : file
+        Entry file opened for binary reading.
+
+    output_files : list
+        The intermediate, listing and object files opened for binary writing, followed
+        by the cross-reference index when the entry holds one.
+
+    Returns
+    ----------
+    dict :
+        The header of the entry, the fields of `AssemblyCache.make_entry` and the
+        size of each output file.
+
+    Raises
+    ----------
+    ValueError, KeyError, zlib.error :
+        When the entry is damaged, truncated or does not hold these files.
+    """
+    chunks = _decompressed_chunks(entry_file)
+    data = b''
+    for chunk in chunks:
+        data += chunk
+        if b'\n' in data:
+            break
+    header, _, data = data.partition(b'\n')
+    header = json.loads(header)
+    if len(header['sizes']) != len(output_files):
+        raise ValueError('Cache entry holds other files')
+    for output_file, size in zip(output_files, header['sizes']):
+        while size:
+            if not data:
+                data = next(chunks, None)
+                if data is None:
+                    raise ValueError('Cache entry is truncated')
+                continue
+            piece, data = data[:size], data[size:]
+            output_file.write(piece)
+            size -= len(piece)
+    if data or any(chunks):
+        raise ValueError('Cache entry has trailing data')
+    return header
+
+
+class AssemblyCache:
+    """
+    Content addressed on-disk cache of assembly results.
+
+    Entries are keyed by a hash of the source bytes, the operation code table, the
+    assembler version and the options that change the output. When the directory
+    grows over `max_bytes` the least recently used entries are evicted. Entries are
+    written atomically so several processes can share the same directory.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the cache entries, created if missing.
+
+    max_bytes : int
+        Size limit of the cached entries in bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Lookups made by this instance, the counters shared by all processes are in `stats`
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source_file, max_record_length, cross_reference=False):
+        """
+        Compute the key of an assembly.
+
+        Parameters
+        ----------
+        source_file : file
+            Source file opened for binary reading, hashed a chunk at a time so streaming
+            assemblies stay bounded in memory.
+
+        max_record_length : int
+            Maximum number of object code bytes in a text record.
+
+        cross_reference : bool
+            Whether a cross-reference index is written too, the entry then holds it.
+
+        Returns
+        ----------
+        str :
+            Hexadecimal digest identifying the assembly.
+        """
+        digest = hashlib.sha256()
+        digest.update(f'{__version__}\n{ENTRY_VERSION}\n{max_record_length}\n{int(cross_reference)}\n'.encode())
+        for signature in table_signature():
+            digest.update(f'{signature}\n'.encode())
+        for chunk in iter(lambda: source_file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        """
+        Path of the file holding the entry of a key.
+        """
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the lock of the cache directory, shared by all processes.
+        """
+        with open(os.path.join(self.directory, LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key, output_paths):
+        """
+        Look up an entry and copy its output files, marking it as recently used.
+
+        The files are copied in chunks to temporary files next to them, which replace
+        them only once the whole entry was read, so a damaged entry is a miss that
+        leaves the outputs untouched.
+
+        Parameters
+        ----------
+        key : str
+            The key computed by `key`.
+
+        output_paths : list
+            Paths of the intermediate, listing and object files to write, followed by
+            the cross-reference index when the key was computed with `cross_reference`.
+
+        Returns
+        ----------
+        dict :
+            The header of the cached entry, see `restore`, or None on a miss.
+        """
+        path = self.entry_path(key)
+        entry = None
+        temporary_paths = []
+        try:
+            with open(path, 'rb') as entry_file, ExitStack() as outputs:
+                output_files = []
+                for output_path in output_paths:
+                    descriptor, temporary_path = tempfile.mkstemp(
+                        dir=os.path.dirname(output_path) or '.', suffix='.tmp')
+                    temporary_paths.append(temporary_path)
+                    output_files.append(outputs.enter_context(os.fdopen(descriptor, 'wb')))
+                header = _read_entry(entry_file, output_files)
+            for temporary_path, output_path in zip(temporary_paths, output_paths):
+                os.replace(temporary_path, output_path)
+            temporary_paths = []
+            entry = header
+            os.utime(path)
+        except (OSError, ValueError, KeyError, zlib.error):
+            # Missing, evicted by another process meanwhile, damaged or written by another layout.
+            pass
+        finally:
+            for temporary_path in temporary_paths:
+                try:
+                    os.unlink(temporary_path)
+                except FileNotFoundError:
+                    pass
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._count('hits' if entry is not None else 'misses')
+        return entry
+
+    def put(self, key, entry):
+        """
+        Store an entry and evict the least recently used ones if the cache is full.
+
+        Parameters
+        ----------
+        key : str
+            The key computed by `key`.
+
+        entry : dict
+            The assembly result as built by `make_entry`.
+
+        Returns
+        ----------
+        None
+        """
+        # The header line, then the output files copied in chunks, all in one compressed stream
+        header = {field: value for field, value in entry.items() if field != 'paths'}
+        header['sizes'] = [os.path.getsize(path) for path in entry['paths']]
+        compressor = zlib.compressobj()
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as entry_file:
+                entry_file.write(compressor.compress(json.dumps(header).encode() + b'\n'))
+                for path in entry['paths']:
+                    with open(path, 'rb') as output_file:
+                        for chunk in iter(lambda: output_file.read(CHUNK_SIZE), b''):
+                            entry_file.write(compressor.compress(chunk))
+                entry_file.write(compressor.flush())
+                size = entry_file.tell()
+            os.replace(temporary_path, self.entry_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        # Keep a running total so the directory is only scanned when it may be full.
+        with self.lock():
+            counters = self._read_counters()
+            counters['bytes'] = counters.get('bytes', 0) + size
+            self._write_counters(counters)
+        if counters['bytes'] > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """
+        List the cached entries.
+
+        Returns
+        ----------
+        list :
+            Tuples of (last use time, size, path) sorted from the least recently used.
+        """
+        entries = []
+        for directory_entry in os.scandir(self.directory):
+            if directory_entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    status = directory_entry.stat()
+                except OSError:
+                    continue
+                entries.append(
+                    (status.st_mtime, status.st_size, directory_entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in `max_bytes`.
+
+        Returns
+        ----------
+        int :
+            The number of removed entries.
+        """
+        with self.lock():
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            counters = self._read_counters()
+            counters['bytes'] = total
+            self._write_counters(counters)
+        return removed
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters.
+        """
+        with self.lock():
+            for _, _, path in self.entries():
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self._write_counters({'hits': 0, 'misses': 0, 'bytes': 0})
+
+    def _read_counters(self):
+        try:
+            with open(os.path.join(self.directory, COUNTERS_NAME)) as counters_file:
+                return json.load(counters_file)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0, 'bytes': 0}
+
+    def _write_counters(self, counters):
+        path = os.path.join(self.directory, COUNTERS_NAME)
+        with open(path + '.tmp', 'w') as counters_file:
+            json.dump(counters, counters_file)
+        os.replace(path + '.tmp', path)
+
+    def _count(self, counter):
+        with self.lock():
+            counters = self._read_counters()
+            counters[counter] = counters.get(counter, 0) + 1
+            self._write_counters(counters)
+
+    def stats(self):
+        """
+        Summarize the cache, the counters cover every process using the directory.
+
+        Returns
+        ----------
+        dict :
+            The hits, misses, number of entries and their size in bytes.
+        """
+        with self.lock():
+            counters = self._read_counters()
+            entries = self.entries()
+        return {'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0),
+                'entries': len(entries), 'bytes': sum(size for _, size, _ in entries)}
+
+    @staticmethod
+    def make_entry(assembler, intermediate_output_path, listing_output_path, object_file_path, xref_path=None):
+        """
+        Build a cache entry from an assembler and the files it generated.
+
+        Parameters
+        ----------
+        assembler : Assembler
+            The assembler after operating both passes.
+
+        intermediate_output_path : str
+            Path to the generated intermediate file.
+
+        listing_output_path : str
+            Path to the generated listing file.
+
+        object_file_path : str
+            Path to the generated object file.
+
+        xref_path : str
+            Path to the generated cross-reference index, None if there is none.
+
+        Returns
+        ----------
+        dict :
+            The cache entry, the files are only copied into the cache by `put`.
+        """
+        return {'prog_name': assembler.prog_name, 'start_address': assembler.start_address,
+                'prog_length': assembler.prog_length, 'symbol_table': list(assembler.symbol_table.items()),
+                'absolute_symbols': sorted(assembler.absolute_symbols),
+                'counters': {name: getattr(assembler, name) for name in ASSEMBLER_COUNTERS},
+                'macro_counters': {name: getattr(assembler.macro_processor, name) for name in MACRO_COUNTERS},
+                'paths': [path for path in (intermediate_output_path, listing_output_path, object_file_path, xref_path)
+                          if path is not None]}
+
+    @staticmethod
+    def restore(entry):
+        """
+        Rebuild the assembler state of a cache entry without parsing the source.
+
+        Parameters
+        ----------
+        entry : dict
+            The cache entry returned by `get`, which already wrote the files.
+
+        Returns
+        ----------
+        Assembler :
+            An assembler holding the program name, addresses, symbol table and the
+            counters of the run that filled the entry, like one run in streaming mode.
+        """
+        assembler = Assembler([])
+        assembler.prog_name = entry['prog_name']
+        assembler.start_address = entry['start_address']
+        assembler.prog_length = entry['prog_length']
+        assembler.symbol_table = SymbolTable(entry['symbol_table'], entry['absolute_symbols'])
+        assembler.absolute_symbols = assembler.symbol_table.absolute_symbols
+        for name, value in entry['counters'].items():
+            setattr(assembler, name, value)
+        for name, value in entry['macro_counters'].items():
+            setattr(assembler.macro_processor, name, value)
+        return assembler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Inspects or clears an assembly cache directory.')
+    parser.add_argument('directory')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+    cache = AssemblyCache(args.directory)
+    if args.command == 'clear':
+        cache.clear()
+    json.dump(cache.stats(), sys.stdout)
+    print()
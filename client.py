@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import socket
+import argparse
+
+# Only the standard library is imported, the client starts without loading the assembler.
+
+
+def request(socket_path, message, timeout=None):
+    """
+    Send a request to an assembler server and wait for its response, see `server.AssemblerServer`.
+
+    Parameters
+    ----------
+    socket_path : str
+        Path of the socket the server listens on.
+
+    message : dict
+        The request with its `command`.
+
+    timeout : float
+        Seconds to wait for the response, None to wait until it arrives.
+
+    Returns
+    ----------
+    dict :
+        The response of the server.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as responses:
+            response = responses.readline()
+    if not response:
+        raise ConnectionError('The server closed the connection without answering')
+    return json.loads(response)
+
+
+def assemble(socket_path, source_path, intermediate_output_path, listing_output_path, object_file_path, streaming=False, max_record_length=None, source=None, xref_path=None):
+    """
+    Assemble a source script on a server.
+
+    Parameters
+    ----------
+    socket_path : str
+        Path of the socket the server listens on.
+
+    source_path : str
+        Path to the source SIC script, relative paths are resolved by the client.
+
+    intermediate_output_path, listing_output_path, object_file_path : str
+        Paths of the generated files, see `assembler.assemble_files`.
+
+    streaming : bool
+        Assemble in bounded memory.
+
+    max_record_length : int
+        Maximum number of object code bytes in a text record, None for the default.
+
+    source : str
+        The source script itself, `source_path` is ignored when given.
+
+    xref_path : str
+        When given, path of the cross-reference index written alongside the listing.
+
+    Returns
+    ----------
+    dict :
+        The program name, starting address, length and symbol table, or the error
+        message when `ok` is False.
+    """
+    message = {'command': 'assemble', 'intermediate_path': os.path.abspath(intermediate_output_path),
+               'listing_path': os.path.abspath(listing_output_path), 'object_path': os.path.abspath(object_file_path),
+               'streaming': streaming, 'record_length': max_record_length}
+    if xref_path is not None:
+        message['xref_path'] = os.path.abspath(xref_path)
+    if source is None:
+        message['source_path'] = os.path.abspath(source_path)
+    else:
+        message['source'] = source
+    return request(socket_path, message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Sends requests to an assembler server started with server.py.')
+    parser.add_argument('socket_path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    assemble_parser = subparsers.add_parser(
+        'assemble', help='assemble a source script, prints the same summary as assembler.py')
+    assemble_parser.add_argument('input_script_path', help='path of the source script, - to send it from stdin')
+    assemble_parser.add_argument('intermediate_path')
+    assemble_parser.add_argument('listing_path')
+    assemble_parser.add_argument('object_path')
+    assemble_parser.add_argument('--stream', action='store_true',
+                                 help='assemble in bounded memory by streaming the intermediate file between the passes')
+    assemble_parser.add_argument('--record-length', type=int, default=None,
+                                 help='maximum number of object code bytes in a text record')
+    assemble_parser.add_argument('--xref', metavar='PATH',
+                                 help='also write a cross-reference index to PATH, see xref.py')
+    assemble_parser.add_argument('-q', '--quiet', action='store_true',
+                                 help='do not print the symbol table')
+    subparsers.add_parser('stats', help='print the health and counters of the server as JSON')
+    subparsers.add_parser('shutdown', help='stop the server')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'assemble':
+            response = assemble(args.socket_path, args.input_script_path, args.intermediate_path, args.listing_path,
+                                args.object_path, args.stream, args.record_length,
+                                sys.stdin.read() if args.input_script_path == '-' else None, args.xref)
+        else:
+            response = request(args.socket_path, {'command': args.command})
+    except OSError as error:
+        sys.exit(f'Cannot reach the server at {args.socket_path}: {error}')
+    if not response['ok']:
+        sys.exit(response['error'])
+    if args.command == 'stats':
+        json.dump(response, sys.stdout, indent=1)
+        print()
+    elif args.command == 'assemble':
+        print('\n\nProgram Name: ' + response['prog_name'], 'Starting Address: ' +
+              hex(response['start_address']), 'Program Length: ' + str(response['prog_length']) + ' bytes\n\n', sep='\n')
+        if not args.quiet:
+            print('label \t address')
+            sys.stdout.write(''.join([f'{label} \t {hex(label_address).upper().replace("X", "x")}\n'
+                                      for label, label_address in response['symbol_table'].items()]))
@@ -0,0 +1,189 @@
+import re
+from functools import lru_cache
+
+# A sign or a term of an expression
+_TOKEN = re.compile(r'\s*([+-]|[^\s+-]+)')
+# Stands for the location counter in the terms of an expression
+LOCATION = '*'
+
+
+@lru_cache(maxsize=4096)
+def parse_expression(text):
+    """
+    Parse an expression made of terms added and subtracted: symbols, decimal constants
+    and `*` for the location counter, e.g. `BUFEND-BUFFER`, `TABLE+3` or `*-6`.
+
+    Parameters
+    ----------
+    text : str
+        The expression.
+
+    Returns
+    ----------
+    tuple :
+        Pairs of (sign, term), the sign is 1 or -1 and the term an int constant,
+        LOCATION or a symbol.
+    """
+    terms = []
+    sign = None
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            break
+        token = match.group(1)
+        position = match.end()
+        if token in '+-':
+            if sign is not None:
+                raise SyntaxError(f'Two signs in a row in the expression {text}')
+            sign = -1 if token == '-' else 1
+            continue
+        if terms and sign is None:
+            raise SyntaxError(f'Missing + or - between the terms of the expression {text}')
+        terms.append((1 if sign is None else sign, int(token) if token.isdigit() else token))
+        sign = None
+    if sign is not None or not terms or text[position:].strip():
+        raise SyntaxError(f'Malformed expression {text}')
+    return tuple(terms)
+
+
+def expression_symbols(terms):
+    """
+    The symbols an expression refers to.
+    """
+    return [term for _, term in terms if type(term) is str and term != LOCATION]
+
+
+def evaluate(terms, symbol_table, location, absolute_symbols=(), external_references=()):
+    """
+    Evaluate a parsed expression.
+
+    Symbols are relative to the start of the program, except the ones defined by EQU
+    with an absolute value. Constants, and relative symbols subtracted from each
+    other, are absolute. External symbols count as 0, the linker adds their address.
+
+    Parameters
+    ----------
+    terms : tuple
+        The expression, see `parse_expression`.
+
+    symbol_table : dict
+        Address of each defined symbol.
+
+    location : int
+        Value of `*`.
+
+    absolute_symbols : set
+        The symbols with an absolute value.
+
+    external_references : dict
+        The symbols imported from other modules.
+
+    Returns
+    ----------
+    value : int
+        The value of the expression.
+
+    relative : int
+        Number of relative terms added minus the number subtracted, 0 for an absolute
+        value and 1 for an address in the program.
+
+    externals : list
+        Pairs of (sign, symbol) of the external symbols.
+
+    Raises
+    ----------
+    KeyError :
+        With the first symbol that is neither defined nor external.
+    """
+    value = 0
+    relative = 0
+    externals = []
+    for sign, term in terms:
+        if type(term) is int:
+            value += sign * term
+        elif term == LOCATION:
+            value += sign * location
+            relative += sign
+        elif term in symbol_table:
+            value += sign * symbol_table[term]
+            if term not in absolute_symbols:
+                relative += sign
+        elif term in external_references:
+            externals.append(('+' if sign > 0 else '-', term))
+        else:
+            raise KeyError(term)
+    return value, relative, externals
+
+
+def resolution_order(pending, symbol_table, external_references=()):
+    """
+    Order EQU symbols so each one comes after the symbols its expression refers to.
+
+    The dependencies form a graph swept once in topological order, the time is linear
+    in the number of symbols and references.
+
+    Parameters
+    ----------
+    pending : dict
+        The parsed expression, the value of `*` and the line number of each symbol to
+        define, by symbol.
+
+    symbol_table : dict
+        The symbols already defined.
+
+    external_references : collection
+        The EXTREF symbols, left for `evaluate` to report since an EQU cannot use them.
+
+    Returns
+    ----------
+    list :
+        The pending symbols in an order they can be evaluated in.
+
+    Raises
+    ----------
+    SyntaxError :
+        When an expression refers to an undefined symbol or the definitions are circular.
+    """
+    waiting = {}
+    dependents = {}
+    ready = []
+    for symbol, (terms, _, line_number) in pending.items():
+        count = 0
+        for dependency in expression_symbols(terms):
+            if dependency in pending:
+                dependents.setdefault(dependency, []).append(symbol)
+                count += 1
+            elif dependency not in symbol_table and dependency not in external_references:
+                raise SyntaxError(f'Undefined symbol {dependency} in the EQU of {symbol} on line {line_number}')
+        if count:
+            waiting[symbol] = count
+        else:
+            ready.append(symbol)
+    order = []
+    while ready:
+        symbol = ready.pop()
+        order.append(symbol)
+        for dependent in dependents.get(symbol, ()):
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                del waiting[dependent]
+                ready.append(dependent)
+    if waiting:
+        raise SyntaxError('Circular EQU definitions: ' + ' -> '.join(_find_cycle(waiting, pending)))
+    return order
+
+
+def _find_cycle(waiting, pending):
+    """
+    Follow the dependencies among the symbols left waiting until one comes back.
+    """
+    symbol = next(iter(waiting))
+    path = []
+    seen = {}
+    while symbol not in seen:
+        seen[symbol] = len(path)
+        path.append(symbol)
+        terms = pending[symbol][0]
+        symbol = next(dependency for dependency in expression_symbols(terms) if dependency in waiting)
+    return path[seen[symbol]:] + [symbol]
@@ -0,0 +1,354 @@
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+from assembler import Assembler, NO_OBJECT, MAX_RECORD_LENGTH, check_record_length
+
+# Layout of the binary image, all integers are little endian:
+#   header    magic, version, name length, start address, length, entry point, segment count
+#   name      the program name in ASCII
+#   segments  (address, size, file offset) of each run of object code
+#   data      the object code of the segments, RESB/RESW gaps are not stored
+MAGIC = b'SICI'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIII')
+SEGMENT = struct.Struct('<III')
+
+
+def iter_segments(spans):
+    """
+    Merge the object codes of consecutive addresses into segments.
+
+    Parameters
+    ----------
+    spans : iterable
+        Pairs of (address, size) in address order, sizes of NO_OBJECT and 0 are skipped.
+
+    Returns
+    ----------
+    generator :
+        Pairs of (starting address, length) of the segments.
+    """
+    start = end = None
+    for address, size in spans:
+        if size == NO_OBJECT or size == 0:
+            continue
+        if start is not None and address != end:
+            yield start, end - start
+            start = None
+        if start is None:
+            start = end = address
+        end += size
+    if start is not None:
+        yield start, end - start
+
+
+def assembler_segments(assembler):
+    """
+    The segments of the memory image of an assembler.
+
+    Parameters
+    ----------
+    assembler : Assembler
+        The assembler after operating both passes, not in streaming mode.
+
+    Returns
+    ----------
+    list :
+        Pairs of (address, memoryview) of the object code.
+    """
+    if assembler.is_module:
+        raise ValueError(f'{assembler.prog_name} is a module with external symbols, link it with linker.py first')
+    memory = memoryview(assembler.memory)
+    return [(start, memory[start - assembler.start_address:start - assembler.start_address + length])
+            for start, length in iter_segments(zip(assembler.object_addresses, assembler.object_sizes))]
+
+
+def write_image(image_file, prog_name, start_address, prog_length, entry, segments):
+    """
+    Write a binary image.
+
+    Parameters
+    ----------
+    image_file : file
+        File opened for binary writing.
+
+    prog_name : str
+        Name of the program.
+
+    start_address : int
+        Address the program is loaded at.
+
+    prog_length : int
+        Length of the program in bytes, gaps included.
+
+    entry : int
+        Address execution starts at.
+
+    segments : list
+        Pairs of (address, bytes-like) in address order.
+
+    Returns
+    ----------
+    None
+    """
+    name = (prog_name or '').encode('ascii')
+    offset = HEADER.size + len(name) + SEGMENT.size * len(segments)
+    image_file.write(HEADER.pack(MAGIC, VERSION, len(name), start_address,
+                     prog_length, entry, len(segments)))
+    image_file.write(name)
+    for address, data in segments:
+        image_file.write(SEGMENT.pack(address, len(data), offset))
+        offset += len(data)
+    for _, data in segments:
+        image_file.write(data)
+
+
+def write_assembler_image(assembler, image_path):
+    """
+    Write the binary image of an assembler.
+
+    Parameters
+    ----------
+    assembler : Assembler
+        The assembler after operating both passes, not in streaming mode.
+
+    image_path : str
+        Path of the image file.
+
+    Returns
+    ----------
+    None
+    """
+    with open(image_path, 'wb') as image_file:
+        write_image(image_file, assembler.prog_name, assembler.start_address,
+                    assembler.prog_length, assembler.start_address, assembler_segments(assembler))
+
+
+class ProgramImage:
+    """
+    A binary image mapped in memory, the segments are views of the file and are never copied.
+
+    Only the header and the segment table are read when loading, the object code is
+    paged in by the operating system when a segment is accessed. Release the views
+    returned by `segment` before closing the image, `mmap` refuses to close while
+    views of it exist.
+
+    Parameters
+    ----------
+    image_path : str
+        Path of the image file.
+    """
+
+    def __init__(self, image_path):
+        super().__init__()
+        with open(image_path, 'rb') as image_file:
+            self.map = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+        if len(view) < HEADER.size:
+            raise ValueError(f'{image_path} is too short to be a SIC image')
+        magic, version, name_length, self.start_address, self.prog_length, self.entry, segment_count = HEADER.unpack_from(
+            view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{image_path} is not a version {VERSION} SIC image')
+        self.prog_name = bytes(view[HEADER.size:HEADER.size + name_length]).decode('ascii')
+        table = HEADER.size + name_length
+        # Flat (address, size, offset) triples of the segment table, read in one copy
+        self.table = array('I')
+        self.table.frombytes(view[table:table + SEGMENT.size * segment_count])
+        if sys.byteorder == 'big':
+            self.table.byteswap()
+        if segment_count and self.table[-1] + self.table[-2] > len(view):
+            raise ValueError(f'{image_path} is truncated')
+        view.release()
+        self._segments = None
+
+    def __len__(self):
+        """
+        The number of segments.
+        """
+        return len(self.table) // 3
+
+    def segment(self, index):
+        """
+        A segment of the image.
+
+        Parameters
+        ----------
+        index : int
+            Index of the segment in address order.
+
+        Returns
+        ----------
+        tuple :
+            The address of the segment and a memoryview of its object code in the mapped file.
+        """
+        address, size, offset = self.table[3 * index:3 * index + 3]
+        return address, memoryview(self.map)[offset:offset + size]
+
+    @property
+    def segments(self):
+        """
+        Pairs of (address, memoryview) of every segment in address order, built on first use.
+        """
+        if self._segments is None:
+            view = memoryview(self.map)
+            table = self.table
+            self._segments = [(table[i], view[table[i + 2]:table[i + 2] + table[i + 1]])
+                              for i in range(0, len(table), 3)]
+            view.release()
+        return self._segments
+
+    def memory(self):
+        """
+        Copy the image into a memory indexed from the starting address, gaps filled with zeros.
+
+        Returns
+        ----------
+        bytearray :
+            The memory of the program.
+        """
+        memory = bytearray(self.prog_length)
+        for address, data in self.segments:
+            memory[address - self.start_address:address - self.start_address + len(data)] = data
+        return memory
+
+    def close(self):
+        for _, data in self._segments or ():
+            data.release()
+        self._segments = None
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_object_file(object_file, modules=False):
+    """
+    Parse a text object file.
+
+    Parameters
+    ----------
+    object_file : file
+        Opened object file with H, T and E records.
+
+    modules : bool
+        Accept the object files of modules and skip their D, R and M records, which
+        the caller reads itself. Otherwise they are rejected, an image has no room for
+        them and a module loaded as is would not be relocated.
+
+    Returns
+    ----------
+    tuple :
+        The program name, start address, length, entry point and the (address, bytearray)
+        segments with the consecutive text records merged.
+    """
+    prog_name, start_address, prog_length, entry = '', 0, 0, None
+    spans = []
+    data = bytearray()
+    for record in object_file:
+        record = record.rstrip('\n')
+        if record.startswith('H'):
+            prog_name = record[1:-12].rstrip()
+            start_address, prog_length = int(record[-12:-6], 16), int(record[-6:], 16)
+        elif record.startswith('T'):
+            record_data = bytes.fromhex(record[9:])
+            if len(record_data) != int(record[7:9], 16):
+                raise ValueError(f'Text record length does not match its data: {record}')
+            spans.append((int(record[1:7], 16), len(record_data)))
+            data += record_data
+        elif record.startswith('E'):
+            entry = int(record[1:], 16)
+        elif record[:1] in ('D', 'R', 'M') and not modules:
+            raise ValueError(
+                f'{prog_name} is a module with {record[0]} records, link it with linker.py first')
+    segments = []
+    position = 0
+    for address, length in iter_segments(spans):
+        segments.append((address, data[position:position + length]))
+        position += length
+    return prog_name, start_address, prog_length, start_address if entry is None else entry, segments
+
+
+def write_object_file(image, object_file, max_record_length=MAX_RECORD_LENGTH):
+    """
+    Write an image as a text object file.
+
+    Parameters
+    ----------
+    image : ProgramImage
+        The loaded image.
+
+    object_file : file
+        File opened for writing.
+
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+
+    Returns
+    ----------
+    None
+    """
+    check_record_length(max_record_length)
+    object_file.write(
+        f'H{image.prog_name}    {image.start_address:06X}{image.prog_length:06X}')
+    for address, data in image.segments:
+        for offset in range(0, len(data), max_record_length):
+            object_file.write(
+                '\n' + Assembler.text_record(address + offset, data[offset:offset + max_record_length]))
+    object_file.write(f'\nE{image.entry:06X}')
+
+
+def object_to_image(object_path, image_path):
+    """
+    Convert a text object file to a binary image.
+    """
+    with open(object_path, 'r') as object_file:
+        prog_name, start_address, prog_length, entry, segments = read_object_file(
+            object_file)
+    with open(image_path, 'wb') as image_file:
+        write_image(image_file, prog_name, start_address,
+                    prog_length, entry, segments)
+
+
+def image_to_object(image_path, object_path, max_record_length=MAX_RECORD_LENGTH):
+    """
+    Convert a binary image to a text object file.
+    """
+    with ProgramImage(image_path) as image, open(object_path, 'w') as object_file:
+        write_object_file(image, object_file, max_record_length)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Converts between text object files and binary SIC images.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    to_image = subparsers.add_parser('to-image', help='convert an object file to an image')
+    to_image.add_argument('object_path')
+    to_image.add_argument('image_path')
+    to_object = subparsers.add_parser('to-object', help='convert an image to an object file')
+    to_object.add_argument('image_path')
+    to_object.add_argument('object_path')
+    to_object.add_argument('--record-length', type=int, default=MAX_RECORD_LENGTH,
+                           help='maximum number of object code bytes in a text record (default: %(default)s)')
+    info = subparsers.add_parser('info', help='describe an image')
+    info.add_argument('image_path')
+    args = parser.parse_args()
+
+    if args.command == 'to-image':
+        try:
+            object_to_image(args.object_path, args.image_path)
+        except ValueError as error:
+            sys.exit(f'Error: {error}')
+    elif args.command == 'to-object':
+        image_to_object(args.image_path, args.object_path, args.record_length)
+    else:
+        with ProgramImage(args.image_path) as image:
+            print(f'Program Name: {image.prog_name}', f'Starting Address: {hex(image.start_address)}',
+                  f'Program Length: {image.prog_length} bytes', f'Entry Point: {hex(image.entry)}', sep='\n')
+            for address, data in image.segments:
+                print(f'{address:06X} \t {len(data)} bytes')
@@ -0,0 +1,420 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from expressions import LOCATION
+from macros import MacroProcessor
+from assembler import Assembler, NO_OBJECT, MAX_RECORD_LENGTH, check_record_length, format_line
+
+
+class IncrementalAssembler(Assembler):
+    """
+    Long-lived assembler that reassembles a program after line level edits.
+
+    The state of pass1 is saved before every source line, so after an edit pass1
+    only runs again from the first changed line. Lines that follow the edit keep
+    their object code unless their operand moved, lines before it are encoded
+    again only if they refer to a symbol whose address changed, and only the text
+    records whose bytes or addresses changed are rendered again.
+
+    Parameters
+    ----------
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+    """
+
+    def __init__(self, max_record_length=MAX_RECORD_LENGTH):
+        check_record_length(max_record_length)
+        self.max_record_length = max_record_length
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the previous program.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        Assembler.__init__(self, [])
+        self.source_lines = []
+        # State of pass1 before each source line, the last one is the state before the end of the program
+        self.checkpoints = []
+        # (symbol, previous address) for every definition, to undo them
+        self.symbol_log = []
+        # Symbols the operand of each intermediate line refers to, LOCATION for `*`
+        self.operand_symbols = []
+        # Indexes of the intermediate lines referring to each symbol, in ascending order
+        self.referrers = defaultdict(list)
+        # (starting address, length) and rendered text of each text record
+        self.record_bounds = []
+        self.record_texts = []
+        self.valid = False
+
+    def define_symbol(self, label, value=None, absolute=False):
+        self.symbol_log.append((label, self.symbol_table.get(label)))
+        super().define_symbol(label, value, absolute)
+
+    def operand_symbol(self, line_object):
+        """
+        Find the symbols whose address changes the object code of a line, see `referenced_symbols`.
+        """
+        # EQU lines have no object code, their symbol is logged as moved instead
+        return () if line_object.operation_name == 'EQU' else self.referenced_symbols(line_object)
+
+    def checkpoint(self):
+        """
+        Save the state of pass1 before the next source line.
+        """
+        self.checkpoints.append((self.locctr, list(self.literals_list), len(self.intermediate), len(self.symbol_log),
+                                 len(self.external_definitions), len(self.external_references), len(self.pending_equates)))
+
+    def run_pass_one(self, start):
+        """
+        Operate pass1 from a source line to the end of the program.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first source line to process, at least 1.
+
+        Returns
+        ----------
+        None
+        """
+        for index in range(start, len(self.source_lines)):
+            self.checkpoint()
+            self.intermediate.extend(self.pass_one_line(
+                index - 1, self.source_lines[index]))
+            if self.ended:
+                break
+        self.checkpoint()
+        self.intermediate.extend(self.pass_one_end())
+
+    def rollback(self, index):
+        """
+        Restore the state of pass1 before a source line.
+
+        Parameters
+        ----------
+        index : int
+            Index of the source line, at least 1.
+
+        Returns
+        ----------
+        None
+        """
+        self.locctr, literals_list, length, log_length, definitions, references, equates = self.checkpoints[index]
+        self.literals_list = list(literals_list)
+        del self.external_definitions[definitions:]
+        while len(self.external_references) > references:
+            self.external_references.popitem()
+        while len(self.pending_equates) > equates:
+            self.pending_equates.popitem()
+        self.ended = False
+        del self.checkpoints[index:]
+        while len(self.symbol_log) > log_length:
+            label, address = self.symbol_log.pop()
+            if address is None:
+                del self.symbol_table[label]
+                self.absolute_symbols.discard(label)
+            else:
+                self.symbol_table[label] = address
+        for symbol in {symbol for symbols in self.operand_symbols[length:] for symbol in symbols}:
+            referrers = self.referrers[symbol]
+            del referrers[bisect_left(referrers, length):]
+        del self.intermediate[length:]
+        del self.object_sizes[length:]
+        del self.object_addresses[length:]
+        del self.operand_symbols[length:]
+
+    def assemble(self, lines):
+        """
+        Assemble a whole program, forgetting the previous one.
+
+        Parameters
+        ----------
+        lines : list
+            The lines of the source code.
+
+        Returns
+        ----------
+        dict :
+            What was done, see `update`.
+        """
+        self.reset()
+        self.source_lines = list(self.macro_processor.expand(lines))
+        self.checkpoint()
+        self.intermediate.extend(
+            self.pass_one_first_line(self.source_lines[0]))
+        self.run_pass_one(1)
+        self.memory = bytearray(self.prog_length)
+        for index, line_object in enumerate(self.intermediate):
+            self.add_object(index, line_object, self.encode_object(
+                line_object, self.memory, line_object.line_location - self.start_address))
+        self.render_records(0, [], 0, None)
+        self.valid = True
+        return {'first_changed_line': 0, 'reparsed_lines': len(self.checkpoints) - 1, 'encoded_lines': len(self.intermediate),
+                'moved_symbols': 0, 'records_rendered': len(self.record_texts)}
+
+    def add_object(self, index, line_object, size):
+        """
+        Record the encoded object code of an intermediate line.
+        """
+        self.object_sizes.append(size)
+        self.object_addresses.append(line_object.line_location)
+        symbols = self.operand_symbol(line_object)
+        self.operand_symbols.append(symbols)
+        for symbol in symbols:
+            self.referrers[symbol].append(index)
+
+    def update(self, lines):
+        """
+        Reassemble the program after its source changed.
+
+        Parameters
+        ----------
+        lines : list
+            The new lines of the source code.
+
+        Returns
+        ----------
+        dict :
+            The first changed line, the number of source lines pass1 processed again, the
+            number of intermediate lines encoded again, the number of symbols whose address
+            changed and the number of text records rendered again.
+        """
+        # Compared after expansion, an edited macro changes the lines of its invocations.
+        lines = list(MacroProcessor().expand(lines))
+        if not self.valid or len(lines) == 0:
+            return self.assemble(lines)
+        old_lines = self.source_lines
+        first = 0
+        limit = min(len(lines), len(old_lines))
+        while first < limit and lines[first] == old_lines[first]:
+            first += 1
+        if first == 0:
+            return self.assemble(lines)
+        # Number of source lines pass1 processed, up to END
+        processed = len(self.checkpoints) - 1
+        if first == len(lines) == len(old_lines) or (self.ended and first >= processed):
+            # Nothing changed before the END directive.
+            self.source_lines = lines
+            return {'first_changed_line': first, 'reparsed_lines': 0, 'encoded_lines': 0, 'moved_symbols': 0, 'records_rendered': 0}
+
+        self.valid = False
+        length, log_length = self.checkpoints[first][2], self.checkpoints[first][3]
+        old_addresses = {label: self.symbol_table.get(label)
+                         for label, _ in self.symbol_log[log_length:]}
+        old_tail = self.intermediate[length:]
+        old_tail_sizes = self.object_sizes[length:]
+        old_end = len(self.memory)
+
+        self.rollback(first)
+        self.source_lines = lines
+        self.run_pass_one(first)
+
+        new_addresses = {label: self.symbol_table.get(label)
+                         for label, _ in self.symbol_log[log_length:]}
+        moved = {label for label in old_addresses.keys() | new_addresses.keys()
+                 if old_addresses.get(label) != self.symbol_table.get(label)}
+
+        # Lines at the end of the tail that did not change keep their object code.
+        new_tail = self.intermediate[length:]
+        same = 0
+        while same < min(len(old_tail), len(new_tail)):
+            old_line, new_line = old_tail[-1 - same], new_tail[-1 - same]
+            if (old_line.label, old_line.operation_name, old_line.operand) != (new_line.label, new_line.operation_name, new_line.operand):
+                break
+            same += 1
+        changed = len(new_tail) - same
+        end_address = self.start_address + self.prog_length
+        changed_start = new_tail[0].line_location if new_tail else end_address
+        changed_end = new_tail[changed].line_location if same else end_address
+        old_changed_start = old_tail[0].line_location - \
+            self.start_address if old_tail else old_end
+        old_changed_end = old_tail[len(old_tail) - same].line_location - \
+            self.start_address if same else old_end
+        shift = changed_end - self.start_address - old_changed_end
+
+        changed_bytes = bytearray(changed_end - changed_start)
+        encoded_lines = 0
+        for index, line_object in enumerate(new_tail[:changed], length):
+            self.add_object(index, line_object, self.encode_object(
+                line_object, changed_bytes, line_object.line_location - changed_start))
+            encoded_lines += 1
+        self.memory[old_changed_start:old_changed_end] = changed_bytes
+        for index, line_object in enumerate(new_tail[changed:], length + changed):
+            self.add_object(index, line_object,
+                            old_tail_sizes[len(old_tail) - same + index - length - changed])
+
+        # Lines referring to a moved symbol are encoded again in place, and so are the
+        # lines after the change that refer to their own location with `*` when it moved.
+        stale = {index for label in moved for index in self.referrers.get(label, ())}
+        if shift:
+            located = self.referrers.get(LOCATION, [])
+            stale.update(located[bisect_left(located, length + changed):])
+        patched = []
+        for index in sorted(stale):
+            if length <= index < length + changed:
+                continue
+            line_object = self.intermediate[index]
+            self.encode_object(line_object, self.memory,
+                               line_object.line_location - self.start_address)
+            patched.append(line_object.line_location)
+            encoded_lines += 1
+        if len(self.memory) != self.prog_length:
+            raise RuntimeError('Memory image does not match the program length')
+
+        dirty_end = changed_end if shift == 0 else end_address
+        records_rendered = self.render_records(
+            length, sorted(patched), changed_start, dirty_end)
+        self.valid = True
+        return {'first_changed_line': first, 'reparsed_lines': len(self.checkpoints) - 1 - first, 'encoded_lines': encoded_lines,
+                'moved_symbols': len(moved), 'records_rendered': records_rendered}
+
+    def render_records(self, length, patched, dirty_start, dirty_end):
+        """
+        Split the object code into text records again from the first intermediate line that changed.
+
+        Records that keep their bounds and whose bytes did not change are not rendered again.
+
+        Parameters
+        ----------
+        length : int
+            Number of intermediate lines that did not change.
+
+        patched : list
+            Sorted addresses of the lines encoded again in place.
+
+        dirty_start : int
+            First address whose byte may have changed.
+
+        dirty_end : int
+            Address after the last byte that may have changed, None when everything changed.
+
+        Returns
+        ----------
+        int :
+            The number of rendered records.
+        """
+        # Records restart after a line without object code, so go back to the last one.
+        restart = length
+        while restart > 0 and self.object_sizes[restart - 1] != NO_OBJECT:
+            restart -= 1
+        restart_address = self.object_addresses[restart] if restart < len(
+            self.object_addresses) else self.start_address + self.prog_length
+        kept = bisect_left(self.record_bounds, (restart_address, -1))
+        old_records = dict(
+            zip(self.record_bounds[kept:], self.record_texts[kept:]))
+        bounds = self.record_bounds[:kept] + list(self.iter_record_bounds(
+            zip(self.object_addresses[restart:], self.object_sizes[restart:]), self.max_record_length))
+        memory = memoryview(self.memory)
+        texts = []
+        rendered = 0
+        for position, (start, record_length) in enumerate(bounds):
+            end = start + record_length
+            text = self.record_texts[position] if position < kept else old_records.get(
+                (start, record_length))
+            dirty = dirty_end is None or (
+                start < dirty_end and end > dirty_start)
+            touched = bisect_left(patched, end) > bisect_left(patched, start - 2)
+            if text is None or (position >= kept and dirty) or touched:
+                offset = start - self.start_address
+                text = self.text_record(start, memory[offset:offset + record_length])
+                rendered += 1
+            texts.append(text)
+        self.record_bounds = bounds
+        self.record_texts = texts
+        return rendered
+
+    def write(self, intermediate_output_path, listing_output_path, object_file_path):
+        """
+        Write the intermediate, listing and object files of the current program.
+
+        Parameters
+        ----------
+        intermediate_output_path : str
+            Path to the intermediate file.
+
+        listing_output_path : str
+            Path to the listing file.
+
+        object_file_path : str
+            Path to the object file.
+
+        Returns
+        ----------
+        None
+        """
+        with open(intermediate_output_path, 'w') as intermediate_file, open(listing_output_path, 'w') as listing_file, open(object_file_path, 'w') as object_file:
+            intermediate_file.write('\n'.join(
+                [format_line(line_object) for line_object in self.intermediate]))
+            listing_file.write('\n'.join([format_line(line_object) + '\t' + self.render_object_code(self.memory, address - self.start_address, size).replace("!", '')
+                                          for line_object, address, size in zip(self.intermediate, self.object_addresses, self.object_sizes)]))
+            object_file.write('\n'.join(
+                [self.header_record()] + self.definition_records() + self.record_texts +
+                self.modification_records() + [self.end_record()]))
+
+
+def read_source(source_path):
+    """
+    Read the lines of a source file.
+    """
+    with open(source_path, 'r') as source_file:
+        return [line.rstrip('\n') for line in source_file]
+
+
+def watch(source_path, intermediate_output_path, listing_output_path, object_file_path, max_record_length=MAX_RECORD_LENGTH, interval=0.05):
+    """
+    Reassemble a source file every time it changes, until interrupted.
+
+    Parameters
+    ----------
+    source_path : str
+        Path to the source SIC script.
+
+    intermediate_output_path : str
+        Path to the intermediate file.
+
+    listing_output_path : str
+        Path to the listing file.
+
+    object_file_path : str
+        Path to the object file.
+
+    max_record_length : int
+        Maximum number of object code bytes in a text record.
+
+    interval : float
+        Seconds between two checks of the source file.
+
+    Returns
+    ----------
+    None
+    """
+    assembler = IncrementalAssembler(max_record_length)
+    last_change = None
+    while True:
+        try:
+            change = os.stat(source_path).st_mtime_ns
+        except FileNotFoundError:
+            change = None
+        if change is not None and change != last_change:
+            last_change = change
+            start = time.perf_counter()
+            try:
+                summary = assembler.update(read_source(source_path))
+                assembler.write(intermediate_output_path,
+                                listing_output_path, object_file_path)
+            except Exception as error:
+                print(f'{source_path}: {type(error).__name__}: {error}', flush=True)
+            else:
+                print(f'{source_path}: {assembler.prog_name} {assembler.prog_length} bytes in {(time.perf_counter() - start) * 1000:.1f} ms, '
+                      f'reparsed {summary["reparsed_lines"]} lines, encoded {summary["encoded_lines"]}, '
+                      f'{summary["moved_symbols"]} symbols moved, {summary["records_rendered"]} records rendered', flush=True)
+        time.sleep(interval)
@@ -0,0 +1,257 @@
+from array import array
+from utils import operations, operation_id, LITERAL_OPERATION, UNDEFINED_OPERATION
+from tokenizer import tokenize, STATEMENT
+
+# Operation id of the lines of the literal pools, their operand column holds the literal itself
+LITERAL = LITERAL_OPERATION.id
+# Operation id of the lines whose operation name is unknown, the name is kept by the Intermediate
+UNDEFINED = UNDEFINED_OPERATION.id
+
+
+class Line:
+    """
+    Break SIC instructions into label, opcode, operands.
+
+    Parameters
+    ----------
+    line: str
+    SIC instruction
+    """
+
+    __slots__ = ('label', 'operation_name', 'operand', 'line_location')
+
+    def __init__(self, line):
+        super().__init__()
+        if len(line) != 0:
+            self.label, self.operation_name, self.operand = self.parse_line(
+                line)
+            self.line_location = ''
+        else:
+            self.label, self.operation_name, self.operand = '', '', ''
+            self.line_location = ''
+
+    @classmethod
+    def from_fields(cls, label, operation_name, operand):
+        """
+        Build a line from fields that are already parsed.
+
+        Parameters
+        ----------
+        label : str
+            Label of the SIC instruction, None if there is no label.
+
+        operation_name : str
+            Operation name of the SIC instruction.
+
+        operand : str
+            Operand of the SIC instruction, None if there is no operand.
+
+        Returns
+        ----------
+        Line :
+            The line, its location is not set yet.
+        """
+        line_object = cls.__new__(cls)
+        line_object.label, line_object.operation_name, line_object.operand = label, operation_name, operand
+        line_object.line_location = ''
+        return line_object
+
+    def parse_line(self, line: str):
+        """
+        Break SIC instruction into label, opcode, operands.
+
+        Parameters
+        ----------
+        Line: str
+        SIC instruction
+
+        Returns
+        ----------
+        label: str
+        label of the SIC instruction
+
+        operation_name: str
+        opcodel of the SIC instruction
+
+        operand: str
+        operand of the SIC instruction
+        """
+        kind, label, operation_name, operand, _ = tokenize(line)
+        if kind != STATEMENT:
+            raise SyntaxError(f'Fixed format only {line.split()}')
+        return label, operation_name, operand
+
+
+class LineView(Line):
+    """
+    Read-only Line backed by a row of an Intermediate.
+
+    Parameters
+    ----------
+    table : Intermediate
+        The intermediate holding the line.
+
+    index : int
+        Index of the line in the intermediate.
+    """
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def label(self):
+        return self.table.string(self.table.labels[self.index])
+
+    @property
+    def operation_name(self):
+        table, index = self.table, self.index
+        operation = table.operations[index]
+        if operation == LITERAL:
+            return table.strings[table.operands[index]]
+        if operation == UNDEFINED:
+            return table.undefined_names[index]
+        return operations[operation].name
+
+    @property
+    def operand(self):
+        table, index = self.table, self.index
+        if table.operations[index] == LITERAL:
+            return None
+        return table.string(table.operands[index])
+
+    @property
+    def line_location(self):
+        return self.table.locations[self.index]
+
+
+class Intermediate:
+    """
+    Columnar storage of the lines of the intermediate file.
+
+    Locations are kept in an array, operation names as small integer ids and labels
+    and operands as indexes into a pool of strings, so a line takes a few bytes instead
+    of a whole object. Indexing returns a LineView over a row.
+
+    Parameters
+    ----------
+    None
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.locations = array('q')
+        self.operations = array('H')
+        # Index of the label and the operand of each line in `strings`, -1 for None
+        self.labels = array('l')
+        self.operands = array('l')
+        self.strings = []
+        self.string_ids = {}
+        # Operation name of the lines with an unknown operation, by index
+        self.undefined_names = {}
+
+    def intern(self, value):
+        """
+        Find the index of a string in the pool, adding it if needed.
+
+        Parameters
+        ----------
+        value : str
+            The string, None is stored as -1.
+
+        Returns
+        ----------
+        int :
+            The index of the string.
+        """
+        if value is None:
+            return -1
+        index = self.string_ids.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self.string_ids[value] = index
+        return index
+
+    def string(self, index):
+        """
+        Get a string of the pool from its index, -1 gives None.
+        """
+        return None if index < 0 else self.strings[index]
+
+    def append(self, line_object):
+        """
+        Add a line at the end of the intermediate.
+
+        Parameters
+        ----------
+        line_object : Line
+            The line to add, its values are copied.
+
+        Returns
+        ----------
+        None
+        """
+        self.locations.append(line_object.line_location)
+        self.labels.append(self.intern(line_object.label))
+        operation_name = line_object.operation_name
+        if line_object.label == '*' and operation_name.startswith('='):
+            self.operations.append(LITERAL)
+            self.operands.append(self.intern(operation_name))
+        else:
+            operation = operation_id(operation_name)
+            if operation == UNDEFINED:
+                self.undefined_names[len(self.operations)] = operation_name
+            self.operations.append(operation)
+            self.operands.append(self.intern(line_object.operand))
+
+    def extend(self, line_objects):
+        for line_object in line_objects:
+            self.append(line_object)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Slices are detached copies, they stay valid when the intermediate is truncated.
+            return [self.copy(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('intermediate index out of range')
+        return LineView(self, index)
+
+    def __delitem__(self, index):
+        # Lines are only deleted at the end, the names of the remaining lines keep their index
+        for column in (self.locations, self.operations, self.labels, self.operands):
+            del column[index]
+        if self.undefined_names:
+            self.undefined_names = {position: name for position, name in self.undefined_names.items()
+                                    if position < len(self)}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield LineView(self, index)
+
+    def copy(self, index):
+        """
+        Get a line of the intermediate as a standalone Line.
+
+        Parameters
+        ----------
+        index : int
+            Index of the line.
+
+        Returns
+        ----------
+        Line :
+            A copy of the line.
+        """
+        view = LineView(self, index)
+        line_object = Line('')
+        line_object.label, line_object.operation_name, line_object.operand, line_object.line_location = \
+            view.label, view.operation_name, view.operand, view.line_location
+        return line_object
@@ -0,0 +1,296 @@
+import sys
+import argparse
+from bisect import bisect_right
+from collections import namedtuple
+from image import read_object_file, write_image, write_object_file
+from assembler import MAX_RECORD_LENGTH, check_record_length
+
+# Address the first module is loaded at when none is given
+DEFAULT_LOAD_ADDRESS = 0x1000
+# Highest address an instruction can refer to
+MAX_ADDRESS = 0x7FFF
+
+# A linked program, written by image.write_object_file and image.write_image
+LinkedProgram = namedtuple(
+    'LinkedProgram', ['prog_name', 'start_address', 'prog_length', 'entry', 'segments'])
+
+
+class LinkError(Exception):
+    """
+    Raised when modules cannot be linked together.
+    """
+
+
+class ObjectModule:
+    """
+    The records of an object file, the addresses are the ones it was assembled at.
+
+    Parameters
+    ----------
+    object_file : file
+        Opened object file with H, D, R, T, M and E records.
+    """
+
+    def __init__(self, object_file):
+        super().__init__()
+        records = [record.rstrip('\n') for record in object_file]
+        self.prog_name, self.start_address, self.prog_length, self.entry, self.segments = read_object_file(
+            records, modules=True)
+        # (symbol, address) of the D records
+        self.definitions = []
+        # Symbols of the R records
+        self.references = []
+        # (address, half bytes, sign, symbol) of the M records
+        self.modifications = []
+        for record in records:
+            if record.startswith('D'):
+                for position in range(1, len(record), 12):
+                    self.definitions.append(
+                        (record[position:position + 6].strip(), int(record[position + 6:position + 12], 16)))
+            elif record.startswith('R'):
+                self.references.extend(
+                    record[position:position + 6].strip() for position in range(1, len(record), 6))
+            elif record.startswith('M'):
+                if record[9] not in '+-' or record[7:9] not in ('04', '06'):
+                    raise LinkError(f'Unsupported modification record in {self.prog_name}: {record}')
+                self.modifications.append((int(record[1:7], 16), int(record[7:9], 16), record[9], record[10:]))
+        # Programs without EXTDEF or EXTREF have no modification records to move them with
+        self.relocatable = any(record[:1] in ('D', 'R', 'M') for record in records)
+        # Starting address of each segment, to find the segment of a modification
+        self.segment_starts = [address for address, _ in self.segments]
+
+
+def read_module(object_path):
+    """
+    Read the object file of a module.
+
+    Parameters
+    ----------
+    object_path : str
+        Path of the object file.
+
+    Returns
+    ----------
+    ObjectModule :
+        The module.
+    """
+    with open(object_path, 'r') as object_file:
+        return ObjectModule(object_file)
+
+
+def place_modules(modules, load_address=DEFAULT_LOAD_ADDRESS, addresses=None):
+    """
+    Choose the load address of every module.
+
+    Parameters
+    ----------
+    modules : list
+        The ObjectModule of each module.
+
+    load_address : int
+        Address of the first module, the others follow each other in order.
+
+    addresses : dict
+        Load addresses of some modules by name, the next modules follow them.
+
+    Returns
+    ----------
+    list :
+        The load address of each module.
+    """
+    addresses = addresses or {}
+    placed = []
+    next_address = load_address
+    for module in modules:
+        next_address = addresses.get(module.prog_name, next_address)
+        placed.append(next_address)
+        next_address += module.prog_length
+    spans = sorted(zip(placed, (module.prog_length for module in modules), (module.prog_name for module in modules)))
+    for (address, length, name), (next_address, _, next_name) in zip(spans, spans[1:]):
+        if address + length > next_address:
+            raise LinkError(f'Modules {name} and {next_name} overlap at {next_address:06X}')
+    return placed
+
+
+def build_symbol_index(modules, placed):
+    """
+    Build the global symbol index of the modules, a hash table from each exported
+    symbol and each module name to its address once loaded.
+
+    Parameters
+    ----------
+    modules : list
+        The ObjectModule of each module.
+
+    placed : list
+        The load address of each module.
+
+    Returns
+    ----------
+    dict :
+        The address of each global symbol.
+    """
+    index = {}
+    owners = {}
+    for module, load_address in zip(modules, placed):
+        delta = load_address - module.start_address
+        for symbol, address in [(module.prog_name, module.start_address)] + module.definitions:
+            if symbol in index:
+                raise LinkError(f'{symbol} is defined by both {owners[symbol]} and {module.prog_name}')
+            index[symbol] = address + delta
+            owners[symbol] = module.prog_name
+    return index
+
+
+def relocate(module, load_address, index):
+    """
+    Copy the segments of a module to its load address and apply its modification records.
+
+    A modification of 4 half bytes changes the 15 bits address of an instruction and
+    keeps its index bit, one of 6 half bytes changes a whole word. The name of the
+    module itself relocates by the distance between its assembled and load addresses,
+    any other symbol adds its address from the index. A program assembled without
+    EXTDEF or EXTREF has no modification records, it is only loaded where it was
+    assembled.
+
+    Parameters
+    ----------
+    module : ObjectModule
+        The module.
+
+    load_address : int
+        Address the module is loaded at.
+
+    index : dict
+        The global symbol index.
+
+    Returns
+    ----------
+    tuple :
+        The relocated (address, bytearray) segments and the symbols missing from the index.
+    """
+    delta = load_address - module.start_address
+    if delta and not module.relocatable:
+        raise LinkError(f'{module.prog_name} has no modification records and cannot move from {module.start_address:06X} '
+                        f'to {load_address:06X}, assemble it at that address or as a module')
+    segments = [bytearray(data) for _, data in module.segments]
+    unresolved = []
+    for address, half_bytes, sign, symbol in module.modifications:
+        if symbol == module.prog_name:
+            value = delta
+        elif symbol in index:
+            value = index[symbol]
+        else:
+            unresolved.append(symbol)
+            continue
+        if sign == '-':
+            value = -value
+        position = bisect_right(module.segment_starts, address) - 1
+        size = half_bytes // 2
+        if position < 0 or address + size > module.segment_starts[position] + len(segments[position]):
+            raise LinkError(f'Modification at {address:06X} of {module.prog_name} is outside its object code')
+        data = segments[position]
+        offset = address - module.segment_starts[position]
+        field = int.from_bytes(data[offset:offset + size], 'big')
+        if half_bytes == 4:
+            relocated = (field & MAX_ADDRESS) + value
+            if not 0 <= relocated <= MAX_ADDRESS:
+                raise LinkError(
+                    f'Address {relocated:X} of the instruction at {address - 1:06X} of {module.prog_name} does not fit in 15 bits')
+            field = (field & ~MAX_ADDRESS) | relocated
+        else:
+            field = (field + value) & 0xFFFFFF
+        data[offset:offset + size] = field.to_bytes(size, 'big')
+    return [(address + delta, data) for (address, _), data in zip(module.segments, segments)], unresolved
+
+
+def link(modules, load_address=DEFAULT_LOAD_ADDRESS, addresses=None, prog_name=None):
+    """
+    Link modules into a single program.
+
+    Every module is read once to place it and index its symbols, then once to relocate
+    it, so linking takes a time linear in the total size of the modules.
+
+    Parameters
+    ----------
+    modules : list
+        The ObjectModule of each module, the first one is the main module.
+
+    load_address : int
+        Address of the first module, see `place_modules`.
+
+    addresses : dict
+        Load addresses of some modules by name.
+
+    prog_name : str
+        Name of the program, the name of the main module by default.
+
+    Returns
+    ----------
+    LinkedProgram :
+        The program, its entry point is the entry point of the main module.
+    """
+    if not modules:
+        raise LinkError('Nothing to link')
+    placed = place_modules(modules, load_address, addresses)
+    index = build_symbol_index(modules, placed)
+    segments = []
+    unresolved = {}
+    for module, module_address in zip(modules, placed):
+        module_segments, missing = relocate(module, module_address, index)
+        segments.extend(module_segments)
+        for symbol in missing:
+            unresolved.setdefault(symbol, module.prog_name)
+    if unresolved:
+        raise LinkError('Unresolved external symbols: ' +
+                        ', '.join(f'{symbol} (referred to by {name})' for symbol, name in unresolved.items()))
+    segments.sort(key=lambda segment: segment[0])
+    start_address = min(placed)
+    end_address = max(address + module.prog_length for module, address in zip(modules, placed))
+    main = modules[0]
+    return LinkedProgram(main.prog_name if prog_name is None else prog_name, start_address,
+                         end_address - start_address, main.entry - main.start_address + placed[0], segments)
+
+
+def _placement(text):
+    name, _, address = text.partition('=')
+    return name, int(address, 16)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Links object files of modules assembled separately into a single program.')
+    parser.add_argument('output_path')
+    parser.add_argument('object_paths', nargs='+',
+                        help='object files of the modules, the first one is the main module')
+    parser.add_argument('--address', type=lambda text: int(text, 16), default=DEFAULT_LOAD_ADDRESS,
+                        help='hexadecimal load address of the first module (default: %(default)X)')
+    parser.add_argument('--place', type=_placement, action='append', default=[], metavar='MODULE=ADDRESS',
+                        help='load a module at a hexadecimal address, the next modules follow it')
+    parser.add_argument('--name', help='name of the program (default: name of the main module)')
+    parser.add_argument('--image', action='store_true',
+                        help='write a binary image instead of an object file, see image.py')
+    parser.add_argument('--record-length', type=int, default=MAX_RECORD_LENGTH,
+                        help='maximum number of object code bytes in a text record (default: %(default)s)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not print the load map')
+    args = parser.parse_args()
+
+    check_record_length(args.record_length)
+    modules = [read_module(path) for path in args.object_paths]
+    try:
+        program = link(modules, args.address, dict(args.place), args.name)
+    except LinkError as error:
+        sys.exit(f'Error: {error}')
+    if args.image:
+        with open(args.output_path, 'wb') as image_file:
+            write_image(image_file, *program)
+    else:
+        with open(args.output_path, 'w') as object_file:
+            write_object_file(program, object_file, args.record_length)
+    if not args.quiet:
+        print(f'Program Name: {program.prog_name}', f'Starting Address: {hex(program.start_address)}',
+              f'Program Length: {program.prog_length} bytes', f'Entry Point: {hex(program.entry)}', sep='\n')
+        print('module \t address \t length')
+        for module, address in zip(modules, place_modules(modules, args.address, dict(args.place))):
+            print(f'{module.prog_name} \t {hex(address)} \t {module.prog_length}')
@@ -0,0 +1,305 @@
+import re
+import sys
+import argparse
+from tokenizer import tokenize, STATEMENT
+
+# Deepest chain of macros invoking macros
+MAX_DEPTH = 64
+# Number of memoized expansions kept, the oldest ones are dropped first
+MAX_CACHED_EXPANSIONS = 4096
+
+# A parameter `&NAME`, or the `$` starting a label made unique per expansion like `$LOOP`
+_PARAMETER = re.compile(r'(&\w+|\$(?=[A-Za-z]))')
+# Replaces `$` in the memoized expansions, until the expansion gets its unique prefix
+_UNIQUE = '\x00'
+
+
+class Macro:
+    """
+    A macro definition, its body is split once into text and parameters.
+
+    Parameters
+    ----------
+    name : str
+        Name of the macro, used as an operation name to invoke it.
+
+    parameters : list
+        Names of the parameters including their `&`.
+
+    body : list
+        The lines between MACRO and MEND, comment lines excluded.
+    """
+
+    def __init__(self, name, parameters, body):
+        super().__init__()
+        self.name = name
+        self.parameters = parameters
+        positions = {parameter: position for position, parameter in enumerate(parameters)}
+        # Each line is a list of strings and of parameter positions, None stands for a unique `$`.
+        # Other `&` names are kept, they are the parameters of the macros this one defines.
+        self.templates = []
+        for line in body:
+            template = []
+            for part in _PARAMETER.split(line):
+                if part in positions:
+                    template.append(positions[part])
+                elif part == '$':
+                    template.append(None)
+                elif part:
+                    template.append(part)
+            self.templates.append(template)
+        self.has_unique_labels = any(None in template for template in self.templates)
+
+    def expand(self, arguments):
+        """
+        Substitute the arguments of an invocation in the body.
+
+        Parameters
+        ----------
+        arguments : tuple
+            The value of each parameter.
+
+        Returns
+        ----------
+        list :
+            The lines of the expansion, `$` of unique labels left as `_UNIQUE`.
+        """
+        if len(arguments) > len(self.parameters):
+            raise SyntaxError(
+                f'Macro {self.name} takes {len(self.parameters)} arguments not {len(arguments)}')
+        # Missing arguments are empty
+        arguments = tuple(arguments) + ('',) * (len(self.parameters) - len(arguments))
+        return [''.join(arguments[part] if type(part) is int else _UNIQUE if part is None else part
+                        for part in template)
+                for template in self.templates]
+
+
+class MacroProcessor:
+    """
+    Expands MACRO/MEND definitions and their invocations while the source is read.
+
+    A definition `NAME MACRO &A,&B` ends at its MEND line, its invocations
+    `[label] NAME x,y` are replaced by the body with `&A` and `&B` replaced by the
+    arguments. A label of the invocation goes on the first line of the expansion and
+    a `$` starting a label makes it unique to each expansion (`$LOOP` becomes
+    `$AALOOP`, `$ABLOOP`, ...). Bodies can define and invoke other macros.
+
+    Expansions are memoized by macro and arguments, the same invocation is only
+    substituted once. Lines that are neither definitions nor invocations are passed
+    through untouched, sources without macros only pay a substring search per line.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.macros = {}
+        self.cache = {}
+        # Counters of what the processor did, see stats.RunStats
+        self.definitions = 0
+        self.expansions = 0
+        self.cache_hits = 0
+        self.lines_generated = 0
+        self.unique_count = 0
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the expansions served from the memoized ones.
+        """
+        return self.cache_hits / self.expansions if self.expansions else 0.0
+
+    def stats(self):
+        """
+        The counters of the processor.
+
+        Returns
+        ----------
+        dict :
+            The macros defined, the expansions, the cache hits and hit rate and the lines generated.
+        """
+        return {'macro_definitions': self.definitions, 'macro_expansions': self.expansions,
+                'macro_cache_hits': self.cache_hits, 'macro_hit_rate': self.hit_rate,
+                'macro_lines_generated': self.lines_generated}
+
+    def expand(self, lines, depth=0):
+        """
+        Expand the macros of a stream of source lines.
+
+        Parameters
+        ----------
+        lines : iterable
+            The source lines without line breaks, consumed lazily.
+
+        depth : int
+            Number of expansions the lines come from.
+
+        Returns
+        ----------
+        generator :
+            The source lines with the definitions removed and the invocations expanded.
+        """
+        if depth > MAX_DEPTH:
+            raise SyntaxError(f'Macros are nested deeper than {MAX_DEPTH} expansions')
+        macros = self.macros
+        lines = iter(lines)
+        for line in lines:
+            if (not macros and 'MACRO' not in line) or not self.is_candidate(line):
+                yield line
+                continue
+            kind, label, operation_name, operand, _ = tokenize(line)
+            if kind != STATEMENT:
+                yield line
+            elif operation_name == 'MACRO':
+                self.define(label, operand, lines)
+            elif operation_name in macros:
+                expansion, plain = self.invoke(macros[operation_name], label, operand)
+                if plain:
+                    yield from expansion
+                else:
+                    yield from self.expand(expansion, depth + 1)
+            else:
+                yield line
+
+    def is_candidate(self, line):
+        """
+        Whether a line may define or invoke a macro, from its first two fields before tokenizing it.
+        """
+        fields = line.split(None, 2)
+        return bool(fields) and ('MACRO' in fields[:2] or fields[0] in self.macros or
+                                 len(fields) > 1 and fields[1] in self.macros)
+
+    def define(self, name, operand, lines):
+        """
+        Read a macro definition up to its MEND line.
+
+        Parameters
+        ----------
+        name : str
+            The label of the MACRO line.
+
+        operand : str
+            The parameters of the MACRO line.
+
+        lines : iterator
+            The source lines following the MACRO line.
+
+        Returns
+        ----------
+        None
+        """
+        if name is None:
+            raise SyntaxError('A macro definition needs a name in its label field')
+        parameters = operand.split(',') if operand else []
+        for parameter in parameters:
+            if not parameter.startswith('&') or len(parameter) < 2:
+                raise SyntaxError(f'Macro parameters should start with & not {parameter!r} in macro {name}')
+        body = []
+        nesting = 0
+        for line in lines:
+            kind, _, operation_name, _, _ = tokenize(line)
+            if kind != STATEMENT:
+                continue
+            if operation_name == 'MACRO':
+                nesting += 1
+            elif operation_name == 'MEND':
+                if nesting == 0:
+                    break
+                nesting -= 1
+            body.append(line)
+        else:
+            raise SyntaxError(f'Macro {name} has no MEND')
+        self.macros[name] = Macro(name, parameters, body)
+        self.definitions += 1
+
+    def invoke(self, macro, label, operand):
+        """
+        The lines of an invocation, from the memoized expansions when possible.
+
+        Parameters
+        ----------
+        macro : Macro
+            The invoked macro.
+
+        label : str
+            Label of the invocation, None if there is none.
+
+        operand : str
+            The comma separated arguments.
+
+        Returns
+        ----------
+        list :
+            The lines of the expansion.
+
+        bool :
+            Whether the lines are known to hold no definition nor invocation, they are
+            checked again after new macros are defined.
+        """
+        arguments = tuple(operand.split(',')) if operand else ()
+        key = (macro, arguments)
+        # The lines and the number of macros defined when they were found plain
+        entry = self.cache.get(key)
+        self.expansions += 1
+        if entry is None:
+            entry = self.cache[key] = [macro.expand(arguments), -1]
+            if len(self.cache) > MAX_CACHED_EXPANSIONS:
+                del self.cache[next(iter(self.cache))]
+        else:
+            self.cache_hits += 1
+        expansion, plain_at = entry
+        if plain_at != self.definitions and not any(self.is_candidate(line) for line in expansion):
+            entry[1] = plain_at = self.definitions
+        if macro.has_unique_labels:
+            prefix = '$' + self.unique_prefix()
+            expansion = [line.replace(_UNIQUE, prefix) for line in expansion]
+        if label is not None:
+            expansion = self.label_first_line(macro, label, expansion)
+        self.lines_generated += len(expansion)
+        return expansion, plain_at == self.definitions
+
+    def unique_prefix(self):
+        """
+        The next prefix of unique labels: AA, AB, ..., ZZ, AAA, ...
+        """
+        number = self.unique_count
+        self.unique_count += 1
+        letters = ''
+        while True:
+            number, letter = divmod(number, 26)
+            letters = chr(ord('A') + letter) + letters
+            if number == 0:
+                return letters.rjust(2, 'A')
+
+    @staticmethod
+    def label_first_line(macro, label, expansion):
+        """
+        Put the label of an invocation on the first statement of its expansion.
+        """
+        for position, line in enumerate(expansion):
+            kind, first_label, operation_name, operand, comment = tokenize(line)
+            if kind != STATEMENT:
+                continue
+            if first_label is not None:
+                raise SyntaxError(
+                    f'The first statement of macro {macro.name} has a label, its invocation cannot have one')
+            fields = [label, operation_name] + [field for field in (operand, comment) if field is not None]
+            return expansion[:position] + [' '.join(fields)] + expansion[position + 1:]
+        raise SyntaxError(f'Macro {macro.name} has no statement to put the label {label} on')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Prints a SIC source script with its macros expanded.')
+    parser.add_argument('input_script_path')
+    parser.add_argument('-o', '--output', metavar='PATH',
+                        help='write the expanded source to PATH instead of stdout')
+    args = parser.parse_args()
+    processor = MacroProcessor()
+    with open(args.input_script_path, 'r') as source_file:
+        expanded = processor.expand(line.rstrip('\n') for line in source_file)
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                output_file.write('\n'.join(expanded))
+        else:
+            sys.stdout.write('\n'.join(expanded) + '\n')
+    print(f'{processor.definitions} macros, {processor.expansions} expansions, {processor.cache_hits} cache hits '
+          f'({processor.hit_rate:.0%}), {processor.lines_generated} lines generated', file=sys.stderr)
@@ -0,0 +1,134 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from assembler import Assembler
+from symbols import SymbolTable
+from utils import table_signature
+
+# Assembler encoding the shards of a worker process, set by _init_worker
+_worker = None
+
+
+def _init_worker(symbol_table, external_references, start_address, signature):
+    """
+    Give a worker process a frozen copy of the tables needed to encode lines.
+
+    Parameters
+    ----------
+    symbol_table : SymbolTable
+        The final symbol table of pass1.
+
+    external_references : dict
+        The symbols imported by EXTREF.
+
+    start_address : int
+        Starting address of the program.
+
+    signature : list
+        The `utils.table_signature` of the assembler, checked against the operations
+        registered in the worker.
+
+    Returns
+    ----------
+    None
+    """
+    global _worker
+    if signature != table_signature():
+        raise RuntimeError('Operation tables of the worker process differ from the assembler')
+    _worker = Assembler([])
+    _worker.symbol_table = symbol_table
+    _worker.absolute_symbols = symbol_table.absolute_symbols
+    _worker.external_references = external_references
+    _worker.start_address = start_address
+
+
+def _encode_shard(shard):
+    """
+    Encode a contiguous run of intermediate lines into its own slice of memory.
+
+    Parameters
+    ----------
+    shard : tuple
+        The locations, operation ids and operands of the lines, and the addresses
+        of the memory slice (start, end) they fill.
+
+    Returns
+    ----------
+    tuple :
+        The start of the memory slice, the size of each object code and the memory slice.
+    """
+    locations, operations, operands, start, end = shard
+    memory = bytearray(end - start)
+    sizes = array('l', [_worker.encode(operation, operand, location, memory, location - start)
+                        for location, operation, operand in zip(locations, operations, operands)])
+    return start, sizes, memory
+
+
+def iter_shards(assembler, shard_lines):
+    """
+    Split the intermediate of an assembler into contiguous shards.
+
+    Parameters
+    ----------
+    assembler : Assembler
+        The assembler after operating pass1.
+
+    shard_lines : int
+        Number of lines of a shard.
+
+    Returns
+    ----------
+    generator :
+        The shards as expected by `_encode_shard`.
+    """
+    intermediate = assembler.intermediate
+    strings = intermediate.strings
+    end_address = assembler.start_address + assembler.prog_length
+    for first in range(0, len(intermediate), shard_lines):
+        last = min(first + shard_lines, len(intermediate))
+        locations = intermediate.locations[first:last]
+        start = locations[0]
+        # The slice ends where the next shard starts, lines never write past the next location.
+        end = intermediate.locations[last] if last < len(intermediate) else end_address
+        operands = [strings[operand] if operand >= 0 else None
+                    for operand in intermediate.operands[first:last]]
+        yield locations, intermediate.operations[first:last], operands, start, max(start, end)
+
+
+def generate_objects_list(assembler, workers, shard_lines=None):
+    """
+    Generate the object codes of an assembler across a pool of processes.
+
+    The symbol table is final after pass1, so every line can be encoded independently.
+    Each worker encodes contiguous shards of the intermediate into their own slice of
+    memory, which are stitched back in order. The result is identical to
+    `Assembler.generate_objects_list`, including the first error raised.
+
+    Parameters
+    ----------
+    assembler : Assembler
+        The assembler after operating pass1.
+
+    workers : int
+        Number of worker processes, None for the number of CPUs.
+
+    shard_lines : int
+        Number of lines of a shard, by default four shards per worker.
+
+    Returns
+    ----------
+    None
+    """
+    workers = workers or os.cpu_count() or 1
+    if shard_lines is None:
+        shard_lines = max(1, -(-len(assembler.intermediate) // (workers * 4)))
+    tables = (SymbolTable(assembler.symbol_table, assembler.absolute_symbols), assembler.external_references,
+              assembler.start_address, table_signature())
+    assembler.memory = bytearray(assembler.prog_length)
+    assembler.object_sizes = array('l')
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=tables) as executor:
+        for start, sizes, memory in executor.map(_encode_shard, iter_shards(assembler, shard_lines)):
+            offset = start - assembler.start_address
+            assembler.memory[offset:offset + len(memory)] = memory
+            assembler.object_sizes.extend(sizes)
+    assembler.object_addresses = array('q', assembler.intermediate.locations)
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import socketserver
+from concurrent.futures import ProcessPoolExecutor
+from assembler import assemble_files, MAX_RECORD_LENGTH
+from cache import AssemblyCache, DEFAULT_MAX_BYTES
+
+# Cache of the worker process, set by _init_worker
+_cache = None
+
+
+def _init_worker(cache_directory, cache_bytes):
+    """
+    Open the cache of a worker process once, it stays warm between requests.
+
+    Parameters
+    ----------
+    cache_directory : str
+        Directory of the assembly cache, None to assemble every request.
+
+    cache_bytes : int
+        Size limit of the cache directory in bytes.
+
+    Returns
+    ----------
+    None
+    """
+    global _cache
+    if cache_directory is not None:
+        _cache = AssemblyCache(cache_directory, cache_bytes)
+
+
+def _ping():
+    return os.getpid()
+
+
+def assemble_request(request):
+    """
+    Assemble the source of a request, in a worker process.
+
+    Parameters
+    ----------
+    request : dict
+        The `source_path` of the script or its inline `source`, the `intermediate_path`,
+        `listing_path` and `object_path` of the outputs and optionally `streaming`,
+        `record_length` and the `xref_path` of a cross-reference index.
+
+    Returns
+    ----------
+    dict :
+        The program name, starting address, length and symbol table as returned by
+        `assembler.assembel`, or the error message if it failed.
+    """
+    inline_path = None
+    try:
+        source_path = request.get('source_path')
+        if request.get('source') is not None:
+            with tempfile.NamedTemporaryFile('w', suffix='.asm', delete=False) as source_file:
+                source_file.write(request['source'])
+            source_path = inline_path = source_file.name
+        if source_path is None:
+            raise ValueError('The request has neither a source_path nor a source')
+        assembler = assemble_files(source_path, request['intermediate_path'], request['listing_path'],
+                                   request['object_path'], bool(request.get('streaming', False)),
+                                   request.get('record_length') or MAX_RECORD_LENGTH, _cache,
+                                   xref_path=request.get('xref_path'))
+    except Exception as error:
+        return {'ok': False, 'error': f'{type(error).__name__}: {error}'}
+    finally:
+        if inline_path is not None:
+            os.remove(inline_path)
+    return {'ok': True, 'prog_name': assembler.prog_name, 'start_address': assembler.start_address,
+            'prog_length': assembler.prog_length, 'symbol_table': dict(assembler.symbol_table)}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests of a connection, one JSON object per line each way.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('a request is a JSON object')
+            except ValueError as error:
+                response = {'ok': False, 'error': f'Malformed request: {error}'}
+            else:
+                response = self.server.dispatch(request)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class AssemblerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Resident assembler listening on a Unix domain socket.
+
+    Each connection is served by a light thread that hands the assemble requests to a
+    bounded pool of worker processes. The workers are started once, so the interpreter,
+    the operation tables and the cache are already loaded when a request arrives.
+    A connection sends one JSON object per line with a `command`:
+
+    - `assemble`: the fields of `assemble_request`, answered with its result.
+    - `stats`: the health of the server and its counters.
+    - `shutdown`: stop the server, the requests already running are finished.
+
+    Parameters
+    ----------
+    socket_path : str
+        Path of the socket, a stale socket left by a dead server is replaced.
+
+    workers : int
+        Number of worker processes, None for the number of CPUs.
+
+    max_pending : int
+        Number of assemble requests queued or running before new ones wait, by
+        default four per worker.
+
+    cache_directory : str
+        Directory of an assembly cache shared by the workers, None for no cache.
+
+    cache_bytes : int
+        Size limit of the cache directory in bytes.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers=None, max_pending=None, cache_directory=None, cache_bytes=DEFAULT_MAX_BYTES):
+        _remove_stale_socket(socket_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.cache_directory = cache_directory
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {'requests': 0, 'assembled': 0, 'failed': 0}
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(cache_directory, cache_bytes))
+        # Start the workers before any connection thread exists, forking a threaded process is unsafe.
+        self.executor.submit(_ping).result()
+        super().__init__(socket_path, _RequestHandler)
+
+    def dispatch(self, request):
+        """
+        Answer a request.
+
+        Parameters
+        ----------
+        request : dict
+            The decoded request with its `command`.
+
+        Returns
+        ----------
+        dict :
+            The response, `ok` is False with an `error` message when the request failed.
+        """
+        command = request.get('command')
+        if command == 'assemble':
+            return self.assemble(request)
+        if command == 'stats':
+            return self.stats()
+        if command == 'shutdown':
+            # Answer before stopping, shutdown blocks until serve_forever returns.
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f'Unknown command: {command}'}
+
+    def assemble(self, request):
+        """
+        Run an assemble request on the worker pool, waiting for a slot when max_pending requests are running.
+        """
+        with self.slots:
+            with self.lock:
+                self.counters['requests'] += 1
+                self.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = self.executor.submit(assemble_request, request).result()
+            except Exception as error:
+                response = {'ok': False, 'error': f'{type(error).__name__}: {error}'}
+            with self.lock:
+                self.in_flight -= 1
+                self.busy_seconds += time.perf_counter() - start
+                self.counters['assembled' if response['ok'] else 'failed'] += 1
+        return response
+
+    def stats(self):
+        """
+        Describe the health of the server.
+
+        Returns
+        ----------
+        dict :
+            The process id, uptime, pool size, request counters, requests in flight,
+            time spent assembling and the cache counters when there is a cache.
+        """
+        with self.lock:
+            response = {'ok': True, 'pid': os.getpid(), 'uptime': time.time() - self.started,
+                        'workers': self.workers, 'max_pending': self.max_pending,
+                        'in_flight': self.in_flight, 'busy_seconds': self.busy_seconds, **self.counters}
+        if self.cache_directory is not None:
+            response['cache'] = AssemblyCache(self.cache_directory).stats()
+        return response
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Remove a socket nobody listens on, fail if a server is still running there.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise OSError(f'A server is already listening on {socket_path}')
+
+
+def serve(socket_path, workers=None, max_pending=None, cache_directory=None, cache_bytes=DEFAULT_MAX_BYTES):
+    """
+    Run a server until it receives a shutdown request or is interrupted, see `AssemblerServer`.
+    """
+    with AssemblerServer(socket_path, workers, max_pending, cache_directory, cache_bytes) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Serves assemble requests on a Unix domain socket, see client.py.')
+    parser.add_argument('socket_path')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='number of requests queued or running before new ones wait (default: 4 per worker)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='reuse the results of unchanged sources from the cache directory DIR')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                        help='size limit of the cache directory (default: %(default)s MB)')
+    args = parser.parse_args()
+    serve(args.socket_path, args.workers, args.max_pending,
+          args.cache, args.cache_size * 1024 * 1024)
@@ -0,0 +1,544 @@
+import sys
+import time
+import argparse
+from utils import opcode_table
+from image import ProgramImage, MAGIC, read_object_file, assembler_segments
+
+# Memory of a SIC machine in bytes
+MEMORY_SIZE = 1 << 15
+# Registers hold 24 bits words
+WORD_MASK = 0xFFFFFF
+SIGN_BIT = 0x800000
+# Value of L when the program starts, returning to it stops the machine
+HALT_ADDRESS = 0xFFFFFF
+# Condition codes kept in SW
+LESS = 0x40
+EQUAL = 0x00
+GREATER = 0x80
+
+
+class SimulatorError(Exception):
+    """
+    Raised when the simulated program cannot go on.
+    """
+
+
+def signed(word):
+    """
+    The value of a 24 bits two's complement word.
+    """
+    return word - 0x1000000 if word & SIGN_BIT else word
+
+
+class Device:
+    """
+    Stub of an I/O device, always ready, reads zeros and drops what is written.
+
+    Subclass it and attach it with `Machine.attach` to give TD, RD and WD a behaviour.
+    """
+
+    def test(self):
+        """
+        Whether the device is ready, TD sets CC to < when it is and to = when it is busy.
+        """
+        return True
+
+    def read(self):
+        """
+        The next byte read by RD.
+        """
+        return 0
+
+    def write(self, byte):
+        """
+        Receive the byte written by WD.
+        """
+
+
+class InputDevice(Device):
+    """
+    Device reading from a buffer, then zeros once the buffer is exhausted.
+
+    Parameters
+    ----------
+    data : bytes
+        The bytes to read.
+    """
+
+    def __init__(self, data=b''):
+        super().__init__()
+        self.data = bytes(data)
+        self.position = 0
+
+    def read(self):
+        if self.position >= len(self.data):
+            return 0
+        self.position += 1
+        return self.data[self.position - 1]
+
+
+class OutputDevice(Device):
+    """
+    Device collecting the written bytes in `data`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+
+    def write(self, byte):
+        self.data.append(byte)
+
+
+# Builders of the executors of each instruction, by mnemonic. A builder receives the
+# machine, the target address, whether it is indexed and the address of the next
+# instruction, and returns a function executing the instruction and returning the
+# address of the instruction to execute after it.
+
+
+def _load(register):
+    def build(machine, address, indexed, next_pc):
+        memory = machine.memory
+
+        def execute():
+            target = address + machine.x if indexed else address
+            setattr(machine, register, (memory[target] << 16) | (memory[target + 1] << 8) | memory[target + 2])
+            return next_pc
+        return execute
+    return build
+
+
+def _store(register):
+    def build(machine, address, indexed, next_pc):
+        memory = machine.memory
+        code = machine.code
+
+        def execute():
+            target = address + machine.x if indexed else address
+            word = getattr(machine, register)
+            memory[target] = word >> 16
+            memory[target + 1] = (word >> 8) & 0xFF
+            memory[target + 2] = word & 0xFF
+            if code[target] | code[target + 1] | code[target + 2]:
+                machine.invalidate(target, 3)
+            return next_pc
+        return execute
+    return build
+
+
+def _arithmetic(operation):
+    def build(machine, address, indexed, next_pc):
+        memory = machine.memory
+
+        def execute():
+            target = address + machine.x if indexed else address
+            machine.a = operation(machine.a, (memory[target] << 16) | (memory[target + 1] << 8) | memory[target + 2])
+            return next_pc
+        return execute
+    return build
+
+
+def _divide(left, right):
+    if right == 0:
+        raise SimulatorError('Division by zero')
+    quotient = abs(signed(left)) // abs(signed(right))
+    return (-quotient if (signed(left) < 0) != (signed(right) < 0) else quotient) & WORD_MASK
+
+
+def _build_lda(machine, address, indexed, next_pc):
+    memory = machine.memory
+    if indexed:
+        def execute():
+            target = address + machine.x
+            machine.a = (memory[target] << 16) | (memory[target + 1] << 8) | memory[target + 2]
+            return next_pc
+    else:
+        def execute():
+            machine.a = (memory[address] << 16) | (memory[address + 1] << 8) | memory[address + 2]
+            return next_pc
+    return execute
+
+
+def _build_ldch(machine, address, indexed, next_pc):
+    memory = machine.memory
+
+    def execute():
+        machine.a = (machine.a & 0xFFFF00) | memory[address + machine.x if indexed else address]
+        return next_pc
+    return execute
+
+
+def _build_stch(machine, address, indexed, next_pc):
+    memory = machine.memory
+    code = machine.code
+
+    def execute():
+        target = address + machine.x if indexed else address
+        memory[target] = machine.a & 0xFF
+        if code[target]:
+            machine.invalidate(target, 1)
+        return next_pc
+    return execute
+
+
+def _build_comp(machine, address, indexed, next_pc):
+    memory = machine.memory
+
+    def execute():
+        target = address + machine.x if indexed else address
+        # Flipping the sign bits orders two's complement words like unsigned integers.
+        left = machine.a ^ SIGN_BIT
+        right = ((memory[target] << 16) | (memory[target + 1] << 8) | memory[target + 2]) ^ SIGN_BIT
+        machine.sw = LESS if left < right else GREATER if left > right else EQUAL
+        return next_pc
+    return execute
+
+
+def _build_tix(machine, address, indexed, next_pc):
+    memory = machine.memory
+
+    def execute():
+        target = address + machine.x if indexed else address
+        machine.x = x = (machine.x + 1) & WORD_MASK
+        left = x ^ SIGN_BIT
+        right = ((memory[target] << 16) | (memory[target + 1] << 8) | memory[target + 2]) ^ SIGN_BIT
+        machine.sw = LESS if left < right else GREATER if left > right else EQUAL
+        return next_pc
+    return execute
+
+
+def _build_j(machine, address, indexed, next_pc):
+    if not indexed and address == next_pc - 3:
+        # `J *` loops forever, the usual way to stop a SIC program.
+        return lambda: HALT_ADDRESS
+    return lambda: address + machine.x if indexed else address
+
+
+def _conditional_jump(condition):
+    def build(machine, address, indexed, next_pc):
+        def execute():
+            if machine.sw == condition:
+                return address + machine.x if indexed else address
+            return next_pc
+        return execute
+    return build
+
+
+def _build_jsub(machine, address, indexed, next_pc):
+    def execute():
+        machine.l = next_pc
+        return address + machine.x if indexed else address
+    return execute
+
+
+def _build_rsub(machine, address, indexed, next_pc):
+    return lambda: machine.l
+
+
+def _device(machine, address, indexed):
+    number = machine.memory[address + machine.x if indexed else address]
+    device = machine.devices.get(number)
+    if device is None:
+        raise SimulatorError(f'No device {number:02X} is attached')
+    return device
+
+
+def _build_td(machine, address, indexed, next_pc):
+    def execute():
+        machine.sw = LESS if _device(machine, address, indexed).test() else EQUAL
+        return next_pc
+    return execute
+
+
+def _build_rd(machine, address, indexed, next_pc):
+    def execute():
+        machine.a = (machine.a & 0xFFFF00) | (_device(machine, address, indexed).read() & 0xFF)
+        return next_pc
+    return execute
+
+
+def _build_wd(machine, address, indexed, next_pc):
+    def execute():
+        _device(machine, address, indexed).write(machine.a & 0xFF)
+        return next_pc
+    return execute
+
+
+# Semantics of the SIC instructions, the operation codes come from `utils.opcode_table`
+builders = {'ADD': _arithmetic(lambda a, word: (a + word) & WORD_MASK),
+            'AND': _arithmetic(lambda a, word: a & word),
+            'COMP': _build_comp,
+            'DIV': _arithmetic(_divide),
+            'J': _build_j,
+            'JEQ': _conditional_jump(EQUAL),
+            'JGT': _conditional_jump(GREATER),
+            'JLT': _conditional_jump(LESS),
+            'JSUB': _build_jsub,
+            'LDA': _build_lda,
+            'LDCH': _build_ldch,
+            'LDL': _load('l'),
+            'LDX': _load('x'),
+            'OR': _arithmetic(lambda a, word: a | word),
+            'RD': _build_rd,
+            'RSUB': _build_rsub,
+            'STA': _store('a'),
+            'STCH': _build_stch,
+            'STL': _store('l'),
+            'STSW': _store('sw'),
+            'STX': _store('x'),
+            'SUB': _arithmetic(lambda a, word: (a - word) & WORD_MASK),
+            'TD': _build_td,
+            'TIX': _build_tix,
+            'WD': _build_wd}
+
+
+class Machine:
+    """
+    SIC machine executing programs from a cache of predecoded instructions.
+
+    Each instruction word is decoded once, the first time it is executed, into a
+    function specialized for its target address, stored in `cache` at its address.
+    Stores into bytes of decoded instructions drop them from the cache, so
+    self-modifying programs run the instructions they wrote.
+
+    Parameters
+    ----------
+    memory_size : int
+        Size of the memory in bytes.
+
+    devices : dict
+        Devices by device number, see `attach`.
+    """
+
+    def __init__(self, memory_size=MEMORY_SIZE, devices=None):
+        super().__init__()
+        self.memory = bytearray(memory_size)
+        # Executor of the instruction starting at each address, None until decoded
+        self.cache = [None] * memory_size
+        # Non zero for the bytes of decoded instructions, checked by the stores
+        self.code = bytearray(memory_size)
+        self.devices = dict(devices or {})
+        self.a = self.x = self.sw = 0
+        self.l = self.pc = HALT_ADDRESS
+        self.executed = 0
+        self.seconds = 0.0
+        self.decoded = 0
+        self.invalidated = 0
+        # Builders by operation code, read from the operation code table so registered instructions are known
+        self.builders = [None] * 256
+        for operation_name, instruction in opcode_table.items():
+            if operation_name in builders and instruction.format == 3:
+                self.builders[instruction.opcode] = builders[operation_name]
+
+    def attach(self, number, device):
+        """
+        Attach a device to a device number, used by the TD, RD and WD instructions.
+        """
+        self.devices[number] = device
+
+    def load(self, segments, entry):
+        """
+        Copy segments of object code into memory and point PC at the entry point.
+
+        Parameters
+        ----------
+        segments : iterable
+            Pairs of (address, bytes-like).
+
+        entry : int
+            Address of the first instruction.
+
+        Returns
+        ----------
+        None
+        """
+        for address, data in segments:
+            if address + len(data) > len(self.memory):
+                raise SimulatorError(f'The program does not fit in {len(self.memory)} bytes of memory')
+            self.memory[address:address + len(data)] = data
+            self.invalidate(address, len(data))
+        self.pc = entry
+        self.l = HALT_ADDRESS
+
+    def load_object(self, object_file):
+        """
+        Load the H, T and E records of an opened object file.
+        """
+        _, _, _, entry, segments = read_object_file(object_file)
+        self.load(segments, entry)
+
+    def load_image(self, image):
+        """
+        Load a `image.ProgramImage`.
+        """
+        self.load(image.segments, image.entry)
+
+    def load_assembler(self, assembler):
+        """
+        Load the memory of an assembler after operating both passes, not in streaming mode.
+        """
+        self.load(assembler_segments(assembler), assembler.start_address)
+
+    def decode(self, address):
+        """
+        Decode the instruction at an address into the cache.
+
+        Parameters
+        ----------
+        address : int
+            Address of the instruction.
+
+        Returns
+        ----------
+        function :
+            The executor of the instruction, returning the address of the next one.
+        """
+        if address + 3 > len(self.memory):
+            raise SimulatorError(f'Instruction at {address:X} is out of memory')
+        memory = self.memory
+        build = self.builders[memory[address]]
+        if build is None:
+            raise SimulatorError(f'Illegal instruction {memory[address]:02X} at {address:X}')
+        execute = build(self, ((memory[address + 1] << 8) | memory[address + 2]) & 0x7FFF,
+                        memory[address + 1] & 0x80, address + 3)
+        self.cache[address] = execute
+        self.code[address:address + 3] = b'\x01\x01\x01'
+        self.decoded += 1
+        return execute
+
+    def invalidate(self, address, length):
+        """
+        Drop the decoded instructions overlapping a range of memory.
+        """
+        first = max(0, address - 2)
+        last = min(len(self.cache), address + length)
+        self.cache[first:last] = [None] * (last - first)
+        self.invalidated += 1
+
+    def run(self, max_instructions=None):
+        """
+        Execute instructions from PC until the program returns to HALT_ADDRESS or jumps to itself.
+
+        Parameters
+        ----------
+        max_instructions : int
+            Stop after this many instructions, None to run until the program stops.
+
+        Returns
+        ----------
+        int :
+            The number of instructions executed.
+        """
+        cache = self.cache
+        decode = self.decode
+        limit = -1 if max_instructions is None else max_instructions
+        pc = self.pc
+        executed = 0
+        start = time.perf_counter()
+        try:
+            while pc != HALT_ADDRESS and executed != limit:
+                pc = (cache[pc] or decode(pc))()
+                executed += 1
+        except IndexError:
+            # Executors index memory without bounds checks, only errors of those accesses are translated
+            if not self._out_of_memory(pc):
+                raise
+            raise SimulatorError(f'Memory access out of range by the instruction at {pc:X}') from None
+        finally:
+            self.pc = pc
+            self.executed += executed
+            self.seconds += time.perf_counter() - start
+        return executed
+
+    def _out_of_memory(self, pc):
+        """
+        Whether the instruction at PC is out of memory or addresses a word out of memory.
+        """
+        memory = self.memory
+        if pc + 3 > len(memory):
+            return True
+        target = ((memory[pc + 1] << 8) | memory[pc + 2]) & 0x7FFF
+        if memory[pc + 1] & 0x80:
+            target += self.x
+        return target + 3 > len(memory)
+
+    @property
+    def halted(self):
+        return self.pc == HALT_ADDRESS
+
+    def registers(self):
+        """
+        The registers as a dictionary.
+        """
+        return {'A': self.a, 'X': self.x, 'L': self.l, 'PC': self.pc, 'SW': self.sw}
+
+    def stats(self):
+        """
+        Counters of the runs so far.
+
+        Returns
+        ----------
+        dict :
+            The instructions executed, seconds spent, instructions per second and the
+            number of decoded and invalidated cache entries.
+        """
+        return {'instructions': self.executed, 'seconds': self.seconds,
+                'instructions_per_second': self.executed / self.seconds if self.seconds else 0.0,
+                'decoded': self.decoded, 'invalidated': self.invalidated}
+
+
+def _device_argument(text):
+    number, _, path = text.partition('=')
+    return int(number, 16), path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Runs an assembled SIC program from its object file or binary image.')
+    parser.add_argument('program_path', help='object file or binary image written by assembler.py')
+    parser.add_argument('--input', type=_device_argument, action='append', default=[], metavar='DEVICE=PATH',
+                        help='read device DEVICE (hexadecimal) from PATH, - for stdin')
+    parser.add_argument('--output', type=_device_argument, action='append', default=[], metavar='DEVICE=PATH',
+                        help='write device DEVICE (hexadecimal) to PATH, - for stdout')
+    parser.add_argument('--max-instructions', type=int, default=None,
+                        help='stop after this many instructions')
+    args = parser.parse_args()
+
+    machine = Machine()
+    for number, path in args.input:
+        if path == '-':
+            machine.attach(number, InputDevice(sys.stdin.buffer.read()))
+        else:
+            with open(path, 'rb') as input_file:
+                machine.attach(number, InputDevice(input_file.read()))
+    outputs = []
+    for number, path in args.output:
+        outputs.append((path, OutputDevice()))
+        machine.attach(number, outputs[-1][1])
+    with open(args.program_path, 'rb') as program_file:
+        is_image = program_file.read(len(MAGIC)) == MAGIC
+    if is_image:
+        with ProgramImage(args.program_path) as image:
+            machine.load_image(image)
+    else:
+        with open(args.program_path, 'r') as object_file:
+            try:
+                machine.load_object(object_file)
+            except ValueError as error:
+                sys.exit(f'Error: {error}')
+    try:
+        machine.run(args.max_instructions)
+    except SimulatorError as error:
+        print(f'Error: {error}', file=sys.stderr)
+    for path, device in outputs:
+        if path == '-':
+            sys.stdout.buffer.write(device.data)
+            sys.stdout.flush()
+        else:
+            with open(path, 'wb') as output_file:
+                output_file.write(device.data)
+    stats = machine.stats()
+    print('\n' + ' '.join(f'{name}={value:06X}' for name, value in machine.registers().items()), file=sys.stderr)
+    print(f'{stats["instructions"]:,} instructions in {stats["seconds"]:.3f} s, '
+          f'{stats["instructions_per_second"]:,.0f} instructions/s', file=sys.stderr)
+    sys.exit(0 if machine.halted else 1)
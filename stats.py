@@ -0,0 +1,103 @@
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+
+class RunStats:
+    """
+    Statistics of an assembly run: the time spent in each phase and counters of what the assembler did.
+
+    Pass an instance to `assembler.assemble_files` to fill it, nothing is measured
+    when no instance is given.
+
+    Parameters
+    ----------
+    profile : bool
+        Also run cProfile while inside the phases, see `dump_profile`.
+    """
+
+    def __init__(self, profile=False):
+        super().__init__()
+        # Wall and CPU seconds of each phase, in the order they ran
+        self.phases = {}
+        self.counters = {}
+        self.profiler = cProfile.Profile() if profile else None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure the wall and CPU time of the enclosed block, added to the phase `name`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase.
+        """
+        if self.profiler is not None:
+            self.profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if self.profiler is not None:
+                self.profiler.disable()
+            timing = self.phases.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            timing['wall'] += wall
+            timing['cpu'] += cpu
+
+    def count(self, name, value=1):
+        """
+        Add `value` to the counter `name`.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def collect(self, assembler):
+        """
+        Copy the counters an assembler keeps while it runs.
+
+        Parameters
+        ----------
+        assembler : Assembler
+            The assembler after operating both passes.
+
+        Returns
+        ----------
+        None
+        """
+        self.counters['lines_read'] = assembler.lines_read
+        self.counters['comments_skipped'] = assembler.comments_skipped
+        self.counters['literals_per_ltorg'] = list(assembler.ltorg_literals)
+        self.counters['literals_at_end'] = assembler.end_literals
+        self.counters['text_records'] = assembler.text_record_count
+        self.counters['symbols'] = len(assembler.symbol_table)
+        self.counters.update(assembler.macro_processor.stats())
+
+    def as_dict(self):
+        """
+        The statistics as plain data.
+
+        Returns
+        ----------
+        dict :
+            The phases with their wall and CPU seconds and the counters.
+        """
+        total = {'wall': sum(timing['wall'] for timing in self.phases.values()),
+                 'cpu': sum(timing['cpu'] for timing in self.phases.values())}
+        return {'phases': self.phases, 'total': total, 'counters': self.counters}
+
+    def dump(self, output_file):
+        """
+        Write the statistics as JSON to an opened file.
+        """
+        json.dump(self.as_dict(), output_file, indent=1)
+        output_file.write('\n')
+
+    def dump_profile(self, path):
+        """
+        Write the cProfile statistics of the phases to `path`, readable with the pstats module.
+        """
+        if self.profiler is None:
+            raise ValueError('Profiling was not enabled for this run')
+        self.profiler.dump_stats(path)
@@ -0,0 +1,213 @@
+import sys
+import struct
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Layout of a saved symbol table: magic, version, count, then the addresses as
+# signed 64 bits little endian integers, a byte per symbol set to 1 for the absolute
+# ones and the labels separated by new lines.
+MAGIC = b'SICS'
+VERSION = 2
+HEADER = struct.Struct('<4sHI')
+
+
+class SymbolTable(dict):
+    """
+    Symbol table mapping labels and literals to their integer addresses.
+
+    Looking up an undefined symbol raises KeyError instead of inserting an empty
+    value. An index of the labels sorted by address answers reverse lookups with
+    bisect, it is rebuilt on the first reverse lookup after a change. Literals and
+    the symbols in `absolute_symbols`, constants defined by EQU, are not addresses
+    and are left out of the index.
+
+    Parameters
+    ----------
+    symbols : iterable
+        Optional (label, address) pairs or mapping to start from.
+
+    absolute_symbols : iterable
+        The symbols among them with an absolute value.
+    """
+
+    def __init__(self, symbols=(), absolute_symbols=()):
+        super().__init__(symbols)
+        # Symbols with an absolute value, kept up to date by the assembler
+        self.absolute_symbols = set(absolute_symbols)
+        self._addresses = None
+        self._labels = None
+
+    def __setitem__(self, label, address):
+        super().__setitem__(label, address)
+        self._addresses = None
+
+    def __delitem__(self, label):
+        super().__delitem__(label)
+        self._addresses = None
+
+    def clear(self):
+        super().clear()
+        self.absolute_symbols.clear()
+        self._addresses = None
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._addresses = None
+
+    def setdefault(self, label, address=None):
+        self._addresses = None
+        return super().setdefault(label, address)
+
+    def pop(self, *args):
+        self._addresses = None
+        return super().pop(*args)
+
+    def _index(self):
+        if self._addresses is None:
+            # Sort on the address then on the definition order of the symbols.
+            labels = [label for label in self if label[:1] != '=' and label not in self.absolute_symbols]
+            self._labels = sorted(labels, key=self.__getitem__)
+            self._addresses = array('q', [self[label] for label in self._labels])
+        return self._addresses, self._labels
+
+    def labels_at(self, address):
+        """
+        The symbols defined at an address.
+
+        Parameters
+        ----------
+        address : int
+            The address.
+
+        Returns
+        ----------
+        list :
+            The labels in definition order, empty if no symbol is defined there.
+        """
+        addresses, labels = self._index()
+        return labels[bisect_left(addresses, address):bisect_right(addresses, address)]
+
+    def nearest_label(self, address):
+        """
+        The closest symbol at or before an address, to describe an address as `label+offset`.
+
+        Parameters
+        ----------
+        address : int
+            The address.
+
+        Returns
+        ----------
+        tuple :
+            The label and its address, None if no symbol is defined at or before the address.
+        """
+        addresses, labels = self._index()
+        position = bisect_right(addresses, address)
+        if position == 0:
+            return None
+        # The first label of the closest address, usually the one written in the source.
+        position = bisect_left(addresses, addresses[position - 1])
+        return labels[position], addresses[position]
+
+    def describe(self, address):
+        """
+        Describe an address relative to the nearest symbol.
+
+        Parameters
+        ----------
+        address : int
+            The address.
+
+        Returns
+        ----------
+        str :
+            `LABEL`, `LABEL+offset` in hexadecimal or the address itself without a symbol before it.
+        """
+        nearest = self.nearest_label(address)
+        if nearest is None:
+            return hex(address)
+        label, label_address = nearest
+        return label if label_address == address else f'{label}+{address - label_address:X}'
+
+    def in_range(self, start, end):
+        """
+        The symbols with an address in [start, end).
+
+        Returns
+        ----------
+        list :
+            Pairs of (label, address) in address order.
+        """
+        addresses, labels = self._index()
+        first, last = bisect_left(addresses, start), bisect_left(addresses, end)
+        return list(zip(labels[first:last], addresses[first:last]))
+
+    def save(self, symbols_file):
+        """
+        Write the table in a compact binary form.
+
+        Parameters
+        ----------
+        symbols_file : file
+            File opened for binary writing.
+
+        Returns
+        ----------
+        None
+        """
+        symbols_file.write(HEADER.pack(MAGIC, VERSION, len(self)))
+        addresses = array('q', self.values())
+        if sys.byteorder == 'big':
+            addresses.byteswap()
+        symbols_file.write(addresses.tobytes())
+        symbols_file.write(bytes(label in self.absolute_symbols for label in self))
+        symbols_file.write('\n'.join(self).encode('utf-8'))
+
+    @classmethod
+    def load(cls, symbols_file):
+        """
+        Read a table written by `save`.
+
+        Parameters
+        ----------
+        symbols_file : file
+            File opened for binary reading.
+
+        Returns
+        ----------
+        SymbolTable :
+            The table, in the same definition order.
+        """
+        data = symbols_file.read()
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a version {VERSION} symbol table file')
+        addresses = array('q')
+        addresses.frombytes(data[HEADER.size:HEADER.size + 8 * count])
+        if sys.byteorder == 'big':
+            addresses.byteswap()
+        position = HEADER.size + 8 * count
+        flags = data[position:position + count]
+        labels = data[position + count:].decode('utf-8').split('\n') if count else []
+        if len(labels) != count or len(flags) != count:
+            raise ValueError('Symbol table file is truncated')
+        return cls(zip(labels, addresses), [label for label, flag in zip(labels, flags) if flag])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Prints a symbol table saved with assembler.py --symbols.')
+    parser.add_argument('symbols_path')
+    parser.add_argument('addresses', nargs='*',
+                        help='hexadecimal addresses to describe relative to the nearest symbol')
+    args = parser.parse_args()
+    with open(args.symbols_path, 'rb') as symbols_file:
+        symbol_table = SymbolTable.load(symbols_file)
+    if args.addresses:
+        for address in args.addresses:
+            print(address + ' \t ' + symbol_table.describe(int(address, 16)))
+    else:
+        print('label \t address')
+        for label, label_address in symbol_table.items():
+            print(label + ' \t ' + hex(label_address).upper().replace('X', 'x'))
@@ -0,0 +1,12 @@
+from batch import output_dirs
+
+
+def test_output_dirs_numbers_sources_with_the_same_name():
+    assert output_dirs(['a/x.asm', 'b/x.asm', 'c/y.asm'], 'out') == ['out/x', 'out/x-2', 'out/y']
+
+
+def test_output_dirs_skip_suffixes_taken_by_real_names():
+    dirs = output_dirs(['a/x.asm', 'b/x.asm', 'c/x-2.asm'], 'out')
+    assert len(set(dirs)) == 3
+    dirs = output_dirs(['c/x-2.asm', 'a/x.asm', 'b/x.asm', 'd/x.asm'], 'out')
+    assert dirs == ['out/x-2', 'out/x', 'out/x-3', 'out/x-4']
@@ -0,0 +1,76 @@
+import os
+
+import cache
+from assembler import assemble_files
+from cache import AssemblyCache
+from stats import RunStats
+
+SOURCE = '''COPY     START  1000
+FIRST    LDA    =C'EOF'
+         STA    BUFFER
+         LTORG
+BUFFER   RESB   3
+TABLE    WORD   5
+         END    FIRST
+'''
+
+
+def assemble(tmp_path, name, assembly_cache):
+    paths = [str(tmp_path / f'{name}.{suffix}') for suffix in ('mdt', 'lst', 'obj')]
+    stats = RunStats()
+    assemble_files(str(tmp_path / 'copy.asm'), *paths, cache=assembly_cache, stats=stats)
+    return [open(path, 'rb').read() for path in paths], stats.counters
+
+
+def test_hits_restore_the_files_and_counters(tmp_path, monkeypatch):
+    # Small chunks so the outputs are copied in many pieces
+    monkeypatch.setattr(cache, 'CHUNK_SIZE', 7)
+    (tmp_path / 'copy.asm').write_text(SOURCE)
+    assembly_cache = AssemblyCache(str(tmp_path / 'cache'))
+    missed, miss_counters = assemble(tmp_path, 'miss', assembly_cache)
+    hit, hit_counters = assemble(tmp_path, 'hit', assembly_cache)
+    assert (assembly_cache.misses, assembly_cache.hits) == (1, 1)
+    assert hit == missed
+    assert hit_counters['text_records'] == miss_counters['text_records'] == 2
+    assert hit_counters == miss_counters
+
+
+def test_truncated_entries_are_misses(tmp_path):
+    (tmp_path / 'copy.asm').write_text(SOURCE)
+    assembly_cache = AssemblyCache(str(tmp_path / 'cache'))
+    missed, _ = assemble(tmp_path, 'miss', assembly_cache)
+    _, _, entry_path = assembly_cache.entries()[0]
+    with open(entry_path, 'r+b') as entry_file:
+        entry_file.truncate(os.path.getsize(entry_path) - 4)
+    again, _ = assemble(tmp_path, 'again', assembly_cache)
+    assert (assembly_cache.misses, assembly_cache.hits) == (2, 0)
+    assert again == missed
+    # The partial copies of the damaged entry were removed
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_damaged_entries_leave_the_outputs_untouched(tmp_path):
+    (tmp_path / 'copy.asm').write_text(SOURCE)
+    assembly_cache = AssemblyCache(str(tmp_path / 'cache'))
+    assemble(tmp_path, 'miss', assembly_cache)
+    with open(tmp_path / 'copy.asm', 'rb') as source_file:
+        key = AssemblyCache.key(source_file, 30)
+    with open(assembly_cache.entry_path(key), 'r+b') as entry_file:
+        entry_file.seek(40)
+        entry_file.write(b'damaged')
+    paths = [str(tmp_path / f'old.{suffix}') for suffix in ('mdt', 'lst', 'obj')]
+    for path in paths:
+        with open(path, 'w') as output_file:
+            output_file.write('old')
+    assert assembly_cache.get(key, paths) is None
+    assert [open(path).read() for path in paths] == ['old'] * 3
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_keys_do_not_depend_on_the_chunks(tmp_path, monkeypatch):
+    (tmp_path / 'copy.asm').write_text(SOURCE)
+    with open(tmp_path / 'copy.asm', 'rb') as source_file:
+        key = AssemblyCache.key(source_file, 30)
+    monkeypatch.setattr(cache, 'CHUNK_SIZE', 3)
+    with open(tmp_path / 'copy.asm', 'rb') as source_file:
+        assert AssemblyCache.key(source_file, 30) == key
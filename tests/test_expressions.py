@@ -0,0 +1,78 @@
+import io
+import pytest
+from assembler import Assembler
+from expressions import parse_expression, evaluate, resolution_order, LOCATION
+
+
+def pass_one(source):
+    assembler = Assembler(io.StringIO(source))
+    assembler.pass_one()
+    return assembler
+
+
+def test_parse_expression():
+    assert parse_expression('BUFEND-BUFFER+3') == ((1, 'BUFEND'), (-1, 'BUFFER'), (1, 3))
+    assert parse_expression('*-6') == ((1, LOCATION), (-1, 6))
+    assert parse_expression('-5') == ((-1, 5),)
+    for text in ('A--B', 'A+', 'A B'):
+        with pytest.raises(SyntaxError):
+            parse_expression(text)
+
+
+def test_absolute_and_relative_results():
+    symbols = {'FIRST': 0x1000, 'LAST': 0x1030, 'SIZE': 100}
+    assert evaluate(parse_expression('LAST-FIRST'), symbols, 0x1003, {'SIZE'}) == (0x30, 0, [])
+    assert evaluate(parse_expression('FIRST+SIZE'), symbols, 0x1003, {'SIZE'}) == (0x1064, 1, [])
+    assert evaluate(parse_expression('*-3'), symbols, 0x1003, {'SIZE'}) == (0x1000, 1, [])
+    assert evaluate(parse_expression('SIZE+2'), symbols, 0, {'SIZE'}) == (102, 0, [])
+    with pytest.raises(KeyError):
+        evaluate(parse_expression('NOPE+1'), symbols, 0)
+
+
+def test_forward_equ_chain():
+    count = 500
+    lines = ['CHAIN START 0', ' LDA E0']
+    lines += [f'E{index} EQU E{index + 1}+1' for index in range(count - 1)]
+    lines += [f'E{count - 1} EQU BASE-{count}', 'BASE RESW 1', ' END']
+    assembler = pass_one('\n'.join(lines))
+    assert assembler.symbol_table['BASE'] == 3
+    assert assembler.symbol_table['E0'] == 2
+    assert assembler.symbol_table[f'E{count - 1}'] == 3 - count
+    assert 'E0' not in assembler.absolute_symbols
+
+
+def test_equ_kinds():
+    assembler = pass_one('PROG START 1000\nFIRST LDA LENGTH\nLENGTH EQU BUFEND-BUFFER\n'
+                         'HERE EQU *\nBUFFER RESB 10\nBUFEND EQU *\nMIDDLE EQU BUFFER+5\n END\n')
+    table = assembler.symbol_table
+    assert (table['LENGTH'], table['HERE'], table['BUFEND'], table['MIDDLE']) == (10, 0x1003, 0x100D, 0x1008)
+    assert assembler.absolute_symbols == {'LENGTH'}
+
+
+def test_two_relative_terms_are_rejected():
+    with pytest.raises(SyntaxError, match='neither absolute nor an address'):
+        pass_one('P START 0\nFIRST LDA ZERO\nX2 EQU FIRST+ZERO\nZERO WORD 0\n END\n')
+
+
+def test_cycle_error_names_the_cycle():
+    pending = {name: (parse_expression(expression), 0, line) for line, (name, expression) in enumerate(
+        [('A', 'B+1'), ('B', 'C'), ('C', 'A-2'), ('D', 'A')])}
+    with pytest.raises(SyntaxError, match=r'Circular EQU definitions: (A -> B -> C -> A|B -> C -> A -> B|C -> A -> B -> C)'):
+        resolution_order(pending, {})
+    with pytest.raises(SyntaxError, match='Circular EQU definitions: A -> B -> C -> A'):
+        pass_one('P START 0\nA EQU B+1\nB EQU C\nC EQU A-2\n LDA A\n END\n')
+
+
+def test_resolution_order_puts_dependencies_first():
+    pending = {'A': (parse_expression('B+C'), 0, 1), 'B': (parse_expression('C-1'), 0, 2),
+               'C': (parse_expression('BASE'), 0, 3)}
+    order = resolution_order(pending, {'BASE': 0})
+    assert order.index('C') < order.index('B') < order.index('A')
+    with pytest.raises(SyntaxError, match='Undefined symbol NOPE'):
+        resolution_order({'A': (parse_expression('NOPE'), 0, 1)}, {})
+
+
+def test_forward_equ_of_external_symbol_is_reported():
+    # HERE is defined after the EQU, which waits for it and then meets the external OUTER
+    with pytest.raises(SyntaxError, match='EQU of LATE refers to the external symbol OUTER'):
+        pass_one('P START 0\n EXTREF OUTER\nLATE EQU OUTER-HERE\nHERE RESW 1\n END\n')
@@ -0,0 +1,18 @@
+import io
+
+import pytest
+
+from image import read_object_file
+
+MODULE = 'HMOD    000000000006\nDBUF   000003\nRXT    \nT00000006000003000000\nM00000104+XT\nE000000\n'
+
+
+def test_object_files_of_modules_are_rejected():
+    with pytest.raises(ValueError, match='link it with linker.py'):
+        read_object_file(io.StringIO(MODULE))
+
+
+def test_modules_are_read_when_asked():
+    prog_name, start_address, prog_length, entry, segments = read_object_file(io.StringIO(MODULE), modules=True)
+    assert (prog_name, start_address, prog_length, entry) == ('MOD', 0, 6, 0)
+    assert segments == [(0, bytearray.fromhex('000003000000'))]
@@ -0,0 +1,67 @@
+import pytest
+
+from assembler import Assembler
+from incremental import IncrementalAssembler
+
+SOURCE = '''PROG     START  1000
+FIRST    LDA    LENGTH
+         STA    BUFEND-3
+         LDX    MAXLEN
+         LDCH   BUFFER+2,X
+         J      *
+         J      *-3
+MAXLEN   EQU    BUFEND-BUFFER
+HALF     EQU    SIZE-50
+SIZE     EQU    100
+LENGTH   WORD   MAXLEN
+W2       WORD   BUFEND-BUFFER+1
+W3       WORD   -5
+         LDA    =C'EOF'
+BUFFER   RESB   100
+BUFEND   EQU    *
+         END    FIRST'''.split('\n')
+
+EDITS = [
+    lambda lines: lines[:2] + ['         LDA    SIZE'] + lines[2:],
+    lambda lines: [line.replace('SIZE     EQU    100', 'SIZE     EQU    90') for line in lines],
+    lambda lines: [line.replace('RESB   100', 'RESB   60') for line in lines],
+    lambda lines: lines[:8] + ['XTRA     EQU    *+1', '         WORD   XTRA'] + lines[8:],
+    lambda lines: [line.replace('MAXLEN   EQU    BUFEND-BUFFER', 'MAXLEN   EQU    BUFEND-FIRST') for line in lines],
+    lambda lines: [line.replace('W3       WORD   -5', 'W3       WORD   7') for line in lines],
+]
+
+
+def assert_same_as_fresh(incremental, lines):
+    fresh = Assembler(lines)
+    fresh.pass_one()
+    fresh.generate_objects_list()
+    fresh.generate_text_records()
+    assert incremental.record_texts == [record for record in fresh.text_records if record.startswith('T')]
+    assert incremental.memory == fresh.memory
+
+
+def test_updates_match_a_fresh_assembly():
+    incremental = IncrementalAssembler()
+    lines = SOURCE
+    incremental.assemble(lines)
+    assert_same_as_fresh(incremental, lines)
+    for edit in EDITS:
+        lines = edit(lines)
+        incremental.update(lines)
+        assert_same_as_fresh(incremental, lines)
+
+
+def test_failed_update_is_reverted():
+    incremental = IncrementalAssembler()
+    lines = EDITS[0](SOURCE)
+    incremental.assemble(SOURCE)
+    incremental.update(lines)
+    with pytest.raises(SyntaxError):
+        incremental.update(lines[:5] + ['         STA    NOWHERE'] + lines[5:])
+    # Back to the source before the failed edit, then on with the next edits
+    incremental.update(lines)
+    assert_same_as_fresh(incremental, lines)
+    for edit in EDITS[1:3]:
+        lines = edit(lines)
+        incremental.update(lines)
+        assert_same_as_fresh(incremental, lines)
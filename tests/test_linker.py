@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from assembler import assemble_files
+from image import write_object_file
+from linker import LinkError, build_symbol_index, link, place_modules, read_module
+
+MAIN = '''MAIN     START  0
+         EXTDEF RESULT
+         EXTREF ADDTWO,VALUE
+FIRST    STL    RETADR
+         LDA    VALUE
+         JSUB   ADDTWO
+         STA    RESULT
+         LDA    =C'AB'
+         LDL    RETADR
+         RSUB
+RESULT   RESW   1
+RETADR   RESW   1
+         END    FIRST'''
+
+LIB = '''LIB      START  0
+         EXTDEF ADDTWO,VALUE
+         EXTREF RESULT
+ADDTWO   ADD    TWO
+         STA    RESULT
+         LDX    ZERO
+         LDA    TABLE,X
+         RSUB
+TWO      WORD   2
+ZERO     WORD   0
+VALUE    WORD   40
+TABLE    WORD   7
+         END    ADDTWO'''
+
+
+def modules(tmp_path, *sources):
+    assembled = []
+    for position, source in enumerate(sources):
+        (tmp_path / f'{position}.asm').write_text(source)
+        paths = [str(tmp_path / f'{position}.{suffix}') for suffix in ('mdt', 'lst', 'obj')]
+        assemble_files(str(tmp_path / f'{position}.asm'), *paths)
+        assembled.append(read_module(paths[2]))
+    return assembled
+
+
+def test_external_symbols_are_resolved(tmp_path):
+    main, lib = modules(tmp_path, MAIN, LIB)
+    assert main.definitions == [('RESULT', 0x15)]
+    index = build_symbol_index([main, lib], place_modules([main, lib], 0x1000))
+    assert index == {'MAIN': 0x1000, 'RESULT': 0x1015, 'LIB': 0x101D, 'ADDTWO': 0x101D, 'VALUE': 0x1032}
+
+
+def test_text_records_are_relocated(tmp_path):
+    program = link(modules(tmp_path, MAIN, LIB), 0x1000)
+    object_file = io.StringIO()
+    write_object_file(program, object_file)
+    assert object_file.getvalue().split('\n') == [
+        'HMAIN    001000000038',
+        # STL RETADR, LDA VALUE, JSUB ADDTWO, STA RESULT, LDL RETADR relocated or resolved
+        'T0010001514101800103248101D0C101500101B0810184C0000',
+        'T00101B024142',
+        # ADD TWO, STA RESULT, LDX ZERO and LDA TABLE,X keeping its index bit
+        'T00101D1B18102C0C101504102F0090354C0000000002000000000028000007',
+        'E001000']
+
+
+def test_unresolved_symbols_are_reported(tmp_path):
+    with pytest.raises(LinkError, match=r'ADDTWO \(referred to by MAIN\)'):
+        link(modules(tmp_path, MAIN), 0x1000)
+
+
+PLAIN = '''PLAIN    START  0
+FIRST    LDA    FIVE
+         RSUB
+FIVE     WORD   5
+         END    FIRST'''
+
+
+def test_plain_programs_are_not_moved(tmp_path):
+    plain, = modules(tmp_path, PLAIN)
+    assert not plain.relocatable
+    with pytest.raises(LinkError, match='PLAIN has no modification records'):
+        link([plain], 0x2000)
+    program = link([plain], 0)
+    assert program.segments == [(0, bytearray.fromhex('0000064C0000000005'))]
@@ -0,0 +1,75 @@
+import pytest
+
+import macros
+from macros import MacroProcessor
+
+RDBUFF = '''RDBUFF   MACRO  &INDEV,&BUFADR
+         LDX    ZERO
+$LOOP    TD     =X'&INDEV'
+         JEQ    $LOOP
+         STCH   &BUFADR,X
+         MEND'''
+
+
+def expand(source, processor=None):
+    return list((processor or MacroProcessor()).expand(source.split('\n')))
+
+
+def test_parameters_and_unique_labels_are_substituted():
+    assert expand(RDBUFF + '\n         RDBUFF F1,BUFFER\n         RDBUFF 05') == [
+        '         LDX    ZERO',
+        "$AALOOP    TD     =X'F1'",
+        '         JEQ    $AALOOP',
+        '         STCH   BUFFER,X',
+        '         LDX    ZERO',
+        "$ABLOOP    TD     =X'05'",
+        '         JEQ    $ABLOOP',
+        # Missing arguments are empty
+        '         STCH   ,X']
+
+
+def test_label_of_invocation_goes_on_first_statement():
+    assert expand(RDBUFF + '\nCLOOP    RDBUFF F1,BUFFER')[0] == 'CLOOP LDX ZERO'
+    with pytest.raises(SyntaxError, match='has a label'):
+        expand('LOOP     MACRO  &A\n$L       LDA    &A\n         MEND\nHERE     LOOP   X')
+
+
+def test_expansions_are_memoized():
+    processor = MacroProcessor()
+    lines = expand(RDBUFF + '\n         RDBUFF F1,BUFFER\n         RDBUFF F1,BUFFER', processor)
+    assert processor.stats()['macro_expansions'] == 2 and processor.stats()['macro_cache_hits'] == 1
+    # A hit still gets its own unique labels
+    assert lines[2] == '         JEQ    $AALOOP' and lines[6] == '         JEQ    $ABLOOP'
+
+
+def test_memoized_expansions_are_bounded(monkeypatch):
+    monkeypatch.setattr(macros, 'MAX_CACHED_EXPANSIONS', 2)
+    processor = MacroProcessor()
+    expand(RDBUFF + ''.join(f'\n         RDBUFF {argument}' for argument in ('A', 'B', 'C', 'C', 'A')), processor)
+    # The oldest expansion A was dropped when C came in, so only the second C hits
+    assert processor.cache_hits == 1
+    assert [arguments for _, arguments in processor.cache] == [('C',), ('A',)]
+
+
+def test_nested_definitions_and_invocations():
+    source = '''OUTER    MACRO  &NAME
+&NAME    MACRO  &X
+         LDA    &X
+         MEND
+         MEND
+WRAP     MACRO  &Y
+         INNER  &Y
+         MEND
+         WRAP   ALPHA
+         OUTER  INNER
+         WRAP   ALPHA'''
+    processor = MacroProcessor()
+    # INNER is not a macro until OUTER defines it, the memoized expansion of WRAP ALPHA
+    # was found plain before that and is scanned again afterwards
+    assert expand(source, processor) == ['         INNER  ALPHA', '         LDA    ALPHA']
+    assert processor.definitions == 3 and processor.cache_hits == 1
+
+
+def test_recursion_is_bounded():
+    with pytest.raises(SyntaxError, match='nested deeper'):
+        expand('SELF     MACRO  &A\n         SELF   &A\n         MEND\n         SELF   X')
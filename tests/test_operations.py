@@ -0,0 +1,29 @@
+import io
+import pytest
+import utils
+from assembler import Assembler
+from intermediate import Intermediate, Line
+
+
+def test_unknown_operations_do_not_grow_the_registry():
+    count = len(utils.operations)
+    for index in range(100):
+        assembler = Assembler(io.StringIO(f'PROG START 0\n LDAX{index} ZERO\nZERO WORD 0\n END\n'))
+        with pytest.raises(SyntaxError, match='Undefined operation'):
+            assembler.pass_one()
+    assert len(utils.operations) == count
+
+
+def located(text, location=0):
+    line_object = Line(text)
+    line_object.line_location = location
+    return line_object
+
+
+def test_intermediate_keeps_the_names_of_unknown_operations():
+    intermediate = Intermediate()
+    intermediate.extend([located('FIRST NOPE 3'), located(' LDA FIRST'), located(' ALSO X')])
+    assert [line.operation_name for line in intermediate] == ['NOPE', 'LDA', 'ALSO']
+    del intermediate[1:]
+    intermediate.append(located(' STA FIRST'))
+    assert [line.operation_name for line in intermediate] == ['NOPE', 'STA']
@@ -0,0 +1,35 @@
+import assembler
+from assembler import assemble_files
+
+HEADER = '''PROG     START  1000
+FIRST    LDA    BUFFER+SIZE
+         STA    BUFEND-3
+SIZE     EQU    12
+MAXLEN   EQU    BUFEND-BUFFER'''
+
+FOOTER = '''LENGTH   WORD   MAXLEN
+         LDA    =C'EOF'
+BUFFER   RESB   100
+BUFEND   EQU    *
+         END    FIRST'''
+
+
+def source(lines):
+    body = []
+    for i in range(lines):
+        body += [f'L{i}      LDCH   BUFFER+{i % 50},X', f'         WORD   {i}', f"         BYTE   C'{i}'"]
+        if i % 40 == 0:
+            body.append('         LTORG')
+    return '\n'.join([HEADER, *body, FOOTER])
+
+
+def outputs(tmp_path, name, workers):
+    paths = [str(tmp_path / f'{name}.{suffix}') for suffix in ('mdt', 'lst', 'obj')]
+    assemble_files(str(tmp_path / 'prog.asm'), *paths, workers=workers)
+    return [open(path, 'rb').read() for path in paths]
+
+
+def test_parallel_outputs_are_identical(tmp_path, monkeypatch):
+    (tmp_path / 'prog.asm').write_text(source(300))
+    monkeypatch.setattr(assembler, 'PARALLEL_THRESHOLD', 10)
+    assert outputs(tmp_path, 'serial', 1) == outputs(tmp_path, 'parallel', 2)
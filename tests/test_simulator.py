@@ -0,0 +1,33 @@
+import pytest
+
+from simulator import Device, Machine, SimulatorError
+
+
+class BrokenDevice(Device):
+    def read(self):
+        raise IndexError('device buffer')
+
+
+def test_memory_access_out_of_range():
+    machine = Machine(memory_size=0x100)
+    # LDA 0x7FF0
+    machine.load([(0, bytes.fromhex('007FF0'))], 0)
+    with pytest.raises(SimulatorError, match='out of range by the instruction at 0'):
+        machine.run()
+
+
+def test_errors_of_devices_are_not_memory_errors():
+    machine = Machine(memory_size=0x100)
+    machine.attach(0xF1, BrokenDevice())
+    # RD DEVICE, DEVICE BYTE X'F1'
+    machine.load([(0, bytes.fromhex('D80003F1'))], 0)
+    with pytest.raises(IndexError, match='device buffer'):
+        machine.run()
+
+
+def test_operation_codes_outside_the_table_are_illegal():
+    machine = Machine(memory_size=0x100)
+    # MUL is not in the operation code table
+    machine.load([(0, bytes.fromhex('200000'))], 0)
+    with pytest.raises(SimulatorError, match='Illegal instruction 20'):
+        machine.run()
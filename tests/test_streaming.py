@@ -0,0 +1,45 @@
+import pytest
+
+from assembler import assemble_files
+
+SOURCE = '''COPY     START  1000
+. Copies records, with macros, literals and forward EQU
+RDREC    MACRO  &DEV
+         LDX    ZERO
+$LOOP    TD     =X'&DEV'
+         JEQ    $LOOP
+         RD     =X'&DEV'
+         MEND
+FIRST    STL    RETADR
+CLOOP    RDREC  F1
+         LDA    LENGTH
+         COMP   =C'EOF'
+         JEQ    ENDFIL
+         STA    BUFFER+HALF,X
+         LTORG
+ENDFIL   LDA    =C'EOF'
+         J      *
+HALF     EQU    SIZE-6
+SIZE     EQU    BUFEND-BUFFER
+LENGTH   WORD   SIZE
+ZERO     WORD   0
+RETADR   RESW   1
+BUFFER   RESB   4096
+BUFEND   EQU    *
+         BYTE   X'F1'
+         RDREC  05
+         END    FIRST
+'''
+
+
+def outputs(tmp_path, name, streaming, max_record_length):
+    paths = [str(tmp_path / f'{name}.{suffix}') for suffix in ('mdt', 'lst', 'obj')]
+    assemble_files(str(tmp_path / 'copy.asm'), *paths, streaming=streaming, max_record_length=max_record_length)
+    return [open(path, 'rb').read() for path in paths]
+
+
+@pytest.mark.parametrize('max_record_length', [1, 7, 30])
+def test_streaming_outputs_are_identical(tmp_path, max_record_length):
+    (tmp_path / 'copy.asm').write_text(SOURCE)
+    assert (outputs(tmp_path, 'stream', True, max_record_length) ==
+            outputs(tmp_path, 'memory', False, max_record_length))
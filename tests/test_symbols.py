@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from assembler import Assembler
+from symbols import HEADER, MAGIC, SymbolTable
+
+SOURCE = '''COPY     START  1000
+FIRST    LDA    =C'EOF'
+         STA    BUFFER
+MAXLEN   EQU    4096
+BUFFER   RESB   3
+         END    FIRST'''
+
+
+def assembled():
+    assembler = Assembler(SOURCE.split('\n'))
+    assembler.pass_one()
+    return assembler.symbol_table
+
+
+def test_absolute_symbols_and_literals_are_not_addresses():
+    symbol_table = assembled()
+    assert symbol_table['MAXLEN'] == 4096 and "=C'EOF'" in symbol_table
+    assert symbol_table.describe(0x1000) == 'FIRST'
+    assert symbol_table.describe(0x1007) == 'BUFFER+1'
+    assert symbol_table.nearest_label(0x1FFF) == ('BUFFER', 0x1006)
+    assert [label for label, _ in symbol_table.in_range(0, 0x10000)] == ['FIRST', 'BUFFER']
+
+
+def test_saved_tables_keep_absolute_symbols():
+    symbols_file = io.BytesIO()
+    assembled().save(symbols_file)
+    symbols_file.seek(0)
+    symbol_table = SymbolTable.load(symbols_file)
+    assert symbol_table.absolute_symbols == {'MAXLEN'}
+    assert symbol_table.describe(0x1001) == 'FIRST+1'
+
+
+def test_other_versions_are_rejected():
+    with pytest.raises(ValueError, match='Not a version 2 symbol table file'):
+        SymbolTable.load(io.BytesIO(HEADER.pack(MAGIC, 1, 0)))
@@ -0,0 +1,65 @@
+import pytest
+
+from assembler import assemble_files
+from cache import AssemblyCache
+from xref import ABSOLUTE, ADDRESS, UNRESOLVED, CrossReferenceIndex
+
+SOURCE = '''PROG     START  1000
+         EXTREF OUTER
+FIRST    LDA    =C'EOF'
+         STA    BUFFER
+         LDX    OUTER
+MAXLEN   EQU    4096
+HERE     EQU    *
+TABLE    WORD   5
+         LDA    TABLE
+BUFFER   RESB   3
+         END    FIRST
+'''
+
+
+def write_index(tmp_path, name, streaming=False, cache=None):
+    (tmp_path / 'prog.asm').write_text(SOURCE)
+    paths = [str(tmp_path / f'{name}.{suffix}') for suffix in ('mdt', 'lst', 'obj', 'xref')]
+    assemble_files(str(tmp_path / 'prog.asm'), *paths[:3], streaming=streaming, cache=cache, xref_path=paths[3])
+    return paths[3]
+
+
+@pytest.fixture
+def index(tmp_path):
+    with CrossReferenceIndex(write_index(tmp_path, 'prog')) as index:
+        yield index
+
+
+def test_symbols(index):
+    assert index.symbol('TABLE') == ('TABLE', 0x1009, ADDRESS, 8, [9])
+    assert index.symbol('MAXLEN') == ('MAXLEN', 4096, ABSOLUTE, 6, [])
+    assert index.symbol("=C'EOF'") == ("=C'EOF'", 0x1012, ADDRESS, 12, [3])
+    assert index.symbol('NOWHERE') is None
+    assert index.line(9) == (9, 0x100C, '\tLDA\tTABLE', bytes.fromhex('001009'))
+
+
+def test_address_ranges(index):
+    assert [line[0] for line in index.lines_in_range(0x1003, 0x1009)] == [4, 5]
+    # The line holding a byte in the middle of its object code covers it, and the lines
+    # without object code at its address come first
+    assert [line[0] for line in index.lines_in_range(0x100A, 0x100B)] == [6, 7, 8]
+    assert index.lines_in_range(0x2000, 0x2010) == []
+
+
+def test_unresolved_symbols(index):
+    assert index.unresolved_symbols() == [('OUTER', 0, UNRESOLVED, 0, [5])]
+
+
+def test_streaming_index_is_identical(tmp_path):
+    in_memory = write_index(tmp_path, 'memory')
+    streamed = write_index(tmp_path, 'stream', streaming=True)
+    assert open(in_memory, 'rb').read() == open(streamed, 'rb').read()
+
+
+def test_index_is_cached(tmp_path):
+    assembly_cache = AssemblyCache(str(tmp_path / 'cache'))
+    missed = write_index(tmp_path, 'miss', cache=assembly_cache)
+    hit = write_index(tmp_path, 'hit', cache=assembly_cache)
+    assert (assembly_cache.misses, assembly_cache.hits) == (1, 1)
+    assert open(hit, 'rb').read() == open(missed, 'rb').read()
@@ -0,0 +1,84 @@
+import re
+
+# Kinds of source lines
+BLANK, COMMENT, STATEMENT = range(3)
+
+# A field is a run of non blank characters that does not start a comment. The
+# lookahead keeps backtracking from cutting a field in two.
+_FIELD = r'[^\s.]\S*(?!\S)'
+
+# Up to four fields followed by an optional comment, the fourth field only appears
+# in operands written with a space after the comma like `BUFFER, X`.
+_LINE = re.compile(
+    rf'\s*(?:(?P<first>{_FIELD})(?:\s+(?P<second>{_FIELD})(?:\s+(?P<third>{_FIELD})(?:\s+(?P<fourth>{_FIELD}))?)?)?)?'
+    r'\s*(?P<comment>(?<!\S)\..*)?')
+
+
+def tokenize(line):
+    """
+    Classify a source line and break it into label, operation name, operand and comment in a single scan.
+
+    Accepts the same fixed and free format layouts as the whitespace separated fields
+    did: `label operation operand`, `operation operand` or `operation`, with an
+    optional space after the comma of indexed operands and a comment starting with `.`.
+
+    Parameters
+    ----------
+    line : str
+        A line of the source code.
+
+    Returns
+    ----------
+    kind : int
+        BLANK, COMMENT or STATEMENT.
+
+    label : str
+        Label of the statement, None if there is no label.
+
+    operation_name : str
+        Operation name of the statement, None for blank and comment lines.
+
+    operand : str
+        Operand of the statement, None if there is no operand.
+
+    comment : str
+        The comment including its leading `.`, None if there is no comment.
+    """
+    if '.' not in line:
+        # Fast path for the common lines without comments or indexed operands
+        fields = line.split()
+        if not fields:
+            return BLANK, None, None, None, None
+        if ',' not in line:
+            if len(fields) == 3:
+                return STATEMENT, fields[0], fields[1], fields[2], None
+            if len(fields) == 2:
+                return STATEMENT, None, fields[0], fields[1], None
+            if len(fields) == 1:
+                return STATEMENT, None, fields[0], None, None
+
+    match = _LINE.fullmatch(line)
+    if match is None:
+        raise SyntaxError(f'Fixed format only {line.split()}')
+    first, second, third, fourth, comment = match.groups()
+    if first is None:
+        return (BLANK if comment is None else COMMENT), None, None, None, comment
+
+    # remove spaces in between operands
+    if second is not None and second.endswith(','):  # if there is no label
+        if third is None:
+            raise SyntaxError(f'Missing index register after {second}')
+        if fourth is None:
+            return STATEMENT, None, first, second + third, comment
+        return STATEMENT, first, fourth, second + third, comment
+    if third is not None and third.endswith(','):  # if there is a label
+        if fourth is None:
+            raise SyntaxError(f'Missing index register after {third}')
+        return STATEMENT, first, second, third + fourth, comment
+
+    if fourth is not None:
+        raise SyntaxError(f'Fixed format only {[first, second, third, fourth]}')
+    if third is not None:
+        return STATEMENT, first, second, third, comment  # label, operation_name, operand
+    # No label, operation_name, operand or no operand
+    return STATEMENT, None, first, second, comment
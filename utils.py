@@ -1,3 +1,6 @@
+from math import ceil
+
+
 class Instruction:
     """ 
     Represents a single instruction. 
@@ -10,62 +13,498 @@ class Instruction:
 
 
 # Operation code table, Appendex A in the book
-opcode_table = {'ADD':     Instruction('18', 3, ['m']),
-                'ADDF':    Instruction('58', 3, ['m']),
-                'ADDR':    Instruction('90', 2, ['r1', 'r2']),
-                'AND':     Instruction('40', 3, ['m']),
-                'CLEAR':   Instruction('B4', 2, ['r1']),
-                'COMP':    Instruction('28', 3, ['m']),
-                'COMPF':   Instruction('88', 3, ['m']),
-                'COMPR':   Instruction('A0', 2, ['r1', 'r2']),
-                'DIV':     Instruction('24', 3, ['m']),
-                'DIVF':    Instruction('64', 3, ['m']),
-                'DIVR':    Instruction('9C', 2, ['r1', 'r2']),
-                'FIX':     Instruction('C4', 1, None),
-                'FLOAT':   Instruction('C0', 1, None),
-                'HIO':     Instruction('F4', 1, None),
-                'J':       Instruction('3C', 3, ['m']),
-                'JEQ':     Instruction('30', 3, ['m']),
-                'JGT':     Instruction('34', 3, ['m']),
-                'JLT':     Instruction('38', 3, ['m']),
-                'JSUB':    Instruction('48', 3, ['m']),
-                'LDA':     Instruction('00', 3, ['m']),
-                'LDB':     Instruction('68', 3, ['m']),
-                'LDCH':    Instruction('50', 3, ['m']),
-                'LDF':     Instruction('70', 3, ['m']),
-                'LDL':     Instruction('08', 3, ['m']),
-                'LDS':     Instruction('6C', 3, ['m']),
-                'LDT':     Instruction('74', 3, ['m']),
-                'LDX':     Instruction('04', 3, ['m']),
-                'LPS':     Instruction('D0', 3, ['m']),
-                'MULF':    Instruction('60', 3, ['m']),
-                'MULR':    Instruction('98', 2, ['r1', 'r2']),
-                'NORM':    Instruction('C8', 1, None),
-                'OR':      Instruction('44', 3, ['m']),
-                'RD':      Instruction('D8', 3, ['m']),
-                'RMO':     Instruction('AC', 2, ['r1', 'r2']),
-                'RSUB':    Instruction('4C', 3, None),
-                'SHIFTL':  Instruction('A4', 2, ['r1', 'n']),
-                'SHIFTR':  Instruction('A8', 2, ['r1', 'n']),
-                'SIO':     Instruction('F0', 1, None),
-                'SSK':     Instruction('EC', 3, ['m']),
-                'STA':     Instruction('0C', 3, ['m']),
-                'STB':     Instruction('78', 3, ['m']),
-                'STCH':    Instruction('54', 3, ['m']),
-                'STF':     Instruction('80', 3, ['m']),
-                'STI':     Instruction('D4', 3, ['m']),
-                'STL':     Instruction('14', 3, ['m']),
-                'STS':     Instruction('7C', 3, ['m']),
-                'STSW':    Instruction('E8', 3, ['m']),
-                'STT':     Instruction('84', 3, ['m']),
-                'STX':     Instruction('10', 3, ['m']),
-                'SUB':     Instruction('1C', 3, ['m']),
-                'SUBF':    Instruction('5C', 3, ['m']),
-                'SUBR':    Instruction('94', 2, ['r1', 'r2']),
-                'SVC':     Instruction('B0', 2, ['n']),
-                'TD':      Instruction('E0', 3, ['m']),
-                'TIO':     Instruction('F8', 1, None),
-                'TIX':     Instruction('2C', 3, ['m']),
-                'TIXR':    Instruction('B8', 2, ['r1']),
-                'WD':      Instruction('DC', 3, ['m'])
+opcode_table = {'ADD':     Instruction(0x18, 3, ['m']),
+                'ADDF':    Instruction(0x58, 3, ['m']),
+                'ADDR':    Instruction(0x90, 2, ['r1', 'r2']),
+                'AND':     Instruction(0x40, 3, ['m']),
+                'CLEAR':   Instruction(0xB4, 2, ['r1']),
+                'COMP':    Instruction(0x28, 3, ['m']),
+                'COMPF':   Instruction(0x88, 3, ['m']),
+                'COMPR':   Instruction(0xA0, 2, ['r1', 'r2']),
+                'DIV':     Instruction(0x24, 3, ['m']),
+                'DIVF':    Instruction(0x64, 3, ['m']),
+                'DIVR':    Instruction(0x9C, 2, ['r1', 'r2']),
+                'FIX':     Instruction(0xC4, 1, None),
+                'FLOAT':   Instruction(0xC0, 1, None),
+                'HIO':     Instruction(0xF4, 1, None),
+                'J':       Instruction(0x3C, 3, ['m']),
+                'JEQ':     Instruction(0x30, 3, ['m']),
+                'JGT':     Instruction(0x34, 3, ['m']),
+                'JLT':     Instruction(0x38, 3, ['m']),
+                'JSUB':    Instruction(0x48, 3, ['m']),
+                'LDA':     Instruction(0x00, 3, ['m']),
+                'LDB':     Instruction(0x68, 3, ['m']),
+                'LDCH':    Instruction(0x50, 3, ['m']),
+                'LDF':     Instruction(0x70, 3, ['m']),
+                'LDL':     Instruction(0x08, 3, ['m']),
+                'LDS':     Instruction(0x6C, 3, ['m']),
+                'LDT':     Instruction(0x74, 3, ['m']),
+                'LDX':     Instruction(0x04, 3, ['m']),
+                'LPS':     Instruction(0xD0, 3, ['m']),
+                'MULF':    Instruction(0x60, 3, ['m']),
+                'MULR':    Instruction(0x98, 2, ['r1', 'r2']),
+                'NORM':    Instruction(0xC8, 1, None),
+                'OR':      Instruction(0x44, 3, ['m']),
+                'RD':      Instruction(0xD8, 3, ['m']),
+                'RMO':     Instruction(0xAC, 2, ['r1', 'r2']),
+                'RSUB':    Instruction(0x4C, 3, None),
+                'SHIFTL':  Instruction(0xA4, 2, ['r1', 'n']),
+                'SHIFTR':  Instruction(0xA8, 2, ['r1', 'n']),
+                'SIO':     Instruction(0xF0, 1, None),
+                'SSK':     Instruction(0xEC, 3, ['m']),
+                'STA':     Instruction(0x0C, 3, ['m']),
+                'STB':     Instruction(0x78, 3, ['m']),
+                'STCH':    Instruction(0x54, 3, ['m']),
+                'STF':     Instruction(0x80, 3, ['m']),
+                'STI':     Instruction(0xD4, 3, ['m']),
+                'STL':     Instruction(0x14, 3, ['m']),
+                'STS':     Instruction(0x7C, 3, ['m']),
+                'STSW':    Instruction(0xE8, 3, ['m']),
+                'STT':     Instruction(0x84, 3, ['m']),
+                'STX':     Instruction(0x10, 3, ['m']),
+                'SUB':     Instruction(0x1C, 3, ['m']),
+                'SUBF':    Instruction(0x5C, 3, ['m']),
+                'SUBR':    Instruction(0x94, 2, ['r1', 'r2']),
+                'SVC':     Instruction(0xB0, 2, ['n']),
+                'TD':      Instruction(0xE0, 3, ['m']),
+                'TIO':     Instruction(0xF8, 1, None),
+                'TIX':     Instruction(0x2C, 3, ['m']),
+                'TIXR':    Instruction(0xB8, 2, ['r1']),
+                'WD':      Instruction(0xDC, 3, ['m'])
                 }
+
+# Returned by the encoding handlers for lines that have no object code
+NO_OBJECT = -1
+
+
+class Operation:
+    """
+    An instruction or a directive with the handlers of both passes.
+
+    Parameters
+    ----------
+    name : str
+        Mnemonic of the instruction or name of the directive.
+
+    id : int
+        Index of the operation in `operations`, stored in the intermediate file.
+
+    instruction : Instruction
+        The operation code and format of an instruction, None for directives.
+
+    size : callable
+        `size(assembler, operation, operand, line_number)` called by pass1 after the label
+        of the line is defined, returns the number of bytes the line takes.
+
+    encode : callable
+        `encode(assembler, operation, operand, line_location, buffer, offset)` called by
+        pass2, writes the object code into the buffer and returns its size, 0 for lines
+        that do not break a text record and NO_OBJECT for lines without object code.
+    """
+
+    __slots__ = ('name', 'id', 'instruction', 'opcode', 'format', 'size', 'encode')
+
+    def __init__(self, name, id, instruction=None, size=None, encode=None):
+        super().__init__()
+        self.name = name
+        self.id = id
+        self.set_handlers(instruction, size, encode)
+
+    def set_handlers(self, instruction, size, encode):
+        """
+        Set the instruction and the handlers, None picks the default handlers.
+        """
+        self.instruction = instruction
+        # Copied out of the instruction to save an attribute lookup on every line
+        self.opcode = None if instruction is None else instruction.opcode
+        self.format = 0 if instruction is None else instruction.format
+        if instruction is not None:
+            self.size = size or size_instruction
+            self.encode = encode or encode_instruction
+        else:
+            self.size = size or size_nothing
+            self.encode = encode or encode_nothing
+
+
+def hex_to_bytes(digits):
+    """
+    Convert hexadecimal digits to bytes, an odd number of digits is padded with a leading zero.
+
+    Parameters
+    ----------
+    digits : str
+        Hexadecimal digits.
+
+    Returns
+    ----------
+    bytes :
+        The value of the digits.
+    """
+    return bytes.fromhex(digits.zfill(len(digits) + len(digits) % 2))
+
+
+def size_nothing(assembler, operation, operand, line_number):
+    """
+    Sizing handler of the lines that take no memory.
+    """
+    return 0
+
+
+def encode_nothing(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of the lines without object code (START, RESB, RESW, EQU).
+    """
+    return NO_OBJECT
+
+
+def encode_empty(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of the lines that have no object code but do not break a text record (LTORG, END).
+    """
+    return 0
+
+
+def size_instruction(assembler, operation, operand, line_number):
+    """
+    Sizing handler of the instructions, a literal operand is added to the next literal pool.
+    """
+    if operand is not None and operand.startswith('='):
+        operand = operand.replace("=", '')
+        if operand.startswith('X'):
+            # X means that we have literals whith half byte for each charachter
+            literal_size = ceil((len(operand)-3)/2)
+        elif operand.startswith('C'):
+            literal_size = len(operand) - 3
+            # C means that we have letters which need one byte each to be stored
+        else:
+            raise SyntaxError(
+                f'Byte operand should only start with either X or C not {operand[0]} on line {line_number}')
+        assembler.literals_list.append(('=' + operand, literal_size))
+    return operation.format
+
+
+def encode_instruction(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of the instructions: operation code, index bit and 15 bits address.
+    """
+    if ',' in operand:
+        base_operand, _ = operand.split(',')
+        indexed = 0x8000
+    else:
+        base_operand = operand
+        indexed = 0
+    address = assembler.symbol_table.get(base_operand)
+    if address is None:
+        if base_operand in assembler.external_references:
+            # Filled in by the linker from the M record of the line
+            address = 0
+        else:
+            address = assembler.operand_value(base_operand, line_location)
+            if address is None:
+                raise SyntaxError(
+                    f'Operand {base_operand} not found at {assembler.symbol_table.describe(line_location)}')
+    if not 0 <= address <= 0x7FFF:
+        raise SyntaxError(
+            f'Address of {base_operand} does not fit in 15 bits at {assembler.symbol_table.describe(line_location)}')
+    return assembler.write_word(operation.opcode << 16 | indexed | address, buffer, offset)
+
+
+def encode_no_operand(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of the instructions without operand (RSUB).
+    """
+    return assembler.write_word(operation.opcode << 16, buffer, offset)
+
+
+def encode_literal(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of the literals of a pool, the operand is the literal itself.
+    """
+    if operand[1] == 'X':
+        return assembler.write_bytes(hex_to_bytes(operand[3:-1]), buffer, offset)
+    elif operand[1] == 'C':
+        return assembler.write_bytes(operand[3:-1].encode('latin-1'), buffer, offset)
+    return NO_OBJECT
+
+
+def size_byte(assembler, operation, operand, line_number):
+    """
+    Sizing handler of BYTE, a byte per character of C and per two digits of X.
+    """
+    if operand.startswith('X'):
+        operand = operand.replace("X", '')
+        operand = operand.replace("'", '')
+        # hex numbers needs half byte for each digit to be stored
+        return ceil(len(operand) / 2)
+    elif operand.startswith('C'):
+        operand = operand.replace("C", '')
+        operand = operand.replace("'", '')
+        # C means that we have letters which need one byte each to be stored
+        return len(operand)
+    raise SyntaxError(
+        f'Byte operand should only start with either X or C not {operand[0]} on line {line_number}')
+
+
+def encode_byte(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of BYTE, the characters or hex digits of its operand.
+    """
+    if operand.startswith('X'):
+        return assembler.write_bytes(hex_to_bytes(operand.replace("X", '').replace("'", '')), buffer, offset)
+    elif operand.startswith('C'):
+        return assembler.write_bytes(operand.replace("C", '').replace("'", '').encode('latin-1'), buffer, offset)
+    return NO_OBJECT
+
+
+def size_word(assembler, operation, operand, line_number):
+    """
+    Sizing handler of WORD, always 3 bytes.
+    """
+    return 3
+
+
+def encode_word(assembler, operation, operand, line_location, buffer, offset):
+    """
+    Encoding handler of WORD, a number or the value of an expression in 24 bits.
+    """
+    try:
+        value = int(operand)
+    except ValueError:
+        value = assembler.operand_value(operand, line_location)
+        if value is None:
+            raise SyntaxError(
+                f'Word {operand} refers to an undefined symbol at {assembler.symbol_table.describe(line_location)}')
+    if not -0x800000 <= value <= 0xFFFFFF:
+        raise SyntaxError(
+            f'Word {operand} does not fit in 24 bits at {line_location}')
+    return assembler.write_word(value & 0xFFFFFF, buffer, offset)
+
+
+def size_resb(assembler, operation, operand, line_number):
+    """
+    Sizing handler of RESB, the number of bytes reserved.
+    """
+    return int(operand)
+
+
+def size_resw(assembler, operation, operand, line_number):
+    """
+    Sizing handler of RESW, 3 bytes per word reserved.
+    """
+    return 3 * int(operand)
+
+
+def size_ltorg(assembler, operation, operand, line_number):
+    """
+    Sizing handler of LTORG, the pooled literals are placed after it by `pool_literals`.
+    """
+    assembler.pool_literals()
+    return 0
+
+
+def external_symbols(operand, line_number):
+    """
+    Split the operand of EXTDEF or EXTREF into its symbols.
+
+    Parameters
+    ----------
+    operand : str
+        Comma separated symbols.
+
+    line_number : int
+        The number of the line, used in error messages.
+
+    Returns
+    ----------
+    list :
+        The symbols, which fit the 6 characters fields of the D and R records.
+    """
+    symbols = operand.split(',') if operand else []
+    for symbol in symbols:
+        if not 0 < len(symbol) <= 6:
+            raise SyntaxError(
+                f'External symbols should have 1 to 6 characters not {symbol!r} on line {line_number}')
+    return symbols
+
+
+def size_equ(assembler, operation, operand, line_number):
+    """
+    Sizing handler of EQU, its label gets the value of the expression of the operand.
+    """
+    assembler.define_equate(assembler.line_label, operand, line_number)
+    return 0
+
+
+def size_extdef(assembler, operation, operand, line_number):
+    """
+    Sizing handler of EXTDEF, the symbols are exported in the D records of the module.
+    """
+    assembler.external_definitions.extend(external_symbols(operand, line_number))
+    return 0
+
+
+def size_extref(assembler, operation, operand, line_number):
+    """
+    Sizing handler of EXTREF, the symbols are defined by other modules and resolved by the linker.
+    """
+    for symbol in external_symbols(operand, line_number):
+        assembler.external_references[symbol] = None
+    return 0
+
+
+def size_end(assembler, operation, operand, line_number):
+    """
+    Sizing handler of END, pass one stops after it.
+    """
+    assembler.ended = True
+    return 0
+
+
+# Every operation indexed by its id
+operations = []
+# The operations pass1 accepts, by name
+operation_table = {}
+# Operations with an id that pass1 does not accept by name (START), by name
+unknown_operations = {}
+
+
+def add_operation(name, instruction=None, size=None, encode=None):
+    """
+    Give an id to an operation without registering its name, see `register_operation`.
+
+    Returns
+    ----------
+    Operation :
+        The new operation.
+    """
+    operation = Operation(name, len(operations), instruction, size, encode)
+    operations.append(operation)
+    return operation
+
+
+def register_operation(name, instruction=None, size=None, encode=None):
+    """
+    Register an operation accepted by pass1, or replace the handlers of a registered one.
+
+    Parameters
+    ----------
+    name : str
+        Mnemonic of the instruction or name of the directive.
+
+    instruction : Instruction
+        The operation code and format of an instruction, None for directives.
+
+    size : callable
+        Sizing handler, see `Operation`. Instructions default to their format and
+        directives to 0 bytes.
+
+    encode : callable
+        Encoding handler, see `Operation`. Instructions default to a word addressing
+        the operand and directives to no object code.
+
+    Returns
+    ----------
+    Operation :
+        The registered operation, with the same id if the name already had one.
+    """
+    operation = operation_table.get(name) or unknown_operations.pop(name, None)
+    if operation is None:
+        operation = add_operation(name)
+    operation.set_handlers(instruction, size, encode)
+    operation_table[name] = operation
+    return operation
+
+
+def register_instruction(name, opcode, format=3, operands=('m',), size=None, encode=None):
+    """
+    Register an instruction, adding it to `opcode_table`.
+
+    Parameters
+    ----------
+    name : str
+        Mnemonic of the instruction.
+
+    opcode : int
+        Operation code of the instruction.
+
+    format : int
+        Number of bytes of the instruction.
+
+    operands : list
+        Kinds of the operands as in `opcode_table`, None for no operand.
+
+    size, encode : callable
+        Handlers replacing the default ones, see `register_operation`.
+
+    Returns
+    ----------
+    Operation :
+        The registered operation.
+    """
+    opcode_table[name] = Instruction(
+        opcode, format, None if operands is None else list(operands))
+    return register_operation(name, opcode_table[name], size, encode)
+
+
+def register_directive(name, size=None, encode=None):
+    """
+    Register a directive, see `register_operation`.
+    """
+    return register_operation(name, None, size, encode)
+
+
+def operation_id(operation_name):
+    """
+    Find the id of an operation name.
+
+    Parameters
+    ----------
+    operation_name : str
+        Mnemonic of an instruction or a directive.
+
+    Returns
+    ----------
+    int :
+        The id of the operation, the id of UNDEFINED_OPERATION for every unknown name
+        so that misspelled names do not grow `operations`.
+    """
+    operation = operation_table.get(operation_name)
+    if operation is None:
+        operation = unknown_operations.get(operation_name, UNDEFINED_OPERATION)
+    return operation.id
+
+
+def table_signature():
+    """
+    Describe the registered operations, two processes with the same signature encode the same way.
+
+    Returns
+    ----------
+    list :
+        Tuples of (name, id, opcode, format, sizing handler, encoding handler) sorted by name.
+    """
+    return sorted((operation.name, operation.id, operation.opcode, operation.format,
+                   f'{operation.size.__module__}.{operation.size.__qualname__}',
+                   f'{operation.encode.__module__}.{operation.encode.__qualname__}')
+                  for operation in operation_table.values())
+
+
+for _name, _instruction in opcode_table.items():
+    register_operation(_name, _instruction,
+                       encode=encode_no_operand if _instruction.operands is None and _instruction.format == 3 else None)
+# Ids follow the order of the operation code table then of the directives.
+# START is only accepted on the first line, it gets an id without being registered.
+unknown_operations['START'] = add_operation('START')
+register_directive('END', size_end, encode_empty)
+register_directive('BYTE', size_byte, encode_byte)
+register_directive('WORD', size_word, encode_word)
+register_directive('RESB', size_resb)
+register_directive('RESW', size_resw)
+register_directive('LTORG', size_ltorg, encode_empty)
+register_directive('EQU', size_equ)
+register_directive('EXTDEF', size_extdef)
+register_directive('EXTREF', size_extref)
+# Lines of the literal pools, the operand is the literal itself
+LITERAL_OPERATION = add_operation(None, encode=encode_literal)
+# Shared by the names that are not operations, pass1 rejects them after they reach the intermediate
+UNDEFINED_OPERATION = add_operation(None)
@@ -0,0 +1,98 @@
+import queue
+import threading
+
+# Size of the chunks handed to the writer thread, in characters
+CHUNK_SIZE = 1 << 16
+# Number of chunks waiting for the writer thread before `write` blocks
+QUEUE_CHUNKS = 64
+
+
+class BackgroundWriter:
+    """
+    File wrapper whose writes are done by a background thread, so producing the
+    content and writing it to disk overlap.
+
+    Small writes are gathered into chunks before being queued. The queue is bounded,
+    so a slow disk holds the producer back instead of letting memory grow. An error
+    of the writer thread is raised by the next `write` or by `close`.
+
+    Parameters
+    ----------
+    output_file : file
+        The opened file to write to, it is not closed by `close`.
+    """
+
+    def __init__(self, output_file):
+        super().__init__()
+        self.output_file = output_file
+        self.chunks = queue.Queue(QUEUE_CHUNKS)
+        self.pending = []
+        self.pending_size = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.chunks.get()
+            try:
+                if chunk is None:
+                    return
+                if self.error is None:
+                    self.output_file.write(chunk)
+            except BaseException as error:
+                self.error = error
+            finally:
+                self.chunks.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def write(self, data):
+        """
+        Queue data to be written.
+        """
+        self._raise_error()
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= CHUNK_SIZE:
+            self._queue_pending()
+
+    def writelines(self, lines):
+        for data in lines:
+            self.write(data)
+
+    def _queue_pending(self):
+        if self.pending:
+            self.chunks.put(''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def flush(self):
+        """
+        Wait until everything written so far is written to the file.
+        """
+        self._queue_pending()
+        self.chunks.join()
+        self._raise_error()
+        self.output_file.flush()
+
+    def close(self):
+        """
+        Write the remaining data and stop the writer thread.
+        """
+        if self.thread is None:
+            return
+        self._queue_pending()
+        self.chunks.put(None)
+        self.thread.join()
+        self.thread = None
+        self._raise_error()
+        self.output_file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
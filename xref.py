@@ -0,0 +1,341 @@
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from collections import defaultdict
+
+# Layout of a cross-reference index: the header, then columns of fixed size integers
+# found from the counts alone, then the pools of the symbol names, of the line texts
+# and of the object code. Every integer is little endian, the 8 bytes column comes
+# first so that every column is aligned.
+MAGIC = b'SICX'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIIIxx')
+# Kinds of symbols
+ADDRESS = 0
+ABSOLUTE = 1
+UNRESOLVED = 2
+KIND_NAMES = {ADDRESS: 'address', ABSOLUTE: 'absolute', UNRESOLVED: 'unresolved'}
+
+
+class CrossReferenceBuilder:
+    """
+    Collects the definitions and references of the symbols and the object code of
+    each line while the assembler encodes them, then writes the index.
+
+    Lines are numbered from 1 in the order of the intermediate and listing files.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Line defining each symbol
+        self.definitions = {}
+        # Lines referring to each symbol, in ascending order
+        self.references = defaultdict(list)
+        self.addresses = array('I')
+        # The label, operation and operand of each line separated by tabs
+        self.texts = []
+        # Offsets of the object code of each line in the pool, with the end of the pool last
+        self.object_offsets = array('I', [0])
+        self.objects = bytearray()
+
+    def add_line(self, address, label, text, symbols, object_code):
+        """
+        Add the next line.
+
+        Parameters
+        ----------
+        address : int
+            Address of the line.
+
+        label : str
+            The symbol the line defines, None if there is none.
+
+        text : str
+            The label, operation and operand of the line separated by tabs.
+
+        symbols : iterable
+            The symbols the operand refers to.
+
+        object_code : bytes-like
+            The object code of the line, empty if there is none.
+
+        Returns
+        ----------
+        None
+        """
+        line_number = len(self.addresses) + 1
+        self.addresses.append(address)
+        if label is not None and label not in self.definitions:
+            self.definitions[label] = line_number
+        for symbol in symbols:
+            references = self.references[symbol]
+            if not references or references[-1] != line_number:
+                references.append(line_number)
+        self.texts.append(text)
+        self.objects += object_code
+        self.object_offsets.append(len(self.objects))
+
+    def write(self, index_file, symbol_table, absolute_symbols=()):
+        """
+        Write the index.
+
+        Parameters
+        ----------
+        index_file : file
+            File opened for binary writing.
+
+        symbol_table : dict
+            The final address or value of each symbol.
+
+        absolute_symbols : set
+            The symbols with an absolute value.
+
+        Returns
+        ----------
+        None
+        """
+        names = sorted({*symbol_table, *self.references}, key=lambda name: name.encode('utf-8'))
+        values, kinds, definitions = array('q'), array('B'), array('i')
+        reference_offsets, references, unresolved = array('I', [0]), array('I'), array('I')
+        name_offsets, name_pool = array('I', [0]), bytearray()
+        for position, name in enumerate(names):
+            value = symbol_table.get(name)
+            if value is None:
+                unresolved.append(position)
+            values.append(0 if value is None else value)
+            kinds.append(UNRESOLVED if value is None else ABSOLUTE if name in absolute_symbols else ADDRESS)
+            definitions.append(self.definitions.get(name, 0))
+            references.extend(self.references.get(name, ()))
+            reference_offsets.append(len(references))
+            name_pool += name.encode('utf-8')
+            name_offsets.append(len(name_pool))
+        texts = [text.encode('utf-8') for text in self.texts]
+        text_offsets = array('I', [0])
+        text_offsets.extend(accumulate(map(len, texts)))
+        index_file.write(HEADER.pack(MAGIC, VERSION, len(names), len(self.addresses), len(references), len(unresolved)))
+        for column in (values, self.addresses, definitions, reference_offsets, name_offsets, references,
+                       unresolved, text_offsets, self.object_offsets, kinds):
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            index_file.write(column.tobytes())
+        index_file.write(name_pool)
+        index_file.write(b''.join(texts))
+        index_file.write(self.objects)
+
+
+class _Pool:
+    """
+    The strings of a pool as a sequence, read from the mapped file on demand.
+    """
+
+    def __init__(self, data, start, offsets):
+        self.data = data
+        self.start = start
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return bytes(self.data[self.start + self.offsets[position]:self.start + self.offsets[position + 1]])
+
+
+class CrossReferenceIndex:
+    """
+    A cross-reference index written by `CrossReferenceBuilder`, mapped in memory.
+
+    Symbols are sorted by name and lines by address, so lookups bisect the columns
+    and only read the pages of the file they touch.
+
+    Parameters
+    ----------
+    index_path : str
+        Path of the index file.
+    """
+
+    def __init__(self, index_path):
+        super().__init__()
+        with open(index_path, 'rb') as index_file:
+            self.data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, symbols, lines, references, unresolved = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a version {VERSION} cross-reference index')
+        self.position = HEADER.size
+        self.values = self._column('q', symbols)
+        self.addresses = self._column('I', lines)
+        self.definitions = self._column('i', symbols)
+        self.reference_offsets = self._column('I', symbols + 1)
+        name_offsets = self._column('I', symbols + 1)
+        self.references = self._column('I', references)
+        self.unresolved = self._column('I', unresolved)
+        text_offsets = self._column('I', lines + 1)
+        object_offsets = self._column('I', lines + 1)
+        self.kinds = self._column('B', symbols)
+        self.names = _Pool(self.data, self.position, name_offsets)
+        self.texts = _Pool(self.data, self.position + name_offsets[-1], text_offsets)
+        self.objects = _Pool(self.data, self.texts.start + text_offsets[-1], object_offsets)
+        if self.objects.start + object_offsets[-1] > len(self.data):
+            raise ValueError('Cross-reference index file is truncated')
+
+    def _column(self, typecode, count):
+        size = array(typecode).itemsize * count
+        start, self.position = self.position, self.position + size
+        if self.position > len(self.data):
+            raise ValueError('Cross-reference index file is truncated')
+        if sys.byteorder == 'little':
+            return memoryview(self.data)[start:start + size].cast(typecode)
+        column = array(typecode, self.data[start:start + size])
+        column.byteswap()
+        return column
+
+    def close(self):
+        for name in ('values', 'addresses', 'definitions', 'reference_offsets', 'references',
+                     'unresolved', 'kinds'):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+        self.names.offsets = self.texts.offsets = self.objects.offsets = None
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _symbol_at(self, position):
+        first, last = self.reference_offsets[position], self.reference_offsets[position + 1]
+        return (self.names[position].decode('utf-8'), self.values[position], self.kinds[position],
+                self.definitions[position], list(self.references[first:last]))
+
+    def symbol(self, name):
+        """
+        Look a symbol up.
+
+        Parameters
+        ----------
+        name : str
+            The symbol, or a literal like `=C'EOF'`.
+
+        Returns
+        ----------
+        tuple :
+            The name, the value, the kind, the line defining it (0 if none) and the lines
+            referring to it, None if the program has no such symbol.
+        """
+        key = name.encode('utf-8')
+        position = bisect_left(self.names, key)
+        if position == len(self.names) or self.names[position] != key:
+            return None
+        return self._symbol_at(position)
+
+    def line(self, line_number):
+        """
+        A line of the program.
+
+        Parameters
+        ----------
+        line_number : int
+            Number of the line, from 1.
+
+        Returns
+        ----------
+        tuple :
+            The line number, its address, its text and its object code.
+        """
+        position = line_number - 1
+        return line_number, self.addresses[position], self.texts[position].decode('utf-8'), self.objects[position]
+
+    def lines_in_range(self, start, end):
+        """
+        The lines whose object code lies in the addresses [start, end), with the line
+        whose object code starts before `start` and covers it.
+
+        Returns
+        ----------
+        list :
+            The lines in address order, see `line`.
+        """
+        first = bisect_left(self.addresses, start)
+        last = bisect_left(self.addresses, end, first)
+        if first > 0 and self.addresses[first - 1] + len(self.objects[first - 1]) > start:
+            # Lines without object code at the same address precede the one holding it
+            first = bisect_left(self.addresses, self.addresses[first - 1], 0, first)
+        return [self.line(position + 1) for position in range(first, last)]
+
+    def unresolved_symbols(self):
+        """
+        The symbols the program refers to without defining them, the external
+        symbols of a module that the linker resolves.
+
+        Returns
+        ----------
+        list :
+            The symbols, see `symbol`.
+        """
+        return [self._symbol_at(position) for position in self.unresolved]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def format_index_line(line):
+    """
+    Format a line of the index as in the listing file, after its line number.
+    """
+    line_number, address, text, object_code = line
+    return f'{line_number}\t{hex(address).upper().replace("X", "x")}\t{text}\t{object_code.hex().upper()}'
+
+
+def _print_symbol(index, symbol):
+    name, value, kind, definition, references = symbol
+    location = f'defined on line {definition}' if definition else 'not defined'
+    print(f'{name} \t {hex(value).upper().replace("X", "x")} \t {KIND_NAMES[kind]} \t {location}, '
+          f'{len(references)} references')
+    for line_number in references:
+        print('  ' + format_index_line(index.line(line_number)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Queries a cross-reference index written with assembler.py --xref.')
+    parser.add_argument('index_path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    symbol_parser = subparsers.add_parser(
+        'symbol', help='print the definition and the referencing lines of symbols')
+    symbol_parser.add_argument('symbols', nargs='+')
+    address_parser = subparsers.add_parser(
+        'address', help='print the lines and object code at an address or in a range of addresses')
+    address_parser.add_argument('start', type=lambda text: int(text, 16), help='hexadecimal address')
+    address_parser.add_argument('end', type=lambda text: int(text, 16), nargs='?',
+                                help='hexadecimal address after the range (default: start + 1)')
+    subparsers.add_parser(
+        'unresolved', help='print the symbols referred to but not defined, and where')
+    args = parser.parse_args()
+
+    with CrossReferenceIndex(args.index_path) as index:
+        if args.command == 'symbol':
+            missing = False
+            for name in args.symbols:
+                symbol = index.symbol(name)
+                if symbol is None:
+                    print(f'{name} \t not found')
+                    missing = True
+                else:
+                    _print_symbol(index, symbol)
+            exit_code = 1 if missing else 0
+        elif args.command == 'address':
+            end = args.start + 1 if args.end is None else args.end
+            for line in index.lines_in_range(args.start, end):
+                print(format_index_line(line))
+            exit_code = 0
+        else:
+            for symbol in index.unresolved_symbols():
+                _print_symbol(index, symbol)
+            exit_code = 0
+    sys.exit(exit_code)